@@ -1,12 +1,16 @@
-import pickle
+from typing import Optional, Type, TypeVar
 
+from postiel_helpers.codec.registry import DEFAULT_CONTENT_TYPE, detect_content_type, get_codec
 from postiel_helpers.model.data import DataModel
 
+ActionType = TypeVar('ActionType', bound='Action')
+
 
 class Action(DataModel):
-    def serialize(self):
-        return pickle.dumps(self)
+    def serialize(self, content_type: str = DEFAULT_CONTENT_TYPE) -> bytes:
+        return get_codec(content_type).encode(self)
 
-    @staticmethod
-    def deserialize(data: bytes):
-        return pickle.loads(data)
+    @classmethod
+    def deserialize(cls: Type[ActionType], data: bytes, content_type: Optional[str] = None) -> ActionType:
+        """Deserialize action. Without content type, it is detected, so legacy pickle bodies are still accepted."""
+        return get_codec(content_type or detect_content_type(data)).decode(data, cls)
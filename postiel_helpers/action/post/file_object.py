@@ -12,3 +12,5 @@ class FileObject(DataModel):
     filename: Optional[str] = None
     public_url: Optional[str] = None
     data: Optional[bytes] = None
+    # Blob store path of data checked in by a broker claim check. Consumers load data back before handlers run.
+    path: Optional[str] = None
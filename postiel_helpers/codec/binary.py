@@ -0,0 +1,266 @@
+"""Schema driven compact binary codec.
+
+Models are packed as MessagePack arrays with field values in declaration order, so field names and class paths are
+never sent. The model schema, taken from type annotations, is used on decode to rebuild nested models without running
+validation again. Messages carry a schema version, a fingerprint of field names and types of the whole model tree, so
+messages published with a different schema are rejected instead of being decoded into wrong fields. Languages are sent as extension values holding their ISO 639-1 member name, so adding or
+reordering languages does not change how they are decoded.
+
+Byte fields bigger than the out of band threshold are not packed inline. They are appended after the packed models
+and are decoded as ``bytes``. With ``zero_copy`` they are decoded as ``memoryview`` slices of the message body, so
+large files are never copied, but decoded models can not be pickled or deep copied while they hold them.
+"""
+import collections
+import hashlib
+import struct
+import typing
+from datetime import datetime
+from inspect import isclass
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Type, Union
+
+import msgpack
+from msgpack import ExtType
+from pydantic import BaseModel
+
+from postiel_helpers.codec.interface import CodecInterface, Model
+from postiel_helpers.langauge.language import Language
+from postiel_helpers.model.data import DataModel
+
+FORMAT_VERSION = 1
+FRAME_MARKER = 0xc1
+DEFAULT_OUT_OF_BAND_THRESHOLD = 1024
+
+_EXT_LANGUAGE = 1
+_EXT_DATETIME = 2
+_EXT_BUFFER = 3
+
+_FRAME_HEADER = struct.Struct('>BI')
+_BUFFER_REFERENCE = struct.Struct('>II')
+
+_LANGUAGE_EXTS: Dict[Language, ExtType] = {
+    language: ExtType(_EXT_LANGUAGE, language.name.encode('ascii')) for language in Language}
+
+Decoder = Optional[Callable[[Any], Any]]
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+class _Packer:
+    """Packing state of one message. Collects out of band buffers."""
+
+    def __init__(self, out_of_band_threshold: Optional[int]):
+        self.out_of_band_threshold = out_of_band_threshold
+        self.buffers: List[Buffer] = []
+        self._buffers_size = 0
+
+    def default(self, obj: Any) -> Any:
+        obj_type = type(obj)
+        try:
+            encoder = _ENCODERS[obj_type]
+        except KeyError:
+            if not issubclass(obj_type, BaseModel):
+                raise TypeError(f"Can not serialize {obj_type.__name__} object")
+            encoder = _ENCODERS[obj_type] = _get_schema(obj_type).dump
+        return encoder(obj, self)
+
+    def add_buffer(self, data: Buffer) -> ExtType:
+        length = len(data)
+        reference = ExtType(_EXT_BUFFER, _BUFFER_REFERENCE.pack(self._buffers_size, length))
+        self.buffers.append(data)
+        self._buffers_size += length
+        return reference
+
+
+def _encode_language(language: Language, packer: _Packer) -> ExtType:
+    return _LANGUAGE_EXTS[language]
+
+
+def _encode_datetime(value: datetime, packer: _Packer) -> ExtType:
+    return ExtType(_EXT_DATETIME, value.isoformat().encode('ascii'))
+
+
+_ENCODERS: Dict[type, Callable[[Any, _Packer], Any]] = {Language: _encode_language, datetime: _encode_datetime}
+
+
+def _get_ext_hook(buffers: Optional[memoryview], zero_copy: bool = False) -> Callable[[int, bytes], Any]:
+    def ext_hook(code: int, data: bytes) -> Any:
+        if code == _EXT_LANGUAGE:
+            return Language[data.decode('ascii')]
+        if code == _EXT_DATETIME:
+            return datetime.fromisoformat(data.decode('ascii'))
+        if code == _EXT_BUFFER and buffers is not None:
+            offset, length = _BUFFER_REFERENCE.unpack(data)
+            if offset + length > len(buffers):
+                raise ValueError("Buffer reference out of message body")
+            buffer = buffers[offset:offset + length]
+            return buffer if zero_copy else bytes(buffer)
+        raise ValueError(f"Unknown extension type {code}")
+    return ext_hook
+
+
+_EXT_HOOK = _get_ext_hook(None)
+
+
+def _is_bytes_type_hint(type_hint: Any) -> bool:
+    if typing.get_origin(type_hint) is Union:
+        return any(_is_bytes_type_hint(arg) for arg in typing.get_args(type_hint))
+    return type_hint in (bytes, bytearray)
+
+
+class ModelSchema:
+    """Field layout of a model and decoders needed to rebuild its values."""
+
+    def __init__(self, model_type: Type[BaseModel]):
+        self.model_type = model_type
+        type_hints = typing.get_type_hints(model_type)
+        self.field_names: Tuple[str, ...] = tuple(model_type.__fields__)
+        self._fields_set = set(self.field_names)
+        self._has_private_attributes = bool(getattr(model_type, '__private_attributes__', None))
+        self._decoders: Tuple[Tuple[str, Callable[[Any], Any]], ...] = ()
+        self._type_hints = {name: type_hints.get(name, Any) for name in self.field_names}
+        self._buffer_fields = tuple(
+            index for index, name in enumerate(self.field_names) if _is_bytes_type_hint(self._type_hints[name]))
+        self._version: Optional[int] = None
+
+    @property
+    def version(self) -> int:
+        if self._version is None:
+            digest = hashlib.sha256(_describe_model(self.model_type, set()).encode()).digest()
+            self._version = int.from_bytes(digest[:4], 'big')
+        return self._version
+
+    def prepare(self) -> None:
+        # Decoders are created after schema is cached, so self referencing models are supported.
+        decoders = ((name, _get_decoder(self._type_hints[name])) for name in self.field_names)
+        self._decoders = tuple((name, decoder) for name, decoder in decoders if decoder is not None)
+
+    def dump(self, model: BaseModel, packer: _Packer) -> List[Any]:
+        values = model.__dict__
+        data = [values[name] for name in self.field_names]
+        if packer.out_of_band_threshold is not None:
+            for index in self._buffer_fields:
+                value = data[index]
+                if value is not None and len(value) >= packer.out_of_band_threshold:
+                    data[index] = packer.add_buffer(value)
+        return data
+
+    def load(self, data: List[Any]) -> BaseModel:
+        if not isinstance(data, list) or len(data) != len(self.field_names):
+            raise ValueError(f"Data does not match {self.model_type.__name__} schema")
+        values = dict(zip(self.field_names, data))
+        for name, decoder in self._decoders:
+            value = values[name]
+            if value is not None:
+                values[name] = decoder(value)
+        model = self.model_type.__new__(self.model_type)
+        object.__setattr__(model, '__dict__', values)
+        object.__setattr__(model, '__fields_set__', self._fields_set.copy())
+        if self._has_private_attributes:
+            model._init_private_attributes()
+        return model
+
+
+_SCHEMAS: Dict[Type[BaseModel], ModelSchema] = {}
+
+
+def _get_schema(model_type: Type[BaseModel]) -> ModelSchema:
+    try:
+        return _SCHEMAS[model_type]
+    except KeyError:
+        schema = _SCHEMAS[model_type] = ModelSchema(model_type)
+        schema.prepare()
+        return schema
+
+
+def _describe_model(model_type: Type[BaseModel], visiting: Set[Type[BaseModel]]) -> str:
+    if model_type in visiting:
+        return f'<{model_type.__qualname__}>'  # Self reference.
+    visiting.add(model_type)
+    try:
+        schema = _get_schema(model_type)
+        return '{' + ','.join(f'{name}:{_describe_type(schema._type_hints[name], visiting)}'
+                              for name in schema.field_names) + '}'
+    finally:
+        visiting.discard(model_type)
+
+
+def _describe_type(type_hint: Any, visiting: Set[Type[BaseModel]]) -> str:
+    if isclass(type_hint) and issubclass(type_hint, BaseModel):
+        return _describe_model(type_hint, visiting)
+    origin = typing.get_origin(type_hint)
+    if origin is not None:
+        args = ','.join(_describe_type(arg, visiting) for arg in typing.get_args(type_hint))
+        return f'{_describe_type(origin, visiting)}[{args}]'
+    if isclass(type_hint):
+        return f'{type_hint.__module__}.{type_hint.__qualname__}'
+    return repr(type_hint)
+
+
+def _get_decoder(type_hint: Any) -> Decoder:
+    origin = typing.get_origin(type_hint)
+    args = typing.get_args(type_hint)
+
+    if origin is Union:
+        decoders = [_get_decoder(arg) for arg in args if arg is not type(None)]
+        if len(decoders) == 1:
+            return decoders[0]
+        return None
+
+    if origin in (list, tuple, set, frozenset):
+        item_decoder = _get_decoder(args[0]) if args else None
+        if origin is list and item_decoder is None:
+            return None
+        return lambda value: origin(item_decoder(item) if item_decoder and item is not None else item
+                                    for item in value)
+
+    if origin in (dict, collections.OrderedDict):
+        key_decoder = _get_decoder(args[0]) if args else None
+        value_decoder = _get_decoder(args[1]) if args else None
+        if key_decoder is None and value_decoder is None:
+            return None
+        return lambda value: {
+            key_decoder(key) if key_decoder else key:
+                value_decoder(item) if value_decoder and item is not None else item
+            for key, item in value.items()}
+
+    if isclass(type_hint) and issubclass(type_hint, BaseModel):
+        return _get_schema(type_hint).load
+
+    return None
+
+
+class BinaryCodec(CodecInterface):
+    CONTENT_TYPE = 'application/x-postiel-binary'
+
+    def __init__(self, out_of_band_threshold: Optional[int] = DEFAULT_OUT_OF_BAND_THRESHOLD, zero_copy: bool = False):
+        self._out_of_band_threshold = out_of_band_threshold
+        self._zero_copy = zero_copy
+
+    def encode(self, model: DataModel) -> bytes:
+        packer = _Packer(self._out_of_band_threshold)
+        data = msgpack.packb([FORMAT_VERSION, _get_schema(type(model)).version, model], default=packer.default,
+                             use_bin_type=True)
+        if not packer.buffers:
+            return data
+        return b''.join((_FRAME_HEADER.pack(FRAME_MARKER, len(data)), data, *packer.buffers))
+
+    def decode(self, data: bytes, model_type: Type[Model]) -> Model:
+        if data[:1] == bytes((FRAME_MARKER,)):
+            view = memoryview(data)
+            _, packed_size = _FRAME_HEADER.unpack(view[:_FRAME_HEADER.size])
+            buffers_start = _FRAME_HEADER.size + packed_size
+            packed = self._unpack(view[_FRAME_HEADER.size:buffers_start], _get_ext_hook(view[buffers_start:], self._zero_copy))
+        else:
+            packed = self._unpack(data, _EXT_HOOK)
+
+        format_version, schema_version, payload = packed
+        if format_version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported binary format version {format_version}")
+        schema = _get_schema(model_type)
+        if schema_version != schema.version:
+            raise ValueError(f"{model_type.__name__} schema version {schema_version} received, "
+                             f"{schema.version} expected")
+        return schema.load(payload)
+
+    @staticmethod
+    def _unpack(data: Buffer, ext_hook: Callable[[int, bytes], Any]) -> Any:
+        return msgpack.unpackb(data, ext_hook=ext_hook, raw=False, strict_map_key=False)
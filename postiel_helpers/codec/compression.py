@@ -0,0 +1,112 @@
+"""Message body compression. Compressed bodies are identified by content encoding."""
+import zlib
+from abc import abstractmethod, ABCMeta
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from pydantic import validator
+
+from postiel_helpers.abstract.attribute import AbstractAttribute
+from postiel_helpers.model.data import DataModel
+
+try:
+    import lz4.frame
+except ImportError:  # pragma: no cover
+    lz4 = None
+
+
+class CompressorInterface(metaclass=ABCMeta):
+    CONTENT_ENCODING: str = AbstractAttribute()
+
+    @abstractmethod
+    def compress(self, data: bytes) -> bytes:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def decompress(self, data: bytes) -> bytes:
+        raise NotImplementedError()
+
+
+class ZlibCompressor(CompressorInterface):
+    CONTENT_ENCODING = 'deflate'
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zlib.decompress(data)
+
+
+class Lz4Compressor(CompressorInterface):
+    CONTENT_ENCODING = 'lz4'
+
+    def compress(self, data: bytes) -> bytes:
+        return lz4.frame.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return lz4.frame.decompress(data)
+
+
+COMPRESSORS: Dict[str, CompressorInterface] = {ZlibCompressor.CONTENT_ENCODING: ZlibCompressor()}
+if lz4 is not None:
+    COMPRESSORS[Lz4Compressor.CONTENT_ENCODING] = Lz4Compressor()
+
+# lz4 is optional, so it must be chosen explicitly, and only when consumers have it installed too.
+DEFAULT_CONTENT_ENCODING = ZlibCompressor.CONTENT_ENCODING
+
+
+def get_compressor(content_encoding: str) -> CompressorInterface:
+    try:
+        return COMPRESSORS[content_encoding]
+    except KeyError:
+        raise ValueError(f"Compressor for content encoding {content_encoding} is not available.")
+
+
+class CompressionConfig(DataModel):
+    content_encoding: str = DEFAULT_CONTENT_ENCODING
+    threshold: int = 1024
+
+    @validator('content_encoding')
+    def check_content_encoding(cls, content_encoding):
+        assert content_encoding in COMPRESSORS, f"Compressor for content encoding {content_encoding} is not available."
+        return content_encoding
+
+
+@dataclass
+class CompressionStats:
+    compressed_messages: int = 0
+    uncompressed_messages: int = 0
+    input_bytes: int = 0
+    output_bytes: int = 0
+
+    @property
+    def saved_bytes(self) -> int:
+        return self.input_bytes - self.output_bytes
+
+
+class Compression:
+    """Compress bodies bigger than threshold. Body is sent uncompressed when compression does not reduce it."""
+
+    def __init__(self, config: CompressionConfig):
+        self._compressor = get_compressor(config.content_encoding)
+        self._threshold = config.threshold
+        self.stats = CompressionStats()
+
+    def compress(self, data: bytes) -> Tuple[bytes, Optional[str]]:
+        self.stats.input_bytes += len(data)
+        if len(data) >= self._threshold:
+            compressed_data = self._compressor.compress(data)
+            if len(compressed_data) < len(data):
+                self.stats.compressed_messages += 1
+                self.stats.output_bytes += len(compressed_data)
+                return compressed_data, self._compressor.CONTENT_ENCODING
+
+        self.stats.uncompressed_messages += 1
+        self.stats.output_bytes += len(data)
+        return data, None
+
+    @staticmethod
+    def decompress(data: bytes, content_encoding: Optional[str]) -> bytes:
+        if not content_encoding:
+            return data
+        return get_compressor(content_encoding).decompress(data)
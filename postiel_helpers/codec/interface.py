@@ -0,0 +1,21 @@
+from abc import abstractmethod, ABCMeta
+from typing import Type, TypeVar
+
+from postiel_helpers.abstract.attribute import AbstractAttribute
+from postiel_helpers.model.data import DataModel
+
+Model = TypeVar('Model', bound=DataModel)
+
+
+class CodecInterface(metaclass=ABCMeta):
+    """Codec used to turn actions into message bodies. Each codec is identified by the content type that is sent with
+    the message, so consumers can decode messages produced with any registered codec."""
+    CONTENT_TYPE: str = AbstractAttribute()
+
+    @abstractmethod
+    def encode(self, model: DataModel) -> bytes:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def decode(self, data: bytes, model_type: Type[Model]) -> Model:
+        raise NotImplementedError()
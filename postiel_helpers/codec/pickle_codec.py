@@ -0,0 +1,16 @@
+import pickle
+from typing import Type
+
+from postiel_helpers.codec.interface import CodecInterface, Model
+from postiel_helpers.model.data import DataModel
+
+
+class PickleCodec(CodecInterface):
+    """Legacy codec. Messages published without content type are decoded with it."""
+    CONTENT_TYPE = 'application/python-pickle'
+
+    def encode(self, model: DataModel) -> bytes:
+        return pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def decode(self, data: bytes, model_type: Type[Model]) -> Model:
+        return pickle.loads(data)
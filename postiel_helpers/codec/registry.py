@@ -0,0 +1,27 @@
+from typing import Dict, Optional
+
+from postiel_helpers.codec.binary import BinaryCodec
+from postiel_helpers.codec.interface import CodecInterface
+from postiel_helpers.codec.pickle_codec import PickleCodec
+
+CODECS: Dict[str, CodecInterface] = {codec.CONTENT_TYPE: codec for codec in (BinaryCodec(), PickleCodec())}
+DEFAULT_CONTENT_TYPE = BinaryCodec.CONTENT_TYPE
+LEGACY_CONTENT_TYPE = PickleCodec.CONTENT_TYPE
+ZERO_COPY_CODECS: Dict[str, CodecInterface] = {BinaryCodec.CONTENT_TYPE: BinaryCodec(zero_copy=True)}
+
+
+def get_codec(content_type: Optional[str], zero_copy: bool = False) -> CodecInterface:
+    """Get codec by content type. Messages without content type were published with pickle. With zero copy, codec
+    decoding large byte fields as views of the body is returned when content type has one."""
+    content_type = content_type or LEGACY_CONTENT_TYPE
+    if zero_copy and content_type in ZERO_COPY_CODECS:
+        return ZERO_COPY_CODECS[content_type]
+    try:
+        return CODECS[content_type]
+    except KeyError:
+        raise ValueError(f"Codec for content type {content_type} is not available.")
+
+
+def detect_content_type(data: bytes) -> str:
+    """Detect content type of a body serialized without one. Legacy pickle bodies start with the protocol opcode."""
+    return LEGACY_CONTENT_TYPE if data[:1] == b'\x80' else DEFAULT_CONTENT_TYPE
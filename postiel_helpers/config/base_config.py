@@ -1,7 +1,11 @@
 from typing import Optional, Dict, Any
 
+from postiel_helpers.config.config_watch import ConfigWatchConfig
 from postiel_helpers.config.logging import LoggingConfig
 from postiel_helpers.config.message_broker import MessageBrokerConfig
+from postiel_helpers.config.process_pool import ProcessPoolConfig
+from postiel_helpers.config.producer import ProducerConfig
+from postiel_helpers.config.supervisor import SupervisorConfig
 from postiel_helpers.model.data import DataModel
 from postiel_helpers.model.field import field
 
@@ -9,4 +13,8 @@ from postiel_helpers.model.field import field
 class BaseConfig(DataModel):
     logging: Optional[LoggingConfig] = None
     message_brokers: Dict[str, MessageBrokerConfig] = field(default_factory=dict)
+    process_pool: ProcessPoolConfig = field(default_factory=ProcessPoolConfig)
+    producer: Optional[ProducerConfig] = None
+    config_watch: Optional[ConfigWatchConfig] = None
+    supervisor: Optional[SupervisorConfig] = None
     # senders_config: List[SenderConfig]
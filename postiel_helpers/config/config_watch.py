@@ -0,0 +1,6 @@
+from postiel_helpers.model.data import DataModel
+
+
+class ConfigWatchConfig(DataModel):
+    debounce: float = 1.6
+    interval: float = 0.4
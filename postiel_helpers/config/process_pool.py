@@ -0,0 +1,7 @@
+from typing import Optional
+
+from postiel_helpers.model.data import DataModel
+
+
+class ProcessPoolConfig(DataModel):
+    max_workers: Optional[int] = None
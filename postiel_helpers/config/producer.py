@@ -0,0 +1,19 @@
+from typing import List
+
+from postiel_helpers.message_broker.batch import BatchConfig
+from postiel_helpers.message_broker.routing import RoutingConfig
+from postiel_helpers.model.data import DataModel
+from postiel_helpers.model.field import field
+
+
+class RouteConfig(DataModel):
+    """Route of actions of a type, by class name, subclasses included, to a broker."""
+    action_type: str
+    broker: str
+    routing: RoutingConfig
+
+
+class ProducerConfig(DataModel):
+    routes: List[RouteConfig]
+    max_queue_size: int = 1000
+    batch: BatchConfig = field(default_factory=BatchConfig)
@@ -0,0 +1,10 @@
+from typing import Optional
+
+from postiel_helpers.model.data import DataModel
+
+
+class SupervisorConfig(DataModel):
+    workers: Optional[int] = None
+    cpu_affinity: bool = False
+    restart_delay: float = 1.0
+    stop_timeout: float = 10.0
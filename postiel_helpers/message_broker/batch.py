@@ -0,0 +1,51 @@
+import asyncio
+from typing import Awaitable, Callable, Generic, List, Optional, Set, TypeVar
+
+from postiel_helpers.model.data import DataModel
+
+Item = TypeVar('Item')
+
+
+class BatchConfig(DataModel):
+    max_batch_size: int = 100
+    max_wait_ms: int = 50
+
+
+class Batcher(Generic[Item]):
+    """Collect items and flush them in batches when batch is full or when oldest item has waited max wait time.
+    Batches are flushed one at a time, in order."""
+
+    def __init__(self, config: BatchConfig, flush: Callable[[List[Item]], Awaitable[None]]):
+        self._max_batch_size = config.max_batch_size
+        self._max_wait = config.max_wait_ms / 1000
+        self._flush = flush
+        self._items: List[Item] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._lock = asyncio.Lock()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def add(self, item: Item) -> None:
+        self._items.append(item)
+        if len(self._items) >= self._max_batch_size:
+            self._flush_items()
+        elif len(self._items) == 1:
+            self._timer = asyncio.get_running_loop().call_later(self._max_wait, self._flush_items)
+
+    def _flush_items(self) -> None:
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        items, self._items = self._items, []
+        if items:
+            task = asyncio.create_task(self._run_flush(items))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_flush(self, items: List[Item]) -> None:
+        async with self._lock:
+            await self._flush(items)
+
+    async def flush(self) -> None:
+        """Flush pending items and wait until all batches are flushed."""
+        self._flush_items()
+        await asyncio.gather(*self._tasks)
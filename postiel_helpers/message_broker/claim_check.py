@@ -0,0 +1,110 @@
+"""Claim check. Large file data is stored in a local content addressed blob store and only its path is sent with the
+message. Producers and consumers must share the blob store directory."""
+import asyncio
+import hashlib
+import os
+import tempfile
+from typing import Any, Callable, Dict
+
+from pydantic import BaseModel
+
+from postiel_helpers.action.post.file_object import FileObject
+from postiel_helpers.model.data import DataModel
+
+
+class ClaimCheckConfig(DataModel):
+    """Brokers with claim check store ``FileObject.data`` bigger than threshold in directory and send its path. Their
+    consumers load it back before handlers run, so handlers read ``FileObject.data`` as usual. Consumers need the same
+    directory, and paths outside it are rejected."""
+    directory: str
+    threshold: int = 1024 * 1024
+
+
+class BlobStore:
+    """Blob store where each blob is saved once, in a directory sharded by its SHA-256."""
+
+    def __init__(self, directory: str):
+        self._directory = directory
+
+    def get_path(self, key: str) -> str:
+        return os.path.join(self._directory, key[:2], key[2:4], key)
+
+    def get(self, path: str) -> bytes:
+        """Read blob. Path comes from messages, so it is only read when it resolves inside blob store directory."""
+        directory = os.path.realpath(self._directory)
+        real_path = os.path.realpath(path)
+        if os.path.commonpath([directory, real_path]) != directory:
+            raise ValueError(f"Path {path} is not in blob store")
+        with open(real_path, 'rb') as file:
+            return file.read()
+
+    def put(self, data: bytes) -> str:
+        path = self.get_path(hashlib.sha256(data).hexdigest())
+        if os.path.exists(path):
+            return path
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        file_descriptor, temporal_path = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(file_descriptor, 'wb') as file:
+                file.write(data)
+            os.replace(temporal_path, path)
+        except BaseException:
+            os.unlink(temporal_path)
+            raise
+        return path
+
+
+class ClaimCheck:
+    def __init__(self, config: ClaimCheckConfig):
+        self._threshold = config.threshold
+        self._blob_store = BlobStore(config.directory)
+
+    async def check_in(self, model: BaseModel) -> BaseModel:
+        """Get a copy of model where big file data is replaced by blob store path. Model is not modified."""
+        return await asyncio.get_running_loop().run_in_executor(None, self.check_in_sync, model)
+
+    def check_in_sync(self, model: BaseModel) -> BaseModel:
+        return _replace_files(model, self._check_in_file)
+
+    async def check_out(self, model: BaseModel) -> BaseModel:
+        """Get a copy of model where blob store paths are replaced by their data. Model is not modified."""
+        return await asyncio.get_running_loop().run_in_executor(None, self.check_out_sync, model)
+
+    def check_out_sync(self, model: BaseModel) -> BaseModel:
+        return _replace_files(model, self._check_out_file)
+
+    def _check_in_file(self, file: FileObject) -> FileObject:
+        if file.data is None or len(file.data) < self._threshold:
+            return file
+        return file.copy(update={'data': None, 'path': self._blob_store.put(file.data)})
+
+    def _check_out_file(self, file: FileObject) -> FileObject:
+        if file.data is not None or not file.path:
+            return file
+        return file.copy(update={'data': self._blob_store.get(file.path), 'path': None})
+
+
+def _replace_files(value: Any, replace: Callable[[FileObject], FileObject]) -> Any:
+    """Replace file objects found in value, copying only models and containers holding replaced ones."""
+    if isinstance(value, FileObject):
+        return replace(value)
+
+    if isinstance(value, BaseModel):
+        update: Dict[str, Any] = {}
+        for name, field_value in value.__dict__.items():
+            new_value = _replace_files(field_value, replace)
+            if new_value is not field_value:
+                update[name] = new_value
+        return value.copy(update=update) if update else value
+
+    if isinstance(value, list):
+        items = [_replace_files(item, replace) for item in value]
+        return items if any(new is not old for new, old in zip(items, value)) else value
+
+    if isinstance(value, dict):
+        items = {key: _replace_files(item, replace) for key, item in value.items()}
+        return items if any(items[key] is not item for key, item in value.items()) else value
+
+    return value
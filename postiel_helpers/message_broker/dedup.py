@@ -0,0 +1,78 @@
+"""Deduplication of consumed messages by message id. Ids of processed messages are kept in a LRU cache with TTL, so
+messages redelivered by broker, like after reconnections, are skipped before being deserialized.
+
+When a path is configured, ids are also appended to a local file and loaded on start, so they survive restarts, even
+without a clean close. File is compacted when cache is closed."""
+import os
+import time
+from collections import OrderedDict
+from typing import Optional, TextIO
+
+from postiel_helpers.model.data import DataModel
+
+
+class DedupConfig(DataModel):
+    max_size: int = 100000
+    ttl: float = 24 * 60 * 60
+    path: Optional[str] = None
+
+
+class DedupCache:
+    def __init__(self, config: DedupConfig):
+        self._max_size = config.max_size
+        self._ttl = config.ttl
+        self._path = config.path
+        self._expirations: 'OrderedDict[str, float]' = OrderedDict()
+        self._file: Optional[TextIO] = None
+        if self._path:
+            self._load()
+            self._file = open(self._path, 'a')
+
+    def seen(self, message_id: str) -> bool:
+        expiration = self._expirations.get(message_id)
+        if expiration is None:
+            return False
+        if expiration < time.time():
+            del self._expirations[message_id]
+            return False
+        self._expirations.move_to_end(message_id)
+        return True
+
+    def add(self, message_id: str) -> None:
+        expiration = time.time() + self._ttl
+        self._set(message_id, expiration)
+        if self._file:
+            self._file.write(f'{message_id} {expiration}\n')
+            self._file.flush()
+
+    def _set(self, message_id: str, expiration: float) -> None:
+        self._expirations[message_id] = expiration
+        self._expirations.move_to_end(message_id)
+        while len(self._expirations) > self._max_size:
+            self._expirations.popitem(last=False)
+
+    def _load(self) -> None:
+        if not os.path.exists(self._path):
+            return
+        now = time.time()
+        with open(self._path) as file:
+            for line in file:
+                try:
+                    message_id, expiration = line.split()
+                    expiration = float(expiration)
+                except ValueError:
+                    continue  # Line not fully written before stop.
+                if expiration >= now:
+                    self._set(message_id, expiration)
+
+    def close(self) -> None:
+        if not self._file:
+            return
+        self._file.close()
+        self._file = None
+        now = time.time()
+        temporal_path = f'{self._path}.tmp'
+        with open(temporal_path, 'w') as file:
+            file.writelines(f'{message_id} {expiration}\n'
+                            for message_id, expiration in self._expirations.items() if expiration >= now)
+        os.replace(temporal_path, self._path)
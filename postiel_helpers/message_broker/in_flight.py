@@ -0,0 +1,27 @@
+import asyncio
+
+
+class InFlightTracker:
+    """Count messages being processed, so closing can wait only until they are done."""
+
+    def __init__(self):
+        self._count = 0
+        self._drained = asyncio.Event()
+        self._drained.set()
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    def add(self, count: int = 1) -> None:
+        self._count += count
+        if self._count:
+            self._drained.clear()
+
+    def done(self, count: int = 1) -> None:
+        self._count -= count
+        if not self._count:
+            self._drained.set()
+
+    async def wait_drained(self) -> None:
+        await self._drained.wait()
@@ -0,0 +1,282 @@
+"""Broker that routes messages between consumers of the same process, without network. Topology is declared like in
+RabbitMQ config, so a RabbitMQ config can be used as is, connection options are ignored."""
+import asyncio
+import logging
+from concurrent.futures import Executor
+from dataclasses import dataclass, field as dataclass_field
+from functools import partial
+from typing import Any, Dict, List, Optional, Set, Union
+
+from pydantic import validator
+
+from postiel_helpers.action.action import Action
+from postiel_helpers.codec.interface import CodecInterface
+from postiel_helpers.codec.registry import CODECS, get_codec
+from postiel_helpers.message_broker.interface import MessageBrokerInterface
+from postiel_helpers.message_broker.message import Message
+from postiel_helpers.message_broker.routing import BindingConfig, DIRECT, Router, RoutingConfig, get_routing_config
+from postiel_helpers.message_broker.scheduler import Scheduler, SchedulerConfig
+from postiel_helpers.message_broker.service_consumer import AnyServiceConsumer, ServiceConsumer
+from postiel_helpers.message_broker.worker import run_consumer
+from postiel_helpers.model.data import DataModel
+from postiel_helpers.model.field import field
+
+
+class InMemoryCommonConfig(DataModel):
+    logger_name: str
+
+
+class InMemoryQueueConfig(DataModel):
+    name: str
+    max_size: int = 0
+
+
+class InMemoryExchangeConfig(DataModel):
+    name: str
+    type: str = DIRECT
+
+
+class InMemoryCreateConfig(DataModel):
+    queues: List[InMemoryQueueConfig] = field(default_factory=list)
+    exchanges: List[InMemoryExchangeConfig] = field(default_factory=list)
+    bindings: List[BindingConfig] = field(default_factory=list)
+
+    @validator('bindings')
+    def bindings_check(cls, bindings, values, **kwargs):
+        if 'queues' not in values or 'exchanges' not in values:
+            return bindings  # Already failed validation.
+        queues = {queue_config.name for queue_config in values['queues']}
+        exchanges = {exchange_config.name for exchange_config in values['exchanges']}
+        for binding in bindings:
+            assert binding.queue_name in queues, f"Queue {binding.queue_name} is not declared in queues"
+            assert binding.exchange_name in exchanges, f"Exchange {binding.exchange_name} is not declared in exchanges"
+        return bindings
+
+
+class InMemoryConsumerConfig(DataModel):
+    queue_name: str
+    consumer_name: str
+    failed_message_routing: Optional[RoutingConfig] = None
+    max_concurrency: Optional[int] = 1
+    handler_timeout: Optional[float] = None
+    # Large byte fields are decoded as memoryview slices of the queued body. Only used when a codec is configured.
+    zero_copy: bool = False
+
+
+class InMemoryConfig(DataModel):
+    common: InMemoryCommonConfig
+    create: InMemoryCreateConfig = field(default_factory=InMemoryCreateConfig)
+    consumers: List[InMemoryConsumerConfig] = field(default_factory=list)
+    failed_consumers: List[InMemoryConsumerConfig] = field(default_factory=list)
+    content_type: Optional[str] = None
+    scheduler: SchedulerConfig = field(default_factory=SchedulerConfig)
+
+    @validator('content_type')
+    def check_content_type(cls, content_type):
+        assert content_type is None or content_type in CODECS, f"Codec for content type {content_type} is not " \
+                                                               f"available."
+        return content_type
+
+    @validator('consumers', 'failed_consumers', each_item=True)
+    def check_consumer(cls, consumer, values):
+        if 'create' not in values:
+            return consumer  # Already failed validation.
+        queues = {queue_config.name for queue_config in values['create'].queues}
+        assert consumer.queue_name in queues, f"Queue {consumer.queue_name} is not declared in queues"
+        if consumer.failed_message_routing:
+            exchanges = {exchange_config.name for exchange_config in values['create'].exchanges}
+            assert consumer.failed_message_routing.exchange_name in exchanges
+        return consumer
+
+
+@dataclass
+class QueuedMessage:
+    """Message body. Without codec the action itself is queued, so all consumers share the same action object."""
+    body: Union[bytes, Action]
+    content_type: Optional[str]
+
+
+@dataclass
+class InMemoryConsumerData:
+    config: InMemoryConsumerConfig
+    service_consumer: ServiceConsumer
+    queue: asyncio.Queue
+    tasks: List[asyncio.Task] = dataclass_field(default_factory=list)
+
+
+class InMemory(MessageBrokerInterface):
+    _CONFIG = InMemoryConfig
+
+    def __init__(self, config: InMemoryConfig, service_consumers: Dict[str, AnyServiceConsumer], close_grace: int,
+                 codec: Optional[CodecInterface] = None, process_pool: Optional[Executor] = None):
+        super().__init__()
+        self._logger = logging.getLogger(config.common.logger_name)
+        self._queues: Dict[str, asyncio.Queue] = {
+            queue_config.name: asyncio.Queue(maxsize=queue_config.max_size) for queue_config in config.create.queues}
+        self._router = Router({exchange.name: exchange.type for exchange in config.create.exchanges},
+                              config.create.bindings)
+        self._failed_consumers = config.failed_consumers
+        self._consumers: List[InMemoryConsumerData] = []
+        self._service_consumers = service_consumers
+        self._close_grace = close_grace
+        self._codec = codec
+        self._process_pool = process_pool
+        self._scheduler = Scheduler(self.send_message, config.scheduler, self._logger)
+
+    @classmethod
+    async def initialize(cls, config: Dict[str, Any],
+                         service_consumers: Dict[str, AnyServiceConsumer],
+                         close_grace: int,
+                         process_pool: Optional[Executor] = None):
+        def check_consumer_name_available(consumers: List[InMemoryConsumerConfig]):
+            for consumer in consumers:
+                assert consumer.consumer_name in service_consumers, f"Consumer {consumer.consumer_name} " \
+                                                                    f"is not available."
+                assert isinstance(service_consumers[consumer.consumer_name], ServiceConsumer), \
+                    f"Consumer {consumer.consumer_name} is a batch consumer, they are not supported."
+
+        config = cls._CONFIG.parse_obj(config)
+        check_consumer_name_available(config.consumers)
+        check_consumer_name_available(config.failed_consumers)
+
+        instance = cls(config=config,
+                       service_consumers=service_consumers,
+                       close_grace=close_grace,
+                       codec=get_codec(config.content_type) if config.content_type else None,
+                       process_pool=process_pool)
+        await instance._scheduler.start()
+        instance.create_consumers(config.consumers)
+        return instance
+
+    def create_consumers(self, consumers_config: List[InMemoryConsumerConfig]) -> None:
+        for consumer_config in consumers_config:
+            consumer = self._get_consumer(consumer_config)
+            if consumer_config.max_concurrency is None:
+                consumer.tasks = [asyncio.create_task(self._consume_unbounded(consumer))]
+            else:
+                consumer.tasks = [asyncio.create_task(self._consume(consumer))
+                                  for _ in range(consumer_config.max_concurrency)]
+            self._consumers.append(consumer)
+
+    def _get_consumer(self, consumer_config: InMemoryConsumerConfig) -> InMemoryConsumerData:
+        return InMemoryConsumerData(config=consumer_config,
+                                    service_consumer=self._service_consumers[consumer_config.consumer_name],
+                                    queue=self._queues[consumer_config.queue_name])
+
+    async def _consume(self, consumer: InMemoryConsumerData) -> None:
+        while True:
+            await self._process_message(consumer, await consumer.queue.get())
+
+    async def _consume_unbounded(self, consumer: InMemoryConsumerData) -> None:
+        """Handle each message in its own task, without concurrency limit."""
+        handlers: Set[asyncio.Task] = set()
+        try:
+            while True:
+                handler = asyncio.create_task(self._process_message(consumer, await consumer.queue.get()))
+                handlers.add(handler)
+                handler.add_done_callback(handlers.discard)
+        finally:
+            for handler in handlers:
+                handler.cancel()
+
+    async def _process_message(self, consumer: InMemoryConsumerData, message: QueuedMessage) -> None:
+        try:
+            await self._handle_message(consumer, message)
+        finally:
+            consumer.queue.task_done()
+
+    async def _handle_message(self, consumer: InMemoryConsumerData, message: QueuedMessage) -> None:
+        service_consumer = consumer.service_consumer
+        action = None
+        try:
+            if service_consumer.cpu_bound and self._process_pool and message.content_type:
+                handler = asyncio.get_running_loop().run_in_executor(self._process_pool, partial(
+                    run_consumer, service_consumer.func, service_consumer.action_type, message.body,
+                    message.content_type, None, consumer.config.zero_copy))
+            else:
+                action = self._decode_action(consumer, message)
+                handler = service_consumer.run(action)
+            await asyncio.wait_for(handler, timeout=consumer.config.handler_timeout)
+            return
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            self._logger.error("Message processing timed out after %s seconds.", consumer.config.handler_timeout)
+        except Exception:
+            self._logger.exception("Unexpected error, on message processing.")
+
+        if not consumer.config.failed_message_routing:
+            self._logger.debug("Error detected but no failed routing config loaded. Message will be discarded.")
+            return
+        try:
+            if action is None:
+                action = self._decode_action(consumer, message)
+        except Exception:
+            self._logger.exception("Message can not be decoded.")
+            return
+        await self.send_message(Message.trusted(action=action,
+                                                routing_config=consumer.config.failed_message_routing.dict()))
+
+    @staticmethod
+    def _decode_action(consumer: InMemoryConsumerData, message: QueuedMessage) -> Action:
+        if message.content_type is None:
+            return message.body
+        return get_codec(message.content_type, consumer.config.zero_copy).decode(
+            message.body, consumer.service_consumer.action_type)
+
+    async def load_failed(self) -> None:
+        for consumer_config in self._failed_consumers:
+            consumer = self._get_consumer(consumer_config)
+            while not consumer.queue.empty():
+                message = consumer.queue.get_nowait()
+                try:
+                    await self._handle_message(consumer, message)
+                finally:
+                    consumer.queue.task_done()
+
+    async def send_message(self, message: Message) -> None:
+        if not self._scheduler.is_due(message):
+            await self._scheduler.schedule(message)
+            return
+        await self._publish(message)
+
+    async def _publish(self, message: Message) -> None:
+        routing_config = get_routing_config(message.routing_config)
+        queue_names = self._router.route(routing_config.exchange_name, routing_config.routing_key)
+        if not queue_names:
+            self._logger.debug("Message to %s with routing key %s is not routed to any queue.",
+                               routing_config.exchange_name, routing_config.routing_key)
+            return
+
+        if self._codec:
+            queued_message = QueuedMessage(body=self._codec.encode(message.action),
+                                           content_type=self._codec.CONTENT_TYPE)
+        else:
+            queued_message = QueuedMessage(body=message.action, content_type=None)
+        for queue_name in queue_names:
+            await self._enqueue(queue_name, queued_message)
+
+    async def _enqueue(self, queue_name: str, message: QueuedMessage) -> None:
+        # Full queues block publisher until consumers catch up.
+        await self._queues[queue_name].put(message)
+
+    async def _drain_consumers(self) -> None:
+        queues = {id(consumer.queue): consumer.queue for consumer in self._consumers}
+        self._logger.debug('Waiting %s queued messages, up to close grace %s seconds',
+                           sum(queue.qsize() for queue in queues.values()), self._close_grace)
+        try:
+            await asyncio.wait_for(asyncio.gather(*[queue.join() for queue in queues.values()]),
+                                   timeout=self._close_grace)
+        except asyncio.TimeoutError:
+            self._logger.warning('Close grace exceeded with %s queued messages',
+                                 sum(queue.qsize() for queue in queues.values()))
+
+    async def close(self) -> None:
+        # Scheduler is closed once consumers are drained, as their handlers may still schedule messages.
+        await self._drain_consumers()
+        await self._scheduler.close()
+        tasks = [task for consumer in self._consumers for task in consumer.tasks]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._consumers = []
@@ -1,5 +1,7 @@
+import asyncio
 from abc import abstractmethod, ABCMeta
-from typing import Any, Dict, Callable
+from concurrent.futures import Executor
+from typing import Any, Dict, Callable, List, Optional
 
 from postiel_helpers.message_broker.message import Message
 
@@ -7,13 +9,21 @@ from postiel_helpers.message_broker.message import Message
 class MessageBrokerInterface(metaclass=ABCMeta):
     @classmethod
     @abstractmethod
-    async def initialize(cls, config: Dict[str, Any], service_consumers: Dict[str, Callable], close_grace: int):
+    async def initialize(cls, config: Dict[str, Any], service_consumers: Dict[str, Callable], close_grace: int,
+                         process_pool: Optional[Executor] = None):
         raise NotImplementedError()
 
     @abstractmethod
     async def send_message(self, message: Message) -> None:
         raise NotImplementedError()
 
+    async def send_messages(self, messages: List[Message]) -> None:
+        await asyncio.gather(*[self.send_message(message) for message in messages])
+
+    async def reload(self, config: Dict[str, Any]) -> bool:
+        """Apply a changed config to running broker. Returns False when broker has to be created again."""
+        return False
+
     @abstractmethod
     async def close(self) -> None:
         raise NotImplementedError()
@@ -0,0 +1,148 @@
+"""Broker for services running on the same host. Each queue is served by the process that consumes it, on a Unix
+domain socket named after the queue, and other processes publish to it directly, without a broker in between.
+
+Frames are length prefixed: body length, content type length, content type and body. Received messages are put in
+bounded queues, so when consumers can not keep up, frames are not read anymore and publishers wait on the socket.
+Messages are not acknowledged, a message being processed when its consumer process stops is lost."""
+import asyncio
+import os
+import struct
+from concurrent.futures import Executor
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from pydantic import validator
+
+from postiel_helpers.codec.interface import CodecInterface
+from postiel_helpers.codec.registry import DEFAULT_CONTENT_TYPE
+from postiel_helpers.message_broker.in_memory.in_memory import InMemory, InMemoryConfig, InMemoryCreateConfig, \
+    InMemoryQueueConfig, QueuedMessage
+from postiel_helpers.message_broker.service_consumer import AnyServiceConsumer
+from postiel_helpers.model.field import field
+
+_FRAME_HEADER = struct.Struct('>IH')
+
+Connection = Tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+
+class LocalQueueConfig(InMemoryQueueConfig):
+    max_size: int = 1000
+
+    @validator('max_size')
+    def check_max_size(cls, max_size):
+        assert max_size > 0, "Local queues must be bounded, so publishers wait when consumers can not keep up."
+        return max_size
+
+
+class LocalCreateConfig(InMemoryCreateConfig):
+    queues: List[LocalQueueConfig] = field(default_factory=list)
+
+
+class LocalConfig(InMemoryConfig):
+    create: LocalCreateConfig = field(default_factory=LocalCreateConfig)
+    socket_directory: str
+    content_type: str = DEFAULT_CONTENT_TYPE
+
+
+class Local(InMemory):
+    _CONFIG = LocalConfig
+
+    def __init__(self, config: LocalConfig, service_consumers: Dict[str, AnyServiceConsumer], close_grace: int,
+                 codec: Optional[CodecInterface] = None, process_pool: Optional[Executor] = None):
+        super().__init__(config=config, service_consumers=service_consumers, close_grace=close_grace, codec=codec,
+                         process_pool=process_pool)
+        self._socket_directory = config.socket_directory
+        self._served: Set[str] = {consumer.queue_name for consumer in config.consumers + config.failed_consumers}
+        self._servers: Dict[str, asyncio.AbstractServer] = {}
+        self._client_writers: Set[asyncio.StreamWriter] = set()
+        self._connections: Dict[str, Connection] = {}
+        self._connection_locks: Dict[str, asyncio.Lock] = {}
+
+    @classmethod
+    async def initialize(cls, config: Dict[str, Any],
+                         service_consumers: Dict[str, AnyServiceConsumer],
+                         close_grace: int,
+                         process_pool: Optional[Executor] = None):
+        instance = await super().initialize(config=config, service_consumers=service_consumers,
+                                            close_grace=close_grace, process_pool=process_pool)
+        try:
+            await instance.start_servers()
+        except Exception:
+            await instance.close()
+            raise
+        return instance
+
+    def _get_path(self, queue_name: str) -> str:
+        return os.path.join(self._socket_directory, f'{queue_name}.sock')
+
+    async def start_servers(self) -> None:
+        os.makedirs(self._socket_directory, exist_ok=True)
+        for queue_name in sorted(self._served):
+            path = self._get_path(queue_name)
+            await self._remove_stale_socket(path)
+            self._servers[queue_name] = await asyncio.start_unix_server(
+                lambda reader, writer, queue=self._queues[queue_name]: self._receive(queue, reader, writer), path)
+
+    @staticmethod
+    async def _remove_stale_socket(path: str) -> None:
+        if not os.path.exists(path):
+            return
+        try:
+            _, writer = await asyncio.open_unix_connection(path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.unlink(path)
+            return
+        writer.close()
+        raise RuntimeError(f"Queue socket {path} is already served by other process.")
+
+    async def _receive(self, queue: asyncio.Queue, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._client_writers.add(writer)
+        try:
+            while True:
+                body_size, content_type_size = _FRAME_HEADER.unpack(await reader.readexactly(_FRAME_HEADER.size))
+                content_type = (await reader.readexactly(content_type_size)).decode('ascii')
+                body = await reader.readexactly(body_size)
+                await queue.put(QueuedMessage(body=body, content_type=content_type))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._client_writers.discard(writer)
+            writer.close()
+
+    async def _enqueue(self, queue_name: str, message: QueuedMessage) -> None:
+        if queue_name in self._served:
+            await super()._enqueue(queue_name, message)
+            return
+
+        content_type = message.content_type.encode('ascii')
+        frame = (_FRAME_HEADER.pack(len(message.body), len(content_type)), content_type, message.body)
+        lock = self._connection_locks.setdefault(queue_name, asyncio.Lock())
+        async with lock:
+            try:
+                _, writer = await self._get_connection(queue_name)
+                writer.writelines(frame)
+                await writer.drain()
+            except OSError:
+                self._connections.pop(queue_name, None)
+                raise
+
+    async def _get_connection(self, queue_name: str) -> Connection:
+        connection = self._connections.get(queue_name)
+        if connection is None or connection[1].is_closing():
+            connection = self._connections[queue_name] = await asyncio.open_unix_connection(self._get_path(queue_name))
+        return connection
+
+    async def close(self) -> None:
+        for server in self._servers.values():
+            server.close()
+        await super().close()
+        for connection in self._connections.values():
+            connection[1].close()
+        self._connections = {}
+        # Server waits for its client connections to be closed, publishers may keep them open.
+        for writer in self._client_writers:
+            writer.close()
+        self._client_writers = set()
+        for queue_name, server in self._servers.items():
+            await server.wait_closed()
+            os.unlink(self._get_path(queue_name))
+        self._servers = {}
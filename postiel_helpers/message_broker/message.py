@@ -1,13 +1,56 @@
+import importlib
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Type
+
+import msgpack
 
 from postiel_helpers.action.action import Action
+from postiel_helpers.codec.registry import DEFAULT_CONTENT_TYPE
 from postiel_helpers.model.data import DataModel
+from postiel_helpers.model.field import field
 
 
 class Message(DataModel):
     action: Action
     routing_config: Dict[str, Any]
     publish_datetime: Optional[datetime] = None
+    headers: Dict[str, Any] = field(default_factory=dict)
+    message_id: Optional[str] = None
+
+
+_ACTION_TYPES: Dict[str, Type[Action]] = {}
+
+
+def encode_message(message: Message, content_type: str = DEFAULT_CONTENT_TYPE) -> bytes:
+    """Encode message to be stored on disk. Action is serialized with codec, along with its type, so stored messages
+    are not pickled."""
+    action_type = type(message.action)
+    publish_datetime = message.publish_datetime.isoformat() if message.publish_datetime else None
+    return msgpack.packb([f'{action_type.__module__}:{action_type.__qualname__}', content_type,
+                          message.action.serialize(content_type), message.routing_config, publish_datetime,
+                          message.headers, message.message_id], use_bin_type=True)
+
+
+def decode_message(data: bytes) -> Message:
+    action_type, content_type, action, routing_config, publish_datetime, headers, message_id = msgpack.unpackb(
+        data, raw=False)
+    return Message.trusted(
+        action=_get_action_type(action_type).deserialize(action, content_type),
+        routing_config=routing_config,
+        publish_datetime=datetime.fromisoformat(publish_datetime) if publish_datetime else None,
+        headers=headers,
+        message_id=message_id)
 
 
+def _get_action_type(name: str) -> Type[Action]:
+    try:
+        return _ACTION_TYPES[name]
+    except KeyError:
+        module_name, _, qualname = name.partition(':')
+        action_type = importlib.import_module(module_name)
+        for attribute in qualname.split('.'):
+            action_type = getattr(action_type, attribute)
+        if not (isinstance(action_type, type) and issubclass(action_type, Action)):
+            raise ValueError(f"{name} is not an action type.")
+        _ACTION_TYPES[name] = action_type
+        return action_type
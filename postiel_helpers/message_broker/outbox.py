@@ -0,0 +1,186 @@
+"""Durable outbox. Messages that can not be published while broker is unavailable are appended to a log of memory
+mapped segment files, and are read back in order once broker is available again.
+
+Each record is the length of the message, encoded with the codec, followed by it. Segment files are preallocated with
+zeros so a zero length marks the end of written records. Read position is saved in a cursor file when records are
+acknowledged, and fully read segments are removed. Messages may be published twice if process stops between
+publishing them and saving the cursor, they keep their message id."""
+import mmap
+import os
+import struct
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Iterator, List, Tuple
+
+from postiel_helpers.message_broker.message import Message, decode_message, encode_message
+from postiel_helpers.model.data import DataModel
+
+_RECORD_HEADER = struct.Struct('>I')
+_SEGMENT_SUFFIX = '.segment'
+_CURSOR_FILENAME = 'cursor'
+
+Position = Tuple[int, int]
+
+
+class OutboxConfig(DataModel):
+    directory: str
+    segment_size: int = 16 * 1024 * 1024
+    max_size: int = 1024 * 1024 * 1024
+    batch_size: int = 100
+    retry_interval: float = 5.0
+
+
+class OutboxFullError(Exception):
+    pass
+
+
+@dataclass
+class Segment:
+    number: int
+    path: str
+    map: mmap.mmap
+    write_position: int = 0
+
+    @property
+    def size(self) -> int:
+        return len(self.map)
+
+    def get_records(self, position: int) -> Iterator[Tuple[int, int]]:
+        """Get start and end of written records from position."""
+        while position < self.write_position:
+            length, = _RECORD_HEADER.unpack_from(self.map, position)
+            start = position + _RECORD_HEADER.size
+            position = start + length
+            yield start, position
+
+
+class Outbox:
+    def __init__(self, config: OutboxConfig):
+        self._directory = config.directory
+        self._segment_size = config.segment_size
+        self._max_size = config.max_size
+        self._segments: Deque[Segment] = deque()
+        self._read_position = 0
+        self._count = 0
+        os.makedirs(self._directory, exist_ok=True)
+        self._load()
+
+    @property
+    def count(self) -> int:
+        """Number of messages not read yet."""
+        return self._count
+
+    @property
+    def size(self) -> int:
+        """Bytes of messages not read yet."""
+        return sum(segment.write_position for segment in self._segments) - self._read_position
+
+    @property
+    def disk_size(self) -> int:
+        return sum(segment.size for segment in self._segments)
+
+    def append(self, message: Message) -> None:
+        data = encode_message(message)
+        record_size = _RECORD_HEADER.size + len(data)
+        segment = self._segments[-1] if self._segments else None
+        # Free space for a zero header is kept after last record.
+        if segment is None or segment.write_position + record_size + _RECORD_HEADER.size > segment.size:
+            segment_size = max(self._segment_size, record_size + _RECORD_HEADER.size)
+            if self.disk_size + segment_size > self._max_size:
+                raise OutboxFullError(f"Outbox is full, {self.disk_size} bytes used.")
+            segment = self._create_segment(segment.number + 1 if segment else 0, segment_size)
+
+        position = segment.write_position
+        segment.map[position + _RECORD_HEADER.size:position + record_size] = data
+        segment.map[position:position + _RECORD_HEADER.size] = _RECORD_HEADER.pack(len(data))
+        segment.write_position += record_size
+        self._count += 1
+
+    def peek(self, count: int) -> Tuple[List[Message], Position]:
+        """Get up to count messages not read yet, and position to acknowledge them."""
+        messages = []
+        position = (self._segments[0].number, self._read_position) if self._segments else (0, 0)
+        for segment, start, end in self._get_records():
+            if len(messages) == count:
+                break
+            messages.append(decode_message(segment.map[start:end]))
+            position = (segment.number, end)
+        return messages, position
+
+    def _get_records(self) -> Iterator[Tuple[Segment, int, int]]:
+        position = self._read_position
+        for segment in self._segments:
+            for start, end in segment.get_records(position):
+                yield segment, start, end
+            position = 0
+
+    def ack(self, position: Position, count: int) -> None:
+        """Mark messages up to position as read."""
+        segment_number, self._read_position = position
+        while len(self._segments) > 1 and self._segments[0].number < segment_number:
+            self._remove_segment(self._segments.popleft())
+        self._count -= count
+        self._save_cursor()
+
+    def close(self) -> None:
+        self._save_cursor()
+        for segment in self._segments:
+            segment.map.flush()
+            segment.map.close()
+        self._segments.clear()
+
+    def _get_segment_path(self, number: int) -> str:
+        return os.path.join(self._directory, f'{number:020d}{_SEGMENT_SUFFIX}')
+
+    def _create_segment(self, number: int, size: int) -> Segment:
+        path = self._get_segment_path(number)
+        with open(path, 'w+b') as file:
+            file.truncate(size)
+            segment = Segment(number=number, path=path, map=mmap.mmap(file.fileno(), size))
+        self._segments.append(segment)
+        return segment
+
+    def _open_segment(self, number: int) -> Segment:
+        path = self._get_segment_path(number)
+        with open(path, 'r+b') as file:
+            segment = Segment(number=number, path=path, map=mmap.mmap(file.fileno(), 0))
+        while segment.write_position + _RECORD_HEADER.size <= segment.size:
+            length, = _RECORD_HEADER.unpack_from(segment.map, segment.write_position)
+            end = segment.write_position + _RECORD_HEADER.size + length
+            if not length or end > segment.size:
+                break
+            segment.write_position = end
+        return segment
+
+    @staticmethod
+    def _remove_segment(segment: Segment) -> None:
+        segment.map.close()
+        os.unlink(segment.path)
+
+    def _load(self) -> None:
+        numbers = sorted(int(filename[:-len(_SEGMENT_SUFFIX)]) for filename in os.listdir(self._directory)
+                         if filename.endswith(_SEGMENT_SUFFIX))
+        cursor_segment, cursor_position = self._load_cursor()
+        for number in numbers:
+            if number < cursor_segment:
+                os.unlink(self._get_segment_path(number))
+            else:
+                self._segments.append(self._open_segment(number))
+        if self._segments and self._segments[0].number == cursor_segment:
+            self._read_position = cursor_position
+        self._count = sum(1 for _ in self._get_records())
+
+    def _load_cursor(self) -> Position:
+        try:
+            with open(os.path.join(self._directory, _CURSOR_FILENAME)) as file:
+                segment_number, position = file.read().split()
+            return int(segment_number), int(position)
+        except FileNotFoundError:
+            return 0, 0
+
+    def _save_cursor(self) -> None:
+        segment_number = self._segments[0].number if self._segments else 0
+        path = os.path.join(self._directory, _CURSOR_FILENAME)
+        with open(f'{path}.tmp', 'w') as file:
+            file.write(f'{segment_number} {self._read_position}')
+        os.replace(f'{path}.tmp', path)
@@ -0,0 +1,68 @@
+"""Partitioning of messages by a key taken from their action, like channel ids, so messages with the same key are
+processed in order while messages with different keys are processed in parallel. Actions with a list key field, like
+posts for several channels, have a key per item, and they are processed in order with every message sharing any of
+their keys."""
+import asyncio
+import hashlib
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, List
+
+from postiel_helpers.action.action import Action
+from postiel_helpers.model.data import DataModel
+
+PARTITION_KEY_HEADER = 'x-partition-key'
+
+
+class OrderingConfig(DataModel):
+    key_field: str
+    lanes: int = 16
+
+
+def get_partition_keys(action: Action, key_field: str) -> List[str]:
+    """Get partition keys from action attribute. Key field can be a dotted path, list values have a key per item."""
+    value = action
+    for name in key_field.split('.'):
+        value = getattr(value, name)
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return list(dict.fromkeys(str(item) for item in value))
+    return [str(value)]
+
+
+def jump_hash(key: str, buckets: int) -> int:
+    """Jump consistent hash. When buckets are added only keys moved to the new buckets change their bucket."""
+    state = int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big')
+    bucket, next_bucket = -1, 0
+    while next_bucket < buckets:
+        bucket = next_bucket
+        state = (state * 2862933555777941757 + 1) & 0xffffffffffffffff
+        next_bucket = int((bucket + 1) * ((1 << 31) / ((state >> 33) + 1)))
+    return bucket
+
+
+class Lanes:
+    """Serial lanes. Messages with the same key always use the same lane, and each lane lets one message in at a time,
+    in arrival order. Messages with several keys queue in all their lanes at once, when they arrive, so they keep
+    their order in each lane and do not deadlock."""
+
+    def __init__(self, count: int):
+        self._lanes: List[Deque[asyncio.Event]] = [deque() for _ in range(count)]
+
+    def get_index(self, key: str) -> int:
+        return jump_hash(key, len(self._lanes))
+
+    @asynccontextmanager
+    async def enter(self, keys: List[str]) -> AsyncIterator[None]:
+        lanes = [self._lanes[index] for index in sorted({self.get_index(key) for key in keys})]
+        ticket = asyncio.Event()
+        for lane in lanes:
+            lane.append(ticket)
+        try:
+            for lane in lanes:
+                while lane[0] is not ticket:
+                    await lane[0].wait()
+            yield
+        finally:
+            for lane in lanes:
+                lane.remove(ticket)
+            ticket.set()
@@ -0,0 +1,69 @@
+"""Adaptive prefetch. Prefetch is sized so prefetched messages are enough for target buffer seconds of work, measured
+from handler service time. It only grows while queue has a backlog and changes at most by a factor of two per
+adjustment."""
+import math
+from dataclasses import dataclass
+from typing import Optional
+
+from postiel_helpers.model.data import DataModel
+
+
+class AdaptiveQOSConfig(DataModel):
+    min_prefetch: int = 1
+    max_prefetch: int = 1000
+    target_buffer_seconds: float = 1.0
+    interval: float = 5.0
+    smoothing: float = 0.2
+
+
+@dataclass
+class QOSStats:
+    prefetch_count: int
+    service_time: Optional[float] = None
+    queue_depth: Optional[int] = None
+    processed_messages: int = 0
+    increases: int = 0
+    decreases: int = 0
+
+
+class AdaptiveQOS:
+    def __init__(self, config: AdaptiveQOSConfig, prefetch_count: int, max_concurrency: Optional[int]):
+        self._config = config
+        self._max_concurrency = max_concurrency
+        self.stats = QOSStats(prefetch_count=self._clamp(prefetch_count))
+
+    def _clamp(self, prefetch_count: int) -> int:
+        return min(max(prefetch_count, self._config.min_prefetch), self._config.max_prefetch)
+
+    def record(self, service_time: float, messages: int = 1) -> None:
+        """Record time spent handling messages."""
+        service_time /= messages
+        self.stats.processed_messages += messages
+        if self.stats.service_time is None:
+            self.stats.service_time = service_time
+        else:
+            self.stats.service_time += self._config.smoothing * (service_time - self.stats.service_time)
+
+    def adjust(self, queue_depth: Optional[int]) -> Optional[int]:
+        """Get new prefetch count, or None when it must not change."""
+        self.stats.queue_depth = queue_depth
+        service_time = self.stats.service_time
+        if service_time is None:
+            return None
+
+        prefetch_count = self.stats.prefetch_count
+        concurrency = min(self._max_concurrency or prefetch_count, prefetch_count)
+        desired = self._config.target_buffer_seconds * concurrency / max(service_time, 1e-6)
+        if not queue_depth:
+            desired = min(desired, prefetch_count)
+        desired = min(max(desired, prefetch_count / 2), prefetch_count * 2)
+        new_prefetch_count = self._clamp(math.ceil(desired))
+
+        if new_prefetch_count == prefetch_count:
+            return None
+        if new_prefetch_count > prefetch_count:
+            self.stats.increases += 1
+        else:
+            self.stats.decreases += 1
+        self.stats.prefetch_count = new_prefetch_count
+        return new_prefetch_count
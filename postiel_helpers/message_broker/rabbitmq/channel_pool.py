@@ -0,0 +1,76 @@
+import asyncio
+import itertools
+import logging
+from enum import Enum
+from typing import Dict, List, Optional
+
+from aio_pika import Channel, Exchange
+from aio_pika.robust_connection import ConnectionType
+from pydantic import conint
+
+from postiel_helpers.message_broker.partition import jump_hash
+from postiel_helpers.message_broker.rabbitmq.publisher import Publisher, PublisherConfig
+from postiel_helpers.model.data import DataModel
+
+
+class ChannelSelection(str, Enum):
+    ROUND_ROBIN = 'round_robin'
+    LEAST_BUSY = 'least_busy'
+
+
+class ChannelPoolConfig(DataModel):
+    connections: conint(ge=1) = 1
+    publisher_channels: conint(ge=1) = 1
+    selection: ChannelSelection = ChannelSelection.ROUND_ROBIN
+
+
+class PublisherChannel:
+    """Channel used to publish, with its own publisher confirm window and exchange cache."""
+
+    def __init__(self, channel: Channel, publisher: Publisher):
+        self.channel = channel
+        self.publisher = publisher
+        self._exchanges: Dict[str, Exchange] = {}
+
+    async def get_exchange(self, exchange_name: str) -> Exchange:
+        if not exchange_name:
+            return self.channel.default_exchange
+        try:
+            return self._exchanges[exchange_name]
+        except KeyError:
+            exchange = self._exchanges[exchange_name] = await self.channel.get_exchange(exchange_name)
+            return exchange
+
+
+class ChannelPool:
+    def __init__(self, channels: List[PublisherChannel], selection: ChannelSelection):
+        self._channels = channels
+        self._round_robin = itertools.cycle(channels)
+        self._selection = selection
+
+    @classmethod
+    async def create(cls, connections: List[ConnectionType], config: ChannelPoolConfig,
+                     publisher_config: PublisherConfig, logger: logging.Logger) -> 'ChannelPool':
+        channels = await asyncio.gather(*[connections[index % len(connections)].channel()
+                                          for index in range(config.publisher_channels)])
+        return cls(channels=[PublisherChannel(channel, Publisher(publisher_config, logger)) for channel in channels],
+                   selection=config.selection)
+
+    def get(self, key: Optional[str] = None) -> PublisherChannel:
+        """Get channel to publish. Messages with the same key always use the same channel, so they keep their
+        order."""
+        if key is not None:
+            return self._channels[jump_hash(key, len(self._channels))]
+        if self._selection == ChannelSelection.LEAST_BUSY:
+            return min(self._channels, key=lambda channel: channel.publisher.in_flight)
+        return next(self._round_robin)
+
+    @property
+    def in_flight(self) -> int:
+        return sum(channel.publisher.in_flight for channel in self._channels)
+
+    async def flush(self) -> None:
+        await asyncio.gather(*[channel.publisher.flush() for channel in self._channels])
+
+    async def close(self) -> None:
+        await asyncio.gather(*[channel.channel.close() for channel in self._channels])
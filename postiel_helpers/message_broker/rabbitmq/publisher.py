@@ -0,0 +1,44 @@
+import asyncio
+import logging
+from typing import Set
+
+import aio_pika
+from aio_pika import Exchange
+
+from postiel_helpers.model.data import DataModel
+
+
+class PublisherConfig(DataModel):
+    max_unconfirmed: int = 256
+    buffered: bool = False
+
+
+class Publisher:
+    """Publish messages keeping a bounded window of publishes waiting for publisher confirm. Publish only waits while
+    window is full, returned future is resolved when broker confirms message."""
+
+    def __init__(self, config: PublisherConfig, logger: logging.Logger):
+        self._logger = logger
+        self._window = asyncio.Semaphore(config.max_unconfirmed)
+        self._in_flight: Set[asyncio.Future] = set()
+        self.buffered = config.buffered
+
+    async def publish(self, exchange: Exchange, message: aio_pika.Message, routing_key: str) -> asyncio.Future:
+        await self._window.acquire()
+        confirmation = asyncio.ensure_future(exchange.publish(message, routing_key=routing_key))
+        self._in_flight.add(confirmation)
+        confirmation.add_done_callback(self._on_confirmation)
+        return confirmation
+
+    def _on_confirmation(self, confirmation: asyncio.Future) -> None:
+        self._in_flight.discard(confirmation)
+        self._window.release()
+        if self.buffered and not confirmation.cancelled() and confirmation.exception():
+            self._logger.error("Buffered message not published.", exc_info=confirmation.exception())
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    async def flush(self) -> None:
+        await asyncio.gather(*self._in_flight, return_exceptions=True)
@@ -1,33 +1,50 @@
 import asyncio
+import dataclasses
 import logging
+import time
 import uuid
+from concurrent.futures import Executor
+from contextlib import AsyncExitStack
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timedelta
 from functools import partial
-from typing import Any, Callable, List, Dict, Optional, Union
+from typing import Any, List, Dict, Optional, Set, Union
 
 import aio_pika
-from aio_pika import ExchangeType, Channel, Exchange, Queue
+from aio_pika import ExchangeType, Channel, Queue
 from aio_pika.robust_connection import ConnectionType
 from aio_pika.types import TimeoutType
-from async_lru import alru_cache
 from pydantic import validator
 
 from postiel_helpers.action.action import Action
-from postiel_helpers.message_broker.service_consumer import ServiceConsumer
+from postiel_helpers.codec.compression import Compression, CompressionConfig, CompressionStats
+from postiel_helpers.codec.interface import CodecInterface
+from postiel_helpers.codec.registry import CODECS, DEFAULT_CONTENT_TYPE, get_codec
+from postiel_helpers.message_broker.claim_check import ClaimCheck, ClaimCheckConfig
+from postiel_helpers.message_broker.batch import BatchConfig, Batcher
+from postiel_helpers.message_broker.dedup import DedupCache, DedupConfig
+from postiel_helpers.message_broker.in_flight import InFlightTracker
+from postiel_helpers.message_broker.outbox import Outbox, OutboxConfig
+from postiel_helpers.message_broker.partition import Lanes, OrderingConfig, PARTITION_KEY_HEADER, \
+    get_partition_keys, jump_hash
+from postiel_helpers.message_broker.rate_limit import RateLimiter
+from postiel_helpers.message_broker.retry import ATTEMPT_HEADER, RetryConfig
+from postiel_helpers.message_broker.service_consumer import AnyServiceConsumer, BatchServiceConsumer, PartialBatchError
+from postiel_helpers.message_broker.worker import decode_action, run_consumer
 from postiel_helpers.message_broker.interface import MessageBrokerInterface
 
 from postiel_helpers.message_broker.message import Message
+from postiel_helpers.message_broker.rabbitmq.adaptive_qos import AdaptiveQOS, AdaptiveQOSConfig, QOSStats
+from postiel_helpers.message_broker.rabbitmq.channel_pool import ChannelPool, ChannelPoolConfig
+from postiel_helpers.message_broker.rabbitmq.publisher import PublisherConfig
+from postiel_helpers.message_broker.routing import BindingConfig, RoutingConfig, get_routing_config
+from postiel_helpers.message_broker.scheduler import Scheduler, SchedulerConfig
 from postiel_helpers.model.data import DataModel
 from postiel_helpers.model.field import field
 
-
-@dataclass
-class ConsumerData:
-    channel: Channel
-    queue: aio_pika.Queue
-    consumer_tag: str
-    task: asyncio.Task
+ORIGINAL_EXCHANGE_HEADER = 'x-original-exchange'
+ORIGINAL_ROUTING_KEY_HEADER = 'x-original-routing-key'
+PUBLISH_ERRORS = (ConnectionError, asyncio.TimeoutError, aio_pika.exceptions.AMQPError)
 
 
 class RabbitMQConnectionConfig(DataModel):
@@ -68,12 +85,6 @@ class ExchangeConfig(DataModel):
     timeout: TimeoutType = None
 
 
-class BindingConfig(DataModel):
-    queue_name: str
-    exchange_name: str
-    routing_key: str = ''
-
-
 class CreateConfig(DataModel):
     queues: List[QueueConfig] = field(default_factory=list)
     exchanges: List[ExchangeConfig] = field(default_factory=list)
@@ -96,16 +107,60 @@ class QOS(DataModel):
     timeout: TimeoutType = None
 
 
-class RoutingConfig(DataModel):
-    routing_key: str
-    exchange_name: str
-
-
 class ConsumerConfig(DataModel):
     qos: QOS = field(default_factory=QOS)
     queue_name: str
     consumer_name: str
     failed_message_routing: Optional[RoutingConfig] = None
+    max_concurrency: Optional[int] = None
+    handler_timeout: Optional[float] = None
+    batch: Optional[BatchConfig] = None
+    adaptive_qos: Optional[AdaptiveQOSConfig] = None
+    retry: Optional[RetryConfig] = None
+    dedup: Optional[DedupConfig] = None
+    ordering: Optional[OrderingConfig] = None
+    # Large byte fields are decoded as memoryview slices of the message body. Handlers must not keep them after
+    # returning nor pickle or deep copy actions holding them.
+    zero_copy: bool = False
+
+    @validator('ordering')
+    def check_ordering(cls, ordering, values):
+        assert not (ordering and values.get('batch')), "Batch consumers can not be ordered."
+        return ordering
+
+
+@dataclass
+class ConsumerData:
+    config: ConsumerConfig
+    service_consumer: AnyServiceConsumer
+    channel: Channel
+    queue: aio_pika.Queue
+    consumer_tag: str
+    task: Optional[asyncio.Task] = None
+    semaphore: Optional[asyncio.Semaphore] = None
+    batcher: Optional[Batcher[aio_pika.IncomingMessage]] = None
+    in_flight: InFlightTracker = dataclasses.field(default_factory=InFlightTracker)
+    adaptive_qos: Optional[AdaptiveQOS] = None
+    adaptive_qos_task: Optional[asyncio.Task] = None
+    dedup: Optional[DedupCache] = None
+    lanes: Optional[Lanes] = None
+
+
+class FailedReplayConfig(DataModel):
+    rate: Optional[float] = None
+    concurrency: int = 1
+    progress_interval: float = 5.0
+
+
+@dataclass
+class ReplayStats:
+    total: int
+    replayed: int = 0
+    failed: int = 0
+
+    @property
+    def done(self) -> int:
+        return self.replayed + self.failed
 
 
 class RabbitMQConfig(DataModel):
@@ -114,6 +169,19 @@ class RabbitMQConfig(DataModel):
     create: CreateConfig = field(default_factory=CreateConfig)
     consumers: List[ConsumerConfig] = field(default_factory=list)
     failed_consumers: List[ConsumerConfig] = field(default_factory=list)
+    content_type: str = DEFAULT_CONTENT_TYPE
+    claim_check: Optional[ClaimCheckConfig] = None
+    compression: Optional[CompressionConfig] = None
+    publisher: PublisherConfig = field(default_factory=PublisherConfig)
+    channel_pool: ChannelPoolConfig = field(default_factory=ChannelPoolConfig)
+    scheduler: Optional[SchedulerConfig] = None
+    failed_replay: FailedReplayConfig = field(default_factory=FailedReplayConfig)
+    outbox: Optional[OutboxConfig] = None
+
+    @validator('content_type')
+    def check_content_type(cls, content_type):
+        assert content_type in CODECS, f"Codec for content type {content_type} is not available."
+        return content_type
 
     @validator('consumers')
     def check_failed_message_routing(cls, consumers, values):
@@ -124,98 +192,471 @@ class RabbitMQConfig(DataModel):
 
 
 class RabbitMQ(MessageBrokerInterface):
-    def __init__(self, connection: ConnectionType, default_channel: Channel, common_config: RabbitMQCommonConfig,
-                 service_consumers: Dict[str, ServiceConsumer], close_grace: int):
+    def __init__(self, connections: List[ConnectionType], channel_pool: ChannelPool,
+                 common_config: RabbitMQCommonConfig, service_consumers: Dict[str, AnyServiceConsumer],
+                 close_grace: int, codec: CodecInterface, publisher_config: PublisherConfig,
+                 claim_check: Optional[ClaimCheck] = None, compression: Optional[Compression] = None,
+                 process_pool: Optional[Executor] = None, scheduler_config: Optional[SchedulerConfig] = None,
+                 failed_consumers: Optional[List[ConsumerConfig]] = None,
+                 failed_replay_config: Optional[FailedReplayConfig] = None,
+                 outbox_config: Optional[OutboxConfig] = None):
         super().__init__()
         self._logger = logging.getLogger(common_config.logger_name)
-        self._connection = connection
-        self._default_channel = default_channel
+        self._connections = connections
+        self._channel_pool = channel_pool
         self._consumers: List[ConsumerData] = []
         self._service_consumers = service_consumers
         self._close_grace = close_grace
+        self._codec = codec
+        self._claim_check = claim_check
+        self._compression = compression
+        self._process_pool = process_pool
+        self._buffered = publisher_config.buffered
+        self._scheduler = Scheduler(self.send_message, scheduler_config, self._logger) if scheduler_config else None
+        self._failed_consumers = failed_consumers or []
+        self._failed_replay_config = failed_replay_config or FailedReplayConfig()
+        self._replay_stats: Dict[str, ReplayStats] = {}
+        self._retry_queues: Set[str] = set()
+        self._config: Optional[RabbitMQConfig] = None
+        self._outbox_config = outbox_config
+        self._outbox = Outbox(outbox_config) if outbox_config else None
+        self._outbox_added = asyncio.Event()
+        self._outbox_task: Optional[asyncio.Task] = None
 
     @classmethod
     async def initialize(cls, config: Dict[str, Any],
-                         service_consumers: Dict[str, ServiceConsumer],
-                         close_grace: int):
-        async def check_consumer_name_available(consumers: List[ConsumerConfig], service_consumers: Dict[str, ServiceConsumer]):
-            for consumer in consumers:
-                assert consumer.consumer_name in service_consumers, f"Consumer {consumer.consumer_name} " \
-                                                                    f"is not available."
-
+                         service_consumers: Dict[str, AnyServiceConsumer],
+                         close_grace: int,
+                         process_pool: Optional[Executor] = None):
         config = RabbitMQConfig.parse_obj(config)
-        await check_consumer_name_available(config.consumers, service_consumers)
-        await check_consumer_name_available(config.failed_consumers, service_consumers)
-
-        connection = await aio_pika.connect_robust(**config.connection.dict())
-        default_channel = await connection.channel()
-
-        await cls._declare_config(default_channel, config.create)
-        instance = cls(connection=connection,
-                       default_channel=default_channel,
+        cls._check_consumer_name_available(config.consumers, service_consumers)
+        cls._check_consumer_name_available(config.failed_consumers, service_consumers)
+
+        connections = await asyncio.gather(*[aio_pika.connect_robust(**config.connection.dict())
+                                             for _ in range(config.channel_pool.connections)])
+        channel_pool = await ChannelPool.create(connections=connections,
+                                                config=config.channel_pool,
+                                                publisher_config=config.publisher,
+                                                logger=logging.getLogger(config.common.logger_name))
+
+        await cls._declare_config(channel_pool.get().channel, config.create)
+        instance = cls(connections=connections,
+                       channel_pool=channel_pool,
                        common_config=config.common,
                        service_consumers=service_consumers,
-                       close_grace=close_grace
+                       close_grace=close_grace,
+                       codec=get_codec(config.content_type),
+                       publisher_config=config.publisher,
+                       claim_check=ClaimCheck(config.claim_check) if config.claim_check else None,
+                       compression=Compression(config.compression) if config.compression else None,
+                       process_pool=process_pool,
+                       scheduler_config=config.scheduler,
+                       failed_consumers=config.failed_consumers,
+                       failed_replay_config=config.failed_replay,
+                       outbox_config=config.outbox
                        )
+        if instance._outbox:
+            instance._outbox_task = asyncio.create_task(instance._drain_outbox())
+        if instance._scheduler:
+            await instance._scheduler.start()
+        instance._config = config
         await instance.create_consumers(config.consumers)
 
         return instance
 
+    @staticmethod
+    def _check_consumer_name_available(consumers: List[ConsumerConfig],
+                                       service_consumers: Dict[str, AnyServiceConsumer]) -> None:
+        for consumer in consumers:
+            assert consumer.consumer_name in service_consumers, f"Consumer {consumer.consumer_name} " \
+                                                                f"is not available."
+            is_batch_consumer = isinstance(service_consumers[consumer.consumer_name], BatchServiceConsumer)
+            assert is_batch_consumer == bool(consumer.batch), f"Consumer {consumer.consumer_name} batch config " \
+                                                              f"does not match its service consumer."
+
+    async def reload(self, config: Dict[str, Any]) -> bool:
+        """Apply config without reconnecting when only declared topology and consumers changed. Topology is declared
+        again and only removed or changed consumers are closed, after their messages in flight are processed."""
+        config = RabbitMQConfig.parse_obj(config)
+        reloaded_fields = {'create', 'consumers', 'failed_consumers'}
+        if self._config is None or config.dict(exclude=reloaded_fields) != self._config.dict(exclude=reloaded_fields):
+            return False
+        self._check_consumer_name_available(config.consumers, self._service_consumers)
+        self._check_consumer_name_available(config.failed_consumers, self._service_consumers)
+
+        if config.create != self._config.create:
+            await self._declare_config(self._channel_pool.get().channel, config.create)
+
+        kept_consumers = [consumer for consumer in self._consumers if consumer.config in config.consumers]
+        removed_consumers = [consumer for consumer in self._consumers if consumer.config not in config.consumers]
+        kept_configs = [consumer.config for consumer in kept_consumers]
+        added_configs = [consumer_config for consumer_config in config.consumers
+                         if consumer_config not in kept_configs]
+        self._logger.info('Reloading consumers, %s kept, %s removed, %s added', len(kept_consumers),
+                          len(removed_consumers), len(added_configs))
+
+        await self._close_consumers(removed_consumers)
+        self._consumers = kept_consumers + await self._create_consumers(added_configs, offset=len(kept_consumers))
+        self._failed_consumers = config.failed_consumers
+        self._config = config
+        return True
+
+    @property
+    def compression_stats(self) -> Optional[CompressionStats]:
+        return self._compression.stats if self._compression else None
+
+    @property
+    def qos_stats(self) -> Dict[str, QOSStats]:
+        return {consumer.config.consumer_name: consumer.adaptive_qos.stats
+                for consumer in self._consumers if consumer.adaptive_qos}
+
+    @property
+    def outbox_size(self) -> Optional[int]:
+        """Bytes of messages waiting in outbox to be published."""
+        return self._outbox.size if self._outbox else None
+
+    @property
+    def replay_stats(self) -> Dict[str, ReplayStats]:
+        """Stats of last failed messages replay, by failed queue name."""
+        return self._replay_stats
+
     @staticmethod
     async def _get_consumer_tag() -> str:
         return uuid.uuid4().hex
 
-    async def _process_message(self, func: Callable, action_type: Action, failed_routing_config: Optional[RoutingConfig],
-                               message: aio_pika.IncomingMessage,
-                               ) -> None:
+    async def _process_message(self, consumer: ConsumerData, message: aio_pika.IncomingMessage) -> None:
+        if consumer.dedup and message.message_id and consumer.dedup.seen(message.message_id):
+            self._logger.debug("Message %s already processed, it will be skipped.", message.message_id)
+            await message.ack()
+            return
+
+        consumer.in_flight.add()
+        if consumer.batcher:
+            consumer.batcher.add(message)
+            return
+
+        try:
+            async with AsyncExitStack() as stack:
+                if consumer.lanes:
+                    # Lane is entered before any wait, so messages get in their lane in delivery order.
+                    await stack.enter_async_context(consumer.lanes.enter(self._get_partition_keys(consumer, message)))
+                if consumer.semaphore:
+                    await stack.enter_async_context(consumer.semaphore)
+                await self._handle_message(consumer, message)
+        finally:
+            consumer.in_flight.done()
+
+    def _get_partition_keys(self, consumer: ConsumerData, message: aio_pika.IncomingMessage) -> List[str]:
+        """Get partition keys from message header, or from action when publisher did not send them."""
+        partition_keys = (message.headers or {}).get(PARTITION_KEY_HEADER)
+        if isinstance(partition_keys, (list, tuple)):
+            return [str(partition_key) for partition_key in partition_keys]
+        if partition_keys is not None:
+            return [str(partition_keys)]
+        try:
+            return get_partition_keys(self._decode_action(consumer, message), consumer.config.ordering.key_field)
+        except Exception:
+            self._logger.exception("Partition key can not be taken from message.")
+            return ['']
+
+    async def _handle_message(self, consumer: ConsumerData, message: aio_pika.IncomingMessage) -> None:
+        start = time.monotonic()
+        try:
+            await self._run_message_handler(consumer, message)
+        finally:
+            if consumer.adaptive_qos:
+                consumer.adaptive_qos.record(time.monotonic() - start)
+
+    async def _run_message_handler(self, consumer: ConsumerData, message: aio_pika.IncomingMessage) -> None:
+        service_consumer = consumer.service_consumer
         async with message.process():
-            action = action_type.deserialize(message.body)
+            action = None
+            if service_consumer.cpu_bound and self._process_pool:
+                handler = asyncio.get_running_loop().run_in_executor(self._process_pool, partial(
+                    run_consumer, service_consumer.func, service_consumer.action_type, message.body,
+                    message.content_type, message.content_encoding, consumer.config.zero_copy, self._claim_check))
+            else:
+                action = await self._get_action(consumer, message)
+                handler = service_consumer.run(action)
             try:
-                await func(action)
+                await asyncio.wait_for(handler, timeout=consumer.config.handler_timeout)
+                self._set_processed(consumer, message)
+                return
+            except asyncio.TimeoutError:
+                self._logger.error("Message processing timed out after %s seconds.", consumer.config.handler_timeout)
             except Exception:
                 self._logger.exception("Unexpected error, on message processing.")
-                if failed_routing_config:
-                    failed_message = Message(
-                        action=action,
-                        routing_config=failed_routing_config.dict()
-                    )
-                    await self.send_message(failed_message)
 
-                else:
-                    self._logger.debug("Error detected but no failed routing config loaded. Message will be discarded.")
+            if action is None:
+                action = self._decode_action(consumer, message)
+            await self._retry_or_fail(consumer.config, action, message)
+
+    @staticmethod
+    def _set_processed(consumer: ConsumerData, message: aio_pika.IncomingMessage) -> None:
+        if consumer.dedup and message.message_id:
+            consumer.dedup.add(message.message_id)
+
+    async def _get_action(self, consumer: ConsumerData, message: aio_pika.IncomingMessage) -> Action:
+        """Decode action for handlers, with checked in file data loaded back."""
+        action = self._decode_action(consumer, message)
+        if self._claim_check:
+            action = await self._claim_check.check_out(action)
+        return action
+
+    @staticmethod
+    def _decode_action(consumer: ConsumerData, message: aio_pika.IncomingMessage) -> Action:
+        return decode_action(message.body, message.content_type, message.content_encoding,
+                             consumer.service_consumer.action_type, consumer.config.zero_copy)
+
+    async def _process_batch(self, consumer: ConsumerData, messages: List[aio_pika.IncomingMessage]) -> None:
+        start = time.monotonic()
+        try:
+            await self._handle_batch(consumer, messages)
+        finally:
+            consumer.in_flight.done(len(messages))
+            if consumer.adaptive_qos:
+                consumer.adaptive_qos.record(time.monotonic() - start, len(messages))
+
+    async def _handle_batch(self, consumer: ConsumerData, messages: List[aio_pika.IncomingMessage]) -> None:
+        actions = []
+        decoded_messages = []
+        for message in messages:
+            try:
+                actions.append(await self._get_action(consumer, message))
+                decoded_messages.append(message)
+            except Exception:
+                self._logger.exception("Message can not be decoded.")
+                await message.reject()
+
+        failed_indexes = set()
+        try:
+            await asyncio.wait_for(consumer.service_consumer.func(actions), timeout=consumer.config.handler_timeout)
+        except PartialBatchError as err:
+            self._logger.error("Batch processing failed for %s of %s actions.", len(err.failed_indexes), len(actions))
+            failed_indexes = set(err.failed_indexes)
+        except asyncio.TimeoutError:
+            self._logger.error("Batch processing timed out after %s seconds.", consumer.config.handler_timeout)
+            failed_indexes = set(range(len(actions)))
+        except Exception:
+            self._logger.exception("Unexpected error, on batch processing.")
+            failed_indexes = set(range(len(actions)))
+
+        processed_messages = []
+        for index, (message, action) in enumerate(zip(decoded_messages, actions)):
+            if index in failed_indexes and not self._can_retry(consumer.config, message) \
+                    and not consumer.config.failed_message_routing:
+                self._logger.debug("Error detected but no failed routing config loaded. Message will be rejected.")
+                await message.reject()
+                continue
+            if index in failed_indexes:
+                await self._retry_or_fail(consumer.config, action, message)
+            else:
+                self._set_processed(consumer, message)
+            processed_messages.append(message)
+
+        if processed_messages:
+            await processed_messages[-1].ack(multiple=True)
+
+    @staticmethod
+    def _get_attempt(message: aio_pika.IncomingMessage) -> int:
+        return int((message.headers or {}).get(ATTEMPT_HEADER, 1))
+
+    def _can_retry(self, consumer_config: ConsumerConfig, message: aio_pika.IncomingMessage) -> bool:
+        return bool(consumer_config.retry) and self._get_attempt(message) < consumer_config.retry.max_attempts
+
+    async def _retry_or_fail(self, consumer_config: ConsumerConfig, action: Action,
+                             message: aio_pika.IncomingMessage) -> None:
+        if self._can_retry(consumer_config, message):
+            await self._retry(consumer_config, action, self._get_attempt(message), message.message_id)
+        else:
+            await self._send_failed_message(consumer_config, action, message)
+
+    async def _retry(self, consumer_config: ConsumerConfig, action: Action, attempt: int,
+                     message_id: Optional[str] = None) -> None:
+        """Publish action again to consumer queue, through default exchange, after retry delay. Delay is done by
+        scheduler when it is configured and otherwise by a delay queue per delay tier, whose expired messages are
+        dead lettered to consumer queue. Retried message keeps message id."""
+        retry_config = consumer_config.retry
+        delay = retry_config.get_jittered_delay(attempt)
+        headers = {ATTEMPT_HEADER: attempt + 1}
+        self._logger.debug("Message will be retried in %.2f seconds, attempt %s of %s.", delay, attempt + 1,
+                           retry_config.max_attempts)
+        if self._scheduler:
+            await self._scheduler.schedule(Message.trusted(
+                action=action,
+                routing_config={'exchange_name': '', 'routing_key': consumer_config.queue_name},
+                publish_datetime=datetime.now() + timedelta(seconds=delay),
+                headers=headers,
+                message_id=message_id))
+            return
+
+        retry_queue_name = await self._declare_retry_queue(consumer_config.queue_name,
+                                                           retry_config.get_delay(attempt))
+        retry_message = Message.trusted(action=action,
+                                        routing_config={'exchange_name': '', 'routing_key': retry_queue_name},
+                                        headers=headers,
+                                        message_id=message_id)
+        confirmation = await self._publish(retry_message, expiration=delay)
+        if not self._buffered:
+            await confirmation
+
+    async def _declare_retry_queue(self, queue_name: str, delay: float) -> str:
+        delay_ms = int(delay * 1000)
+        retry_queue_name = f'{queue_name}.retry.{delay_ms}'
+        if retry_queue_name not in self._retry_queues:
+            await self._channel_pool.get().channel.declare_queue(retry_queue_name, durable=True, arguments={
+                'x-message-ttl': delay_ms,
+                'x-dead-letter-exchange': '',
+                'x-dead-letter-routing-key': queue_name,
+            })
+            self._retry_queues.add(retry_queue_name)
+        return retry_queue_name
+
+    async def _send_failed_message(self, consumer_config: ConsumerConfig, action: Action,
+                                   message: aio_pika.IncomingMessage) -> None:
+        if consumer_config.failed_message_routing:
+            failed_message = Message.trusted(
+                action=action,
+                routing_config=consumer_config.failed_message_routing.dict(),
+                # Original routing is kept, so failed messages can be replayed.
+                headers={ORIGINAL_EXCHANGE_HEADER: message.exchange, ORIGINAL_ROUTING_KEY_HEADER: message.routing_key},
+                message_id=message.message_id
+            )
+            confirmation = await self._publish(failed_message)
+            if not self._buffered:
+                await confirmation
+
+        else:
+            self._logger.debug("Error detected but no failed routing config loaded. Message will be discarded.")
 
     async def load_failed(self) -> None:
-        pass
+        """Replay messages of failed consumers queues to their original routing. Messages failed without original
+        routing are processed by failed consumer. Only messages queued when replay starts are replayed."""
+        for consumer_config in self._failed_consumers:
+            await self._replay_failed(consumer_config)
+
+    async def _replay_failed(self, consumer_config: ConsumerConfig) -> None:
+        replay_config = self._failed_replay_config
+        channel = self._channel_pool.get().channel
+        queue = await channel.get_queue(consumer_config.queue_name)
+        stats = self._replay_stats[consumer_config.queue_name] = ReplayStats(
+            total=(await queue.declare()).message_count)
+        consumer = ConsumerData(config=consumer_config,
+                                service_consumer=self._service_consumers[consumer_config.consumer_name],
+                                channel=channel, queue=queue, consumer_tag='')
+        rate_limiter = RateLimiter(replay_config.rate)
+        remaining = stats.total
+
+        async def replay() -> None:
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                await rate_limiter.wait()
+                message = await queue.get(fail=False)
+                if message is None:
+                    return
+                await self._replay_message(consumer, message, stats)
+
+        self._logger.info('Replaying %s failed messages from %s', stats.total, consumer_config.queue_name)
+        progress = asyncio.create_task(self._log_replay_progress(consumer_config.queue_name, stats))
+        try:
+            await asyncio.gather(*[replay() for _ in range(replay_config.concurrency)])
+        finally:
+            progress.cancel()
+        self._logger.info('Replayed %s failed messages from %s, %s failed', stats.replayed,
+                          consumer_config.queue_name, stats.failed)
+
+    async def _log_replay_progress(self, queue_name: str, stats: ReplayStats) -> None:
+        while True:
+            await asyncio.sleep(self._failed_replay_config.progress_interval)
+            self._logger.info('Replayed %s of %s failed messages from %s', stats.done, stats.total, queue_name)
+
+    async def _replay_message(self, consumer: ConsumerData, message: aio_pika.IncomingMessage,
+                              stats: ReplayStats) -> None:
+        headers = dict(message.headers or {})
+        exchange_name = headers.pop(ORIGINAL_EXCHANGE_HEADER, None)
+        routing_key = headers.pop(ORIGINAL_ROUTING_KEY_HEADER, None)
+        try:
+            if exchange_name is None:
+                await self._run_message_handler(consumer, message)
+            else:
+                publisher_channel = self._channel_pool.get()
+                exchange = await publisher_channel.get_exchange(exchange_name)
+                confirmation = await publisher_channel.publisher.publish(
+                    exchange,
+                    aio_pika.Message(
+                        headers=headers,
+                        content_type=message.content_type,
+                        content_encoding=message.content_encoding,
+                        message_id=message.message_id,
+                        body=message.body),
+                    routing_key=routing_key)
+                await confirmation
+                await message.ack()
+            stats.replayed += 1
+        except Exception:
+            self._logger.exception("Failed message can not be replayed.")
+            stats.failed += 1
+            await message.nack(requeue=True)
 
     async def create_consumers(self, consumers_config: List[ConsumerConfig]):
-        self._consumers = await asyncio.gather(
-            *[self._create_consumer(consumer_config) for consumer_config in consumers_config])
-
-    async def _create_consumer(self, consumer_config: ConsumerConfig) -> ConsumerData:
-        channel = await self._connection.channel()
-        await channel.set_qos(**consumer_config.qos.dict())
+        self._consumers = await self._create_consumers(consumers_config)
+
+    async def _create_consumers(self, consumers_config: List[ConsumerConfig], offset: int = 0) -> List[ConsumerData]:
+        return list(await asyncio.gather(
+            *[self._create_consumer(consumer_config, self._connections[index % len(self._connections)])
+              for index, consumer_config in enumerate(consumers_config, start=offset)]))
+
+    async def _create_consumer(self, consumer_config: ConsumerConfig, connection: ConnectionType) -> ConsumerData:
+        channel = await connection.channel()
+        adaptive_qos = None
+        if consumer_config.adaptive_qos:
+            # Channel is not shared, so channel wide prefetch is used to be able to change it for running consumer.
+            adaptive_qos = AdaptiveQOS(consumer_config.adaptive_qos, consumer_config.qos.prefetch_count,
+                                       consumer_config.max_concurrency)
+            await channel.set_qos(prefetch_count=adaptive_qos.stats.prefetch_count, global_=True)
+        else:
+            await channel.set_qos(**consumer_config.qos.dict())
         consumer_queue = await channel.get_queue(consumer_config.queue_name)
         consumer_tag = await self._get_consumer_tag()
-        consumer_service_config = self._service_consumers[consumer_config.consumer_name]
-        partial_function = partial(
-            self._process_message,
-            consumer_service_config.func,
-            consumer_service_config.action_type,
-            consumer_config.failed_message_routing
+        consumer = ConsumerData(
+            config=consumer_config,
+            service_consumer=self._service_consumers[consumer_config.consumer_name],
+            queue=consumer_queue,
+            consumer_tag=consumer_tag,
+            channel=channel,
+            semaphore=asyncio.Semaphore(consumer_config.max_concurrency) if consumer_config.max_concurrency else None,
+            adaptive_qos=adaptive_qos,
+            dedup=DedupCache(consumer_config.dedup) if consumer_config.dedup else None,
+            lanes=Lanes(consumer_config.ordering.lanes) if consumer_config.ordering else None
         )
-        task = asyncio.create_task(
+        if adaptive_qos:
+            consumer.adaptive_qos_task = asyncio.create_task(self._adapt_qos(consumer))
+        if consumer_config.batch:
+            consumer.batcher = Batcher(consumer_config.batch, partial(self._process_batch, consumer))
+        consumer.task = asyncio.create_task(
             consumer_queue.consume(
-                partial_function,
+                partial(self._process_message, consumer),
                 consumer_tag=consumer_tag,
             )
         )
 
-        return ConsumerData(
-            queue=consumer_queue,
-            consumer_tag=consumer_tag,
-            task=task,
-            channel=channel
-        )
+        return consumer
+
+    async def _adapt_qos(self, consumer: ConsumerData) -> None:
+        while True:
+            await asyncio.sleep(consumer.config.adaptive_qos.interval)
+            try:
+                queue_depth = (await consumer.queue.declare()).message_count
+                prefetch_count = consumer.adaptive_qos.adjust(queue_depth)
+                if prefetch_count is not None:
+                    self._logger.debug('Consumer %s prefetch count changed to %s',
+                                       consumer.config.consumer_name, prefetch_count)
+                    await consumer.channel.set_qos(prefetch_count=prefetch_count, global_=True)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self._logger.exception("Prefetch count can not be adjusted.")
 
     @staticmethod
     async def _declare_config(channel: Channel, create_config: CreateConfig) -> None:
@@ -237,35 +678,179 @@ class RabbitMQ(MessageBrokerInterface):
     @staticmethod
     async def _get_delay(publish_datetime: datetime) -> float:
         timedelta = publish_datetime - datetime.now()
-        return timedelta.total_seconds() * 1000
+        return max(timedelta.total_seconds() * 1000, 0)
+
+    def _is_scheduled(self, message: Message) -> bool:
+        return self._scheduler is not None and not self._scheduler.is_due(message)
+
+    @staticmethod
+    def _with_message_id(message: Message) -> Message:
+        """Get copy of message with a new message id, unless it has one. Id is kept in the copy, so it is the same when
+        message is published again from scheduler or outbox, while each send of a message gets its own id."""
+        if message.message_id is not None:
+            return message
+        return message.copy(update={'message_id': uuid.uuid4().hex})
 
     async def send_message(self, message: Message) -> None:
-        routing_config = RoutingConfig.parse_obj(message.routing_config)
-        headers = {}
+        message = self._with_message_id(message)
+        if self._is_scheduled(message):
+            await self._scheduler.schedule(message)
+            return
+        if self._use_outbox():
+            self._add_to_outbox([message])
+            return
+        try:
+            confirmation = await self._publish(message)
+            if not self._buffered:
+                await confirmation
+        except PUBLISH_ERRORS:
+            if not self._outbox:
+                raise
+            self._logger.exception("Message can not be published, it is added to outbox.")
+            self._add_to_outbox([message])
+
+    async def send_messages(self, messages: List[Message]) -> None:
+        confirmations = []
+        published_messages = []
+        for message in map(self._with_message_id, messages):
+            if self._is_scheduled(message):
+                await self._scheduler.schedule(message)
+            else:
+                published_messages.append(message)
+        if self._use_outbox():
+            self._add_to_outbox(published_messages)
+            return
+        try:
+            for message in published_messages:
+                confirmations.append(await self._publish(message))
+            await asyncio.gather(*confirmations)
+        except PUBLISH_ERRORS:
+            if not self._outbox:
+                raise
+            # Some messages may be published twice, they keep their message id.
+            self._logger.exception("Messages can not be published, they are added to outbox.")
+            self._add_to_outbox(published_messages)
+
+    def _is_connected(self) -> bool:
+        # Robust connections have no AMQP connection while they are reconnecting.
+        return all(connection.connection is not None and not connection.is_closed for connection in self._connections)
+
+    def _use_outbox(self) -> bool:
+        """Messages are added to outbox while broker is not connected and until outbox is drained, to keep their
+        order."""
+        return self._outbox is not None and (self._outbox.count > 0 or not self._is_connected())
+
+    def _add_to_outbox(self, messages: List[Message]) -> None:
+        for message in messages:
+            self._outbox.append(message)
+        self._outbox_added.set()
+
+    async def _drain_outbox(self) -> None:
+        if self._outbox.count:
+            self._outbox_added.set()
+        while True:
+            await self._outbox_added.wait()
+            self._outbox_added.clear()
+            while self._outbox.count:
+                if not self._is_connected():
+                    await asyncio.sleep(self._outbox_config.retry_interval)
+                    continue
+                messages, position = self._outbox.peek(self._outbox_config.batch_size)
+                try:
+                    confirmations = [await self._publish(message) for message in messages]
+                    await asyncio.gather(*confirmations)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    self._logger.exception("Outbox messages can not be published, they will be retried in %s "
+                                           "seconds.", self._outbox_config.retry_interval)
+                    await asyncio.sleep(self._outbox_config.retry_interval)
+                    continue
+                self._outbox.ack(position, len(messages))
+                self._logger.debug('%s messages published from outbox, %s left', len(messages), self._outbox.count)
+
+    async def _publish(self, message: Message, expiration: Optional[float] = None) -> asyncio.Future:
+        routing_config = get_routing_config(message.routing_config)
+        headers = dict(message.headers)
+        routing_key = routing_config.routing_key
+        partition_key = None
+        if routing_config.partition_key_field:
+            partition_keys = get_partition_keys(message.action, routing_config.partition_key_field)
+            headers[PARTITION_KEY_HEADER] = partition_keys
+            partition_key = partition_keys[0] if partition_keys else ''
+            if routing_config.partition_buckets:
+                routing_key = f'{routing_key}.{jump_hash(partition_key, routing_config.partition_buckets)}'
         if message.publish_datetime:
             headers['x-delay'] = await self._get_delay(message.publish_datetime)
 
-        exchange = await self._get_exchange(routing_config.exchange_name)
+        publisher_channel = self._channel_pool.get(partition_key)
+        exchange = await publisher_channel.get_exchange(routing_config.exchange_name)
+
+        action = message.action
+        if self._claim_check:
+            action = await self._claim_check.check_in(action)
 
-        await exchange.publish(
+        body = self._codec.encode(action)
+        content_encoding = None
+        if self._compression:
+            body, content_encoding = self._compression.compress(body)
+
+        return await publisher_channel.publisher.publish(
+            exchange,
             aio_pika.Message(
                 headers=headers,
-                body=message.action.serialize()),
-            routing_key=routing_config.routing_key,
+                content_type=self._codec.CONTENT_TYPE,
+                content_encoding=content_encoding,
+                expiration=expiration,
+                message_id=message.message_id or uuid.uuid4().hex,
+                body=body),
+            routing_key=routing_key,
         )
 
-    @alru_cache
-    async def _get_exchange(self, exchange_name: str) -> Exchange:
-        return await self._default_channel.get_exchange(exchange_name)
+    async def _drain_consumers(self, consumers: List[ConsumerData]) -> None:
+        in_flight = sum(consumer.in_flight.count for consumer in consumers)
+        self._logger.debug('Waiting %s messages in flight, up to close grace %s seconds', in_flight, self._close_grace)
+        drain = [self._drain_consumer(consumer) for consumer in consumers]
+        try:
+            await asyncio.wait_for(asyncio.gather(*drain), timeout=self._close_grace)
+        except asyncio.TimeoutError:
+            in_flight = sum(consumer.in_flight.count for consumer in consumers)
+            self._logger.warning('Close grace exceeded with %s messages in flight', in_flight)
 
-    async def close(self) -> None:
-        cancel_consumers = [consumer.queue.cancel(consumer_tag=consumer.consumer_tag) for consumer in self._consumers]
+    @staticmethod
+    async def _drain_consumer(consumer: ConsumerData) -> None:
+        if consumer.batcher:
+            await consumer.batcher.flush()
+        await consumer.in_flight.wait_drained()
+
+    async def _close_consumers(self, consumers: List[ConsumerData]) -> None:
+        for consumer in consumers:
+            if consumer.adaptive_qos_task:
+                consumer.adaptive_qos_task.cancel()
+        cancel_consumers = [consumer.queue.cancel(consumer_tag=consumer.consumer_tag) for consumer in consumers]
         await asyncio.gather(*cancel_consumers)
 
-        self._logger.debug('Waiting close grace %s seconds', self._close_grace)
-        await asyncio.sleep(self._close_grace)
+        await self._drain_consumers(consumers)
+        await self._channel_pool.flush()
+
+        for consumer in consumers:
+            if consumer.dedup:
+                consumer.dedup.close()
 
-        close_channels = [consumer.channel.close() for consumer in self._consumers]
+        close_channels = [consumer.channel.close() for consumer in consumers]
         await asyncio.gather(*close_channels)
 
-        await self._connection.close()
+    async def close(self) -> None:
+        # Scheduler is closed once consumers are drained, as their handlers may still schedule retries.
+        await self._close_consumers(self._consumers)
+        if self._scheduler:
+            await self._scheduler.close()
+        if self._outbox_task:
+            self._outbox_task.cancel()
+            await asyncio.gather(self._outbox_task, return_exceptions=True)
+        await self._channel_pool.flush()
+        await self._channel_pool.close()
+        if self._outbox:
+            self._outbox.close()
+
+        await asyncio.gather(*[connection.close() for connection in self._connections])
@@ -0,0 +1,19 @@
+import asyncio
+from typing import Optional
+
+
+class RateLimiter:
+    """Space calls, so no more than rate calls per second are done. Without rate calls are not limited."""
+
+    def __init__(self, rate: Optional[float]):
+        self._interval = 1 / rate if rate else 0
+        self._next_time = 0.0
+
+    async def wait(self) -> None:
+        if not self._interval:
+            return
+        now = asyncio.get_running_loop().time()
+        start = max(self._next_time, now)
+        self._next_time = start + self._interval
+        if start > now:
+            await asyncio.sleep(start - now)
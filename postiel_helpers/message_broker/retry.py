@@ -0,0 +1,21 @@
+import random
+
+from postiel_helpers.model.data import DataModel
+
+ATTEMPT_HEADER = 'x-attempt'
+
+
+class RetryConfig(DataModel):
+    """Retry policy of failed messages. Delay grows exponentially with each attempt, up to max delay, and jitter is
+    the fraction of the delay that is randomly subtracted, so retries of messages failed together are spread."""
+    max_attempts: int = 3
+    initial_delay: float = 1.0
+    multiplier: float = 2.0
+    max_delay: float = 300.0
+    jitter: float = 0.1
+
+    def get_delay(self, attempt: int) -> float:
+        return min(self.initial_delay * self.multiplier ** (attempt - 1), self.max_delay)
+
+    def get_jittered_delay(self, attempt: int) -> float:
+        return self.get_delay(attempt) * (1 - self.jitter * random.random())
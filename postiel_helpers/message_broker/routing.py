@@ -0,0 +1,89 @@
+"""Routing models and AMQP like exchange routing for brokers that route messages by themselves."""
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from postiel_helpers.model.data import DataModel
+
+DIRECT = 'direct'
+FANOUT = 'fanout'
+TOPIC = 'topic'
+
+
+class RoutingConfig(DataModel):
+    """Message routing. With partition key field, partition keys of action are sent in a header, and with partition
+    buckets too, routing key is suffixed with the consistent hash bucket of the key, so each replica can bind its own
+    buckets and messages with the same key always go to the same replica. A message goes to one bucket and is
+    published through one channel, both chosen by its first key, so ordering across buckets and publisher channels
+    only holds for actions with a single key."""
+    routing_key: str
+    exchange_name: str
+    partition_key_field: Optional[str] = None
+    partition_buckets: Optional[int] = None
+
+
+def get_routing_config(routing_config: Dict[str, Any]) -> RoutingConfig:
+    """Get routing config of a message. Parsed configs are cached by content, so each routing is validated once and
+    not on every publish. Returned configs are shared, so they must not be modified."""
+    try:
+        return _parse_routing_config(tuple(sorted(routing_config.items())))
+    except TypeError:  # Unhashable values.
+        return RoutingConfig.parse_obj(routing_config)
+
+
+@lru_cache(maxsize=1024)
+def _parse_routing_config(items: Tuple[Tuple[str, Any], ...]) -> RoutingConfig:
+    return RoutingConfig.parse_obj(dict(items))
+
+
+class BindingConfig(DataModel):
+    queue_name: str
+    exchange_name: str
+    routing_key: str = ''
+
+
+def topic_matches(binding_key: Sequence[str], words: Sequence[str]) -> bool:
+    """Match routing key words with topic binding key words. ``*`` matches one word and ``#`` zero or more."""
+    if not binding_key:
+        return not words
+    head = binding_key[0]
+    if head == '#':
+        return any(topic_matches(binding_key[1:], words[index:]) for index in range(len(words) + 1))
+    if not words:
+        return False
+    return (head == '*' or head == words[0]) and topic_matches(binding_key[1:], words[1:])
+
+
+class Router:
+    """Route messages to queue names like AMQP direct, fanout and topic exchanges. Other exchange types are routed as
+    direct. Routes are cached by exchange and routing key."""
+
+    def __init__(self, exchange_types: Dict[str, str], bindings: List[BindingConfig]):
+        self._exchange_types = exchange_types
+        self._bindings: Dict[str, List[BindingConfig]] = {}
+        for binding in bindings:
+            self._bindings.setdefault(binding.exchange_name, []).append(binding)
+        self._routes: Dict[Tuple[str, str], List[str]] = {}
+
+    def route(self, exchange_name: str, routing_key: str) -> List[str]:
+        try:
+            return self._routes[(exchange_name, routing_key)]
+        except KeyError:
+            if exchange_name not in self._exchange_types:
+                raise ValueError(f"Exchange {exchange_name} is not declared.")
+            routes = self._routes[(exchange_name, routing_key)] = self._get_queue_names(exchange_name, routing_key)
+            return routes
+
+    def _get_queue_names(self, exchange_name: str, routing_key: str) -> List[str]:
+        exchange_type = self._exchange_types[exchange_name]
+        queue_names: List[str] = []
+        words = routing_key.split('.')
+        for binding in self._bindings.get(exchange_name, []):
+            if exchange_type == FANOUT:
+                matches = True
+            elif exchange_type == TOPIC:
+                matches = topic_matches(binding.routing_key.split('.'), words)
+            else:
+                matches = binding.routing_key == routing_key
+            if matches and binding.queue_name not in queue_names:
+                queue_names.append(binding.queue_name)
+        return queue_names
@@ -0,0 +1,198 @@
+"""Delayed delivery. Messages with a future publish datetime are kept in a heap and a single timer publishes them when
+they are due, so any broker supports delayed messages and no broker plugin is needed.
+
+When a journal path is configured, scheduled and published messages are appended to it, so scheduled messages survive
+restarts. Messages are stored encoded with the codec, and journal is compacted on start, on close, and
+once published records pass the compact threshold, so it does not grow without bound on long running services."""
+import asyncio
+import heapq
+import logging
+import os
+import struct
+import time
+import uuid
+from dataclasses import dataclass, field as dataclass_field
+from typing import Any, Awaitable, BinaryIO, Callable, Dict, List, Optional
+
+import msgpack
+
+from postiel_helpers.message_broker.message import Message, decode_message, encode_message
+from postiel_helpers.model.data import DataModel
+
+_RECORD_HEADER = struct.Struct('>I')
+
+
+class SchedulerConfig(DataModel):
+    journal_path: Optional[str] = None
+    retry_interval: float = 5.0
+    compact_threshold: int = 1000
+
+
+@dataclass(order=True)
+class ScheduledMessage:
+    timestamp: float
+    message_id: str = dataclass_field(compare=False)
+    message: Message = dataclass_field(compare=False)
+
+
+class Journal:
+    """Append only log of scheduled messages. Published messages are written as records without message."""
+
+    def __init__(self, path: str):
+        self._path = path
+        self._file: Optional[BinaryIO] = None
+        self.published = 0
+
+    def load(self) -> Dict[str, Message]:
+        messages: Dict[str, Message] = {}
+        if not os.path.exists(self._path):
+            return messages
+
+        with open(self._path, 'rb') as file:
+            data = file.read()
+        position = 0
+        while position + _RECORD_HEADER.size <= len(data):
+            size, = _RECORD_HEADER.unpack_from(data, position)
+            position += _RECORD_HEADER.size
+            if position + size > len(data):
+                break  # Record not fully written before stop.
+            message_id, message = msgpack.unpackb(data[position:position + size], raw=False)
+            position += size
+            if message is None:
+                messages.pop(message_id, None)
+            else:
+                messages[message_id] = decode_message(message)
+        return messages
+
+    def compact(self, messages: Dict[str, Message]) -> None:
+        self.close()
+        directory = os.path.dirname(os.path.abspath(self._path))
+        os.makedirs(directory, exist_ok=True)
+        temporal_path = f'{self._path}.tmp'
+        with open(temporal_path, 'wb') as file:
+            file.write(b''.join(self._get_record(message_id, message) for message_id, message in messages.items()))
+        os.replace(temporal_path, self._path)
+        self.published = 0
+
+    def open(self) -> None:
+        """Open journal to append records."""
+        self._file = open(self._path, 'ab')
+
+    def append(self, message_id: str, message: Optional[Message]) -> None:
+        if self._file is None:
+            raise RuntimeError("Journal is not open")
+        self._file.write(self._get_record(message_id, message))
+        self._file.flush()
+        if message is None:
+            self.published += 1
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @staticmethod
+    def _get_record(message_id: str, message: Optional[Message]) -> bytes:
+        data = msgpack.packb([message_id, encode_message(message) if message else None], use_bin_type=True)
+        return _RECORD_HEADER.pack(len(data)) + data
+
+
+class Scheduler:
+    def __init__(self, send: Callable[[Message], Awaitable[None]], config: Optional[SchedulerConfig] = None,
+                 logger: Optional[logging.Logger] = None):
+        config = config or SchedulerConfig()
+        self._send = send
+        self._retry_interval = config.retry_interval
+        self._journal = Journal(config.journal_path) if config.journal_path else None
+        self._journal_lock = asyncio.Lock()
+        self._compact_threshold = config.compact_threshold
+        self._logger = logger or logging.getLogger(__name__)
+        self._heap: List[ScheduledMessage] = []
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._heap)
+
+    @staticmethod
+    def is_due(message: Message) -> bool:
+        return message.publish_datetime is None or message.publish_datetime.timestamp() <= time.time()
+
+    async def start(self) -> None:
+        if self._journal:
+            messages = await self._run_in_executor(self._journal.load)
+            await self._run_in_executor(self._journal.compact, messages)
+            await self._run_in_executor(self._journal.open)
+            for message_id, message in messages.items():
+                self._push(message_id, message)
+            self._logger.debug('%s scheduled messages loaded', len(messages))
+        self._task = asyncio.create_task(self._run())
+
+    async def schedule(self, message: Message) -> None:
+        message_id = uuid.uuid4().hex
+        if not self._journal:
+            self._push(message_id, message)
+            return
+        # Message is pushed with the journal locked, so it is not lost by a concurrent compaction.
+        async with self._journal_lock:
+            await self._run_in_executor(self._journal.append, message_id, message)
+            self._push(message_id, message)
+
+    def _push(self, message_id: str, message: Message) -> None:
+        scheduled_message = ScheduledMessage(message.publish_datetime.timestamp(), message_id, message)
+        heapq.heappush(self._heap, scheduled_message)
+        if self._heap[0] is scheduled_message:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            delay = self._heap[0].timestamp - time.time() if self._heap else None
+            if delay is None or delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            scheduled_message = heapq.heappop(self._heap)
+            try:
+                await self._send(scheduled_message.message.copy(update={'publish_datetime': None}))
+            except asyncio.CancelledError:
+                heapq.heappush(self._heap, scheduled_message)
+                raise
+            except Exception:
+                self._logger.exception("Scheduled message can not be sent, it will be retried in %s seconds.",
+                                       self._retry_interval)
+                scheduled_message.timestamp = time.time() + self._retry_interval
+                heapq.heappush(self._heap, scheduled_message)
+                continue
+            if self._journal:
+                # Shielded, so journal is not written by executor threads once scheduler is closed.
+                await asyncio.shield(self._set_published(scheduled_message.message_id))
+
+    async def _set_published(self, message_id: str) -> None:
+        async with self._journal_lock:
+            await self._run_in_executor(self._journal.append, message_id, None)
+            if self._journal.published >= self._compact_threshold:
+                messages = {scheduled.message_id: scheduled.message for scheduled in self._heap}
+                await self._run_in_executor(self._journal.compact, messages)
+                await self._run_in_executor(self._journal.open)
+                self._logger.debug('Journal compacted, %s scheduled messages kept', len(messages))
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._journal:
+            async with self._journal_lock:
+                messages = {scheduled.message_id: scheduled.message for scheduled in self._heap}
+                await self._run_in_executor(self._journal.compact, messages)
+        elif self._heap:
+            self._logger.warning('%s scheduled messages are discarded on close', len(self._heap))
+
+    @staticmethod
+    async def _run_in_executor(func: Callable, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
@@ -1,10 +1,37 @@
+import asyncio
 from dataclasses import dataclass
-from typing import Awaitable, Type, Callable
+from typing import Awaitable, Type, Callable, List, Union
 
 from postiel_helpers.action.action import Action
 
 
 @dataclass
 class ServiceConsumer:
+    """Service consumer. CPU bound consumers are run in service process pool, so their func must be picklable, like a
+    module level function, and it can be sync or async."""
     func: Callable[[Type[Action]], Awaitable[None]]
     action_type: Type[Action]
+    cpu_bound: bool = False
+
+    def run(self, action: Action) -> Awaitable[None]:
+        """Run func in service process. Sync CPU bound funcs are run in default executor, so they do not block event
+        loop."""
+        if self.cpu_bound and not asyncio.iscoroutinefunction(self.func):
+            return asyncio.get_running_loop().run_in_executor(None, self.func, action)
+        return self.func(action)
+
+
+@dataclass
+class BatchServiceConsumer:
+    """Service consumer that receives lists of actions. Raise PartialBatchError to fail only some of them."""
+    func: Callable[[List[Action]], Awaitable[None]]
+    action_type: Type[Action]
+
+
+AnyServiceConsumer = Union[ServiceConsumer, BatchServiceConsumer]
+
+
+class PartialBatchError(Exception):
+    def __init__(self, failed_indexes: List[int]):
+        super().__init__(f"Actions {failed_indexes} failed")
+        self.failed_indexes = failed_indexes
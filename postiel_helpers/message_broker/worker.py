@@ -0,0 +1,26 @@
+"""Functions run by process pool workers. They receive raw message bodies, so actions are only deserialized once, in
+the worker."""
+import asyncio
+from typing import Callable, Optional, Type
+
+from postiel_helpers.action.action import Action
+from postiel_helpers.codec.compression import Compression
+from postiel_helpers.codec.registry import get_codec
+from postiel_helpers.message_broker.claim_check import ClaimCheck
+
+
+def decode_action(body: bytes, content_type: Optional[str], content_encoding: Optional[str],
+                  action_type: Type[Action], zero_copy: bool = False) -> Action:
+    body = Compression.decompress(body, content_encoding)
+    return get_codec(content_type, zero_copy).decode(body, action_type)
+
+
+def run_consumer(func: Callable, action_type: Type[Action], body: bytes, content_type: Optional[str],
+                 content_encoding: Optional[str], zero_copy: bool = False,
+                 claim_check: Optional[ClaimCheck] = None) -> None:
+    action = decode_action(body, content_type, content_encoding, action_type, zero_copy)
+    if claim_check:
+        action = claim_check.check_out_sync(action)
+    result = func(action)
+    if asyncio.iscoroutine(result):
+        asyncio.run(result)
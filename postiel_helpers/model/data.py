@@ -1,5 +1,144 @@
+from copy import deepcopy
+from enum import Enum
+from functools import partial
+from inspect import isclass
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type, TypeVar
+
 from pydantic import BaseModel
+from pydantic.fields import ModelField, SHAPE_MAPPING, SHAPE_SINGLETON, SHAPE_TUPLE
+
+Model = TypeVar('Model', bound='DataModel')
+Builder = Callable[[Any], Any]
+
+_IMMUTABLE_TYPES = (type(None), bool, int, float, str, bytes, tuple, frozenset, Enum)
+
+
+class _TrustedSchema:
+    """Fields of a model needed to create it without validation."""
+
+    def __init__(self, model_type: Type[BaseModel]):
+        self.fields: Tuple[Tuple[str, ModelField], ...] = tuple(model_type.__fields__.items())
+        nested_fields = []
+        for name, model_field in self.fields:
+            builder = _get_builder(model_field)
+            if builder is not None:
+                nested_fields.append((name, builder))
+        self.nested_fields: Tuple[Tuple[str, Builder], ...] = tuple(nested_fields)
+        self.has_private_attributes = bool(getattr(model_type, '__private_attributes__', None))
+
+
+_SCHEMAS: Dict[Type[BaseModel], _TrustedSchema] = {}
 
 
 class DataModel(BaseModel):
-    pass
+    @classmethod
+    def trusted(cls: Type[Model], **values: Any) -> Model:
+        """Create model from trusted, already validated data, without validation. Like ``construct``, but field
+        layout is cached per model and nested models given as dicts are created too, also as items of lists and
+        dicts, at any depth. Models built from external data must be validated, with the constructor or
+        ``parse_obj``."""
+        schema = _get_schema(cls)
+        for name, builder in schema.nested_fields:
+            value = values.get(name)
+            if value is not None:
+                values[name] = builder(value)
+
+        fields_values = {}
+        for name, model_field in schema.fields:
+            if name in values:
+                fields_values[name] = values[name]
+            elif not model_field.required:
+                fields_values[name] = _get_default(model_field)
+        model = cls.__new__(cls)
+        object.__setattr__(model, '__dict__', fields_values)
+        object.__setattr__(model, '__fields_set__', set(values))
+        if schema.has_private_attributes:
+            model._init_private_attributes()
+        return model
+
+
+def _get_schema(model_type: Type[BaseModel]) -> _TrustedSchema:
+    try:
+        return _SCHEMAS[model_type]
+    except KeyError:
+        schema = _SCHEMAS[model_type] = _TrustedSchema(model_type)
+        return schema
+
+
+def _get_default(model_field: ModelField) -> Any:
+    if model_field.default_factory is not None:
+        return model_field.default_factory()
+    default = model_field.default
+    return default if isinstance(default, _IMMUTABLE_TYPES) else deepcopy(default)
+
+
+def _construct(value: Any, model_type: Type[BaseModel]) -> Any:
+    if not isinstance(value, dict):
+        return value
+    if issubclass(model_type, DataModel):
+        return model_type.trusted(**value)
+    return model_type.construct(**value)
+
+
+def _is_model_type(type_: Any) -> bool:
+    return isclass(type_) and issubclass(type_, BaseModel)
+
+
+def _get_builder(model_field: ModelField) -> Optional[Builder]:
+    """Get function that creates nested models of field values given as dicts, following field sub fields. None when
+    field has no nested models."""
+    sub_fields = model_field.sub_fields or []
+    if model_field.shape == SHAPE_SINGLETON:
+        if sub_fields:
+            return _get_union_builder(sub_fields)
+        if _is_model_type(model_field.type_):
+            return partial(_construct, model_type=model_field.type_)
+        return None
+
+    builders = [_get_builder(sub_field) for sub_field in sub_fields]
+    if not any(builders):
+        return None
+    if model_field.shape == SHAPE_MAPPING:
+        return partial(_build_mapping, builder=builders[0])
+    if model_field.shape == SHAPE_TUPLE:
+        return partial(_build_tuple, builders=builders)
+    return partial(_build_sequence, builder=builders[0])
+
+
+def _get_union_builder(sub_fields: List[ModelField]) -> Optional[Builder]:
+    model_types = [sub_field.type_ for sub_field in sub_fields if sub_field.shape == SHAPE_SINGLETON
+                   and not sub_field.sub_fields and _is_model_type(sub_field.type_)]
+    mapping_builders = [_get_builder(sub_field) for sub_field in sub_fields if sub_field.shape == SHAPE_MAPPING]
+    sequence_builders = [_get_builder(sub_field) for sub_field in sub_fields
+                         if sub_field.shape not in (SHAPE_SINGLETON, SHAPE_MAPPING)]
+    mapping_builder = next(filter(None, mapping_builders), None)
+    sequence_builder = next(filter(None, sequence_builders), None)
+    if not model_types and mapping_builder is None and sequence_builder is None:
+        return None
+
+    def build(value: Any) -> Any:
+        if isinstance(value, dict):
+            # Dict is created as the first model it fits, like validation tries union types in order.
+            for model_type in model_types:
+                fields = model_type.__fields__
+                if value.keys() <= fields.keys() and all(
+                        name in value for name, model_field in fields.items() if model_field.required):
+                    return _construct(value, model_type)
+            return mapping_builder(value) if mapping_builder else value
+        if isinstance(value, (list, tuple, set, frozenset)) and sequence_builder:
+            return sequence_builder(value)
+        return value
+    return build
+
+
+def _build_mapping(value: Any, builder: Builder) -> Any:
+    return type(value)((key, builder(item) if item is not None else item) for key, item in value.items())
+
+
+def _build_tuple(value: Any, builders: List[Optional[Builder]]) -> Any:
+    return type(value)(builder(item) if builder and item is not None else item
+                       for builder, item in zip(builders, value))
+
+
+def _build_sequence(value: Any, builder: Builder) -> Any:
+    return type(value)(builder(item) if item is not None else item for item in value)
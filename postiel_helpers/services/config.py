@@ -0,0 +1,94 @@
+"""Config file loading. YAML is parsed with libyaml loader when PyYAML is built with it, and validated configs are kept
+as snapshots keyed by hash of config file content, so reloading or restarting with an unchanged config skips parsing
+and validation.
+
+Snapshots are also pickled to a cache directory when one is set. Hash includes postiel_helpers version and config
+model schema, so snapshots of other versions or models are not loaded. Snapshots are loaded with pickle, so cache
+directory must be trusted: it must not be writable by other users."""
+import hashlib
+import logging
+import os
+import pickle
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Type
+
+from postiel_helpers.config.base_config import BaseConfig
+
+def load_yaml(content: bytes) -> Dict[str, Any]:
+    import yaml
+
+    return yaml.load(content, Loader=getattr(yaml, 'CFullLoader', yaml.FullLoader))
+
+
+class ConfigSnapshots:
+    def __init__(self, config_type: Type[BaseConfig], cache_directory: Optional[str] = None, max_size: int = 8,
+                 logger: Optional[logging.Logger] = None):
+        self._config_type = config_type
+        self._cache_directory = cache_directory
+        self._max_size = max_size
+        self._logger = logger or logging.getLogger(__name__)
+        self._snapshots: 'OrderedDict[str, BaseConfig]' = OrderedDict()
+        self._model_hash: Optional[bytes] = None
+
+    def get_hash(self, content: bytes) -> str:
+        if self._model_hash is None:
+            # Schema is only built once, when first config is hashed.
+            self._model_hash = hashlib.sha256('\0'.join((
+                _get_version(), f'{self._config_type.__module__}.{self._config_type.__qualname__}',
+                self._config_type.schema_json())).encode()).digest()
+        return hashlib.sha256(self._model_hash + content).hexdigest()
+
+    def get(self, digest: str) -> Optional[BaseConfig]:
+        config = self._snapshots.get(digest)
+        if config is None and self._cache_directory:
+            config = self._load(digest)
+        if config is not None:
+            self._add(digest, config)
+        return config
+
+    def add(self, digest: str, config: BaseConfig) -> None:
+        self._add(digest, config)
+        if self._cache_directory:
+            self._save(digest, config)
+
+    def _add(self, digest: str, config: BaseConfig) -> None:
+        self._snapshots[digest] = config
+        self._snapshots.move_to_end(digest)
+        while len(self._snapshots) > self._max_size:
+            self._snapshots.popitem(last=False)
+
+    def _get_path(self, digest: str) -> str:
+        return os.path.join(self._cache_directory, f'{digest}.pickle')
+
+    def _load(self, digest: str) -> Optional[BaseConfig]:
+        try:
+            with open(self._get_path(digest), 'rb') as file:
+                config = pickle.load(file)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            self._logger.warning("Config snapshot %s can not be loaded.", digest, exc_info=True)
+            return None
+        if type(config) is not self._config_type or config.__dict__.keys() != config.__fields__.keys():
+            self._logger.warning("Config snapshot %s does not match config model, it is discarded.", digest)
+            return None
+        return config
+
+    def _save(self, digest: str, config: BaseConfig) -> None:
+        path = self._get_path(digest)
+        try:
+            os.makedirs(self._cache_directory, exist_ok=True)
+            with open(f'{path}.tmp', 'wb') as file:
+                pickle.dump(config, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(f'{path}.tmp', path)
+        except Exception:
+            self._logger.warning("Config snapshot %s can not be saved.", digest, exc_info=True)
+
+
+def _get_version() -> str:
+    import importlib.metadata
+
+    try:
+        return importlib.metadata.version('postiel_helpers')
+    except importlib.metadata.PackageNotFoundError:
+        return ''
@@ -1,22 +1,23 @@
 import os
 from abc import ABCMeta
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
 
 import aiofiles
-import aiohttp
-from aiohttp import ClientSession
 
 from postiel_helpers.abstract.attribute import AbstractAttribute
 from postiel_helpers.services.service import Service
 from postiel_helpers.action.post.file_value_object import FileValueObject
 
+if TYPE_CHECKING:
+    from aiohttp import ClientSession
+
 
 class HTTP(Service, metaclass=ABCMeta):
     _PUBLIC_URL = AbstractAttribute()
 
     def __init__(self):
         super().__init__()
-        self._session: Optional[ClientSession] = None
+        self._session: Optional['ClientSession'] = None
 
     async def _get_file_value_object(self,
                                      url: str,
@@ -45,6 +46,8 @@ class HTTP(Service, metaclass=ABCMeta):
         )
 
     async def _download_data(self, url: str) -> str:
+        import aiohttp
+
         async with aiohttp.ClientSession() as session:
             async with session.get(url) as resp:
                 file_data = await resp.read()
@@ -1,5 +1,6 @@
 import logging
 import logging.config
+from typing import Optional
 
 import aiolog
 
@@ -10,11 +11,14 @@ class LoggerMixin:
     def __init__(self):
         self._logger = logging.getLogger()
 
-    async def _load_logger_config(self, config: LoggingConfig) -> None:
+    def _set_logger_config(self, config: Optional[LoggingConfig]) -> None:
         if config:
             logging.config.dictConfig(config.config)
+        self._logger = logging.getLogger(config.logger_name if config else None)
+
+    async def _load_logger_config(self, config: Optional[LoggingConfig]) -> None:
+        self._set_logger_config(config)
         aiolog.start()
-        self._logger = logging.getLogger(config.logger_name)
 
     @staticmethod
     async def _stop() -> None:
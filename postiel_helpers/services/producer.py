@@ -1,5 +1,124 @@
-from argparse import Action
+"""Producer of actions. Actions are queued in a bounded queue, so callers wait when brokers can not keep up, and they
+are sent in batches to the broker of their route."""
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from postiel_helpers.action.action import Action
+from postiel_helpers.config.producer import ProducerConfig, RouteConfig
+from postiel_helpers.message_broker.interface import MessageBrokerInterface
+from postiel_helpers.message_broker.message import Message
+
+
+@dataclass
+class Route:
+    broker_name: str
+    routing_config: Dict[str, Any]
+
+
+class RouteTable:
+    """Routes by action type. Routes are resolved once per action type, through its class hierarchy."""
+
+    def __init__(self, routes: List[RouteConfig]):
+        self._routes_by_name = {route.action_type: Route(route.broker, route.routing.dict()) for route in routes}
+        self._routes: Dict[Type[Action], Route] = {}
+
+    @property
+    def broker_names(self) -> List[str]:
+        return [route.broker_name for route in self._routes_by_name.values()]
+
+    def get(self, action_type: Type[Action]) -> Route:
+        try:
+            return self._routes[action_type]
+        except KeyError:
+            for cls in action_type.__mro__:
+                if cls.__name__ in self._routes_by_name:
+                    route = self._routes[action_type] = self._routes_by_name[cls.__name__]
+                    return route
+            raise ValueError(f"No route for {action_type.__name__} actions.")
 
 
 class Producer:
-    def send_action(self, action: Action):
+    def __init__(self, brokers: Dict[str, MessageBrokerInterface], config: ProducerConfig,
+                 logger: Optional[logging.Logger] = None):
+        self._brokers = brokers
+        self._route_table = RouteTable(config.routes)
+        for broker_name in self._route_table.broker_names:
+            if broker_name not in brokers:
+                raise ValueError(f"Broker {broker_name} is not available.")
+        self._max_batch_size = config.batch.max_batch_size
+        self._max_wait = config.batch.max_wait_ms / 1000
+        self._logger = logger or logging.getLogger(__name__)
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=config.max_queue_size)
+        self._batch_ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize()
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def send_action(self, action: Action, publish_datetime: Optional[datetime] = None) -> None:
+        """Queue action to be sent. Waits while queue is full."""
+        route = self._route_table.get(type(action))
+        message = Message.trusted(action=action, routing_config=route.routing_config, publish_datetime=publish_datetime)
+        await self._queue.put((route.broker_name, message))
+        if self._queue.qsize() >= self._max_batch_size:
+            self._batch_ready.set()
+
+    async def flush(self) -> None:
+        """Wait until queued actions are sent."""
+        self._batch_ready.set()
+        await self._queue.join()
+
+    async def set_brokers(self, brokers: Dict[str, MessageBrokerInterface]) -> None:
+        """Send actions to given brokers, once actions already queued are sent to current ones."""
+        await self.flush()
+        self._brokers = brokers
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            if self._queue.qsize() + 1 < self._max_batch_size:
+                try:
+                    await asyncio.wait_for(self._batch_ready.wait(), timeout=self._max_wait)
+                except asyncio.TimeoutError:
+                    pass
+            self._batch_ready.clear()
+            while len(batch) < self._max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._send(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _send(self, batch: List[Tuple[str, Message]]) -> None:
+        messages: Dict[str, List[Message]] = {}
+        for broker_name, message in batch:
+            messages.setdefault(broker_name, []).append(message)
+        results = await asyncio.gather(*[self._send_messages(broker_name, broker_messages)
+                                         for broker_name, broker_messages in messages.items()],
+                                       return_exceptions=True)
+        for broker_name, result in zip(messages, results):
+            if isinstance(result, Exception):
+                self._logger.error("%s messages can not be sent to %s broker.", len(messages[broker_name]),
+                                   broker_name, exc_info=result)
+
+    async def _send_messages(self, broker_name: str, messages: List[Message]) -> None:
+        try:
+            broker = self._brokers[broker_name]
+        except KeyError:
+            raise ValueError(f"Broker {broker_name} is not available.") from None
+        await broker.send_messages(messages)
+
+    async def close(self) -> None:
+        if self._task:
+            await self.flush()
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
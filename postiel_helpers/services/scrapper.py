@@ -1,13 +1,13 @@
 import urllib.parse
 from abc import ABCMeta
-from typing import Optional, Tuple
-
-import aiohttp
-from bs4 import element
+from typing import Optional, Tuple, TYPE_CHECKING
 
 from postiel_helpers.abstract.attribute import AbstractAttribute
 from postiel_helpers.services.http import HTTP
 
+if TYPE_CHECKING:
+    from bs4 import element
+
 
 class Scrapper(HTTP, metaclass=ABCMeta):
     _BANNED_ALT: Tuple[str] = tuple()
@@ -16,9 +16,11 @@ class Scrapper(HTTP, metaclass=ABCMeta):
     _URLS_INCLUDED: bool = AbstractAttribute()
 
     async def _prepare(self):
+        import aiohttp
+
         self._session = aiohttp.ClientSession()
 
-    async def _get_images(self, data: element, title: str) -> element:
+    async def _get_images(self, data: 'element', title: str) -> 'element':
         images = []
         img_urls = []
         img_tags = data.find_all('img')
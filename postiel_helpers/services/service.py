@@ -1,49 +1,111 @@
 import asyncio
+import importlib
+import json
 import os
 import signal
 from abc import abstractmethod, ABCMeta
-from typing import Any, Dict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Optional, Type, TYPE_CHECKING, Union
 
-import aiofiles
-import yaml
 from pydantic import ValidationError
 
 from postiel_helpers.abstract.attribute import AbstractAttribute
+from postiel_helpers.action.action import Action
 from postiel_helpers.config.base_config import BaseConfig
+from postiel_helpers.config.config_watch import ConfigWatchConfig
 from postiel_helpers.config.message_broker import MessageBrokerConfig
+from postiel_helpers.config.process_pool import ProcessPoolConfig
+from postiel_helpers.config.producer import ProducerConfig
 from postiel_helpers.message_broker.service_consumer import ServiceConsumer
 from postiel_helpers.message_broker.interface import MessageBrokerInterface
-from postiel_helpers.message_broker.rabbitmq.rabbitmq import RabbitMQ
+from postiel_helpers.services.config import ConfigSnapshots, load_yaml
 from postiel_helpers.services.logger import LoggerMixin
+from postiel_helpers.services.producer import Producer
+from postiel_helpers.services.supervisor import Supervisor
+
+if TYPE_CHECKING:
+    from watchgod import AllWatcher
 
 
 class Service(LoggerMixin, metaclass=ABCMeta):
     _CONFIG = BaseConfig
     _CONFIG_DIRECTORY = AbstractAttribute()
     _CONFIG_FILENAME = AbstractAttribute()
-    _MESSAGE_BROKERS_CLASSES: Dict[str, MessageBrokerInterface] = {
-        'RabbitMQ': RabbitMQ
+    _CONFIG_CACHE_DIRECTORY: Optional[str] = None
+    # Broker classes are given as import paths, so only backends used by config are imported.
+    _MESSAGE_BROKERS_CLASSES: Dict[str, Union[str, Type[MessageBrokerInterface]]] = {
+        'RabbitMQ': 'postiel_helpers.message_broker.rabbitmq.rabbitmq.RabbitMQ',
+        'InMemory': 'postiel_helpers.message_broker.in_memory.in_memory.InMemory',
+        'Local': 'postiel_helpers.message_broker.local.local.Local',
     }
     _BROKERS_CLOSE_GRACE = 5
 
     def __init__(self):
         self._config_loaded = False
+        self._config_hash: Optional[str] = None
+        self._config_snapshots = ConfigSnapshots(self._CONFIG, self._CONFIG_CACHE_DIRECTORY)
+        self._config_lock: Optional[asyncio.Lock] = None
+        self._config_watch: Optional[ConfigWatchConfig] = None
+        self._config_watch_task: Optional[asyncio.Task] = None
         self._brokers: Dict[str, MessageBrokerInterface] = {}
+        self._brokers_config: Dict[str, MessageBrokerConfig] = {}
         self._consumer_functions: Dict[str, ServiceConsumer] = {}
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._producer: Optional[Producer] = None
+        self._producer_config: Optional[ProducerConfig] = None
         super().__init__()
 
     def run(self) -> None:
-        loop = asyncio.get_event_loop()
+        """Run service. When supervisor is configured, service runs in forked worker processes."""
+        config = self._parse_config()
+        if config and config.supervisor:
+            self._set_logger_config(config.logging)
+            Supervisor(self._run_worker, config.supervisor, self._logger).run()
+        else:
+            self._run_worker()
+
+    def _parse_config(self) -> Optional[BaseConfig]:
+        """Parse config before event loop is started, so its snapshot is inherited by supervisor workers."""
+        loop = asyncio.new_event_loop()
+        try:
+            content = loop.run_until_complete(self._read_config())
+        finally:
+            loop.close()
+        try:
+            return self._get_config(content, self._config_snapshots.get_hash(content))
+        except ValidationError as err:
+            self._logger.error(err)
+            return None
+
+    def _run_worker(self, index: int = 0) -> None:
+        """Run service in a new event loop. SIGTERM cancels service start, so service is stopped gracefully."""
+        # Loop of forked worker must not be shared with parent.
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
         loop.add_signal_handler(signal.SIGHUP, self._create_load_config_task)
         loop.add_signal_handler(signal.SIGCONT, self._create_load_failed_task)
         loop.run_until_complete(self._load_config())
         if not self._config_loaded:
             raise RuntimeError("Config not loaded")
-        loop.run_until_complete(self._start())
-        loop.run_until_complete(self._stop())
+        start = loop.create_task(self._start())
+        loop.add_signal_handler(signal.SIGTERM, start.cancel)
+        try:
+            loop.run_until_complete(start)
+        except asyncio.CancelledError:
+            self._logger.info('Service stopped by SIGTERM')
+        finally:
+            loop.remove_signal_handler(signal.SIGTERM)
+            loop.run_until_complete(self._stop())
 
     async def _stop(self):
+        await self._load_config_watch(None)
+        if self._producer:
+            await self._producer.close()
         await asyncio.gather(*[broker.close() for broker in self._brokers.values()])
+        if self._process_pool:
+            await asyncio.get_running_loop().run_in_executor(None, self._process_pool.shutdown)
+            self._process_pool = None
         await super()._stop()
 
     def _create_load_config_task(self) -> None:
@@ -53,36 +115,188 @@ class Service(LoggerMixin, metaclass=ABCMeta):
         asyncio.create_task(self._load_failed())
 
     async def _load_failed(self):
-        await asyncio.gather([broker.load_failed() for broker in self._brokers.values()])
+        await asyncio.gather(*[broker.load_failed() for broker in self._brokers.values()])
 
     @abstractmethod
     async def _start(self) -> None:
         raise NotImplementedError()
 
     async def _load_config(self) -> None:
-        data = await self._get_config_data()
-        try:
-            config = self._CONFIG.parse_obj(data)
-        except ValidationError as err:
-            self._logger.error(err)
+        if self._config_lock is None:
+            self._config_lock = asyncio.Lock()
+        async with self._config_lock:
+            content = await self._read_config()
+            digest = self._config_snapshots.get_hash(content)
+            if digest == self._config_hash:
+                self._logger.debug('Config unchanged, reload skipped')
+                return
+            try:
+                config = self._get_config(content, digest)
+            except ValidationError as err:
+                self._logger.error(err)
+                return
+
+            await self._load_logger_config(config.logging)
+
+            await self._load_process_pool(config.process_pool)
+            await self._load_brokers(config.message_brokers)
+            await self._load_producer(config.producer)
+            await self._load_config_watch(config.config_watch)
+
+            self._config_hash = digest
+            self._config_loaded = True
+            self._logger.info('Config loaded')
+
+    def _get_config(self, content: bytes, digest: str) -> BaseConfig:
+        config = self._config_snapshots.get(digest)
+        if config is None:
+            config = self._CONFIG.parse_obj(load_yaml(content))
+            self._config_snapshots.add(digest, config)
+        return config
+
+    async def _load_config_watch(self, config_watch: Optional[ConfigWatchConfig]) -> None:
+        if config_watch == self._config_watch and self._config_watch_task:
             return
+        if self._config_watch_task:
+            # When called from watch task, it is cancelled once current reload is done.
+            self._config_watch_task.cancel()
+            if self._config_watch_task is not asyncio.current_task():
+                await asyncio.gather(self._config_watch_task, return_exceptions=True)
+            self._config_watch_task = None
+        self._config_watch = config_watch
+        if config_watch:
+            from watchgod import AllWatcher
 
-        await self._load_logger_config(config.logging)
+            # Watcher takes first snapshot of file now, so changes made once config is loaded are not missed.
+            watcher = AllWatcher(self._get_config_path())
+            self._config_watch_task = asyncio.create_task(self._watch_config(config_watch, watcher))
 
-        await self._load_brokers(config.message_brokers)
+    async def _watch_config(self, config_watch: ConfigWatchConfig, watcher: 'AllWatcher') -> None:
+        """Reload config when config file changes. Changes are debounced, and reload is skipped when file content
+        is unchanged."""
+        from watchgod import awatch
 
-        self._config_loaded = True
-        self._logger.info('Config loaded')
+        changes = awatch(self._get_config_path(), watcher_cls=lambda path: watcher,
+                         debounce=int(config_watch.debounce * 1000), normal_sleep=int(config_watch.interval * 1000))
+        async for _ in changes:
+            try:
+                await self._load_config()
+            except Exception:
+                self._logger.exception("Config can not be reloaded.")
+
+    async def _load_process_pool(self, process_pool_config: ProcessPoolConfig) -> None:
+        cpu_bound = any(getattr(consumer, 'cpu_bound', False) for consumer in self._consumer_functions.values())
+        if cpu_bound and not self._process_pool:
+            self._process_pool = ProcessPoolExecutor(max_workers=process_pool_config.max_workers)
 
     async def _load_brokers(self, message_brokers: Dict[str, MessageBrokerConfig]) -> None:
-        brokers = {
-            name: await self._MESSAGE_BROKERS_CLASSES[config.class_name].initialize(
-                config=config.config, service_consumers=self._consumer_functions, close_grace=self._BROKERS_CLOSE_GRACE)
-            for name, config in message_brokers.items()
-        }  # TODO: Improve performance
+        """Load brokers concurrently. On reload, unchanged brokers are kept, changed brokers are reloaded when they
+        support it or created again, and removed brokers are closed. Old brokers are closed once producer is
+        switched to new ones. Initialization errors fail initial load, while on reload old broker is kept."""
+        brokers = dict(self._brokers)
+        brokers_config = dict(self._brokers_config)
+        changed = [name for name, config in message_brokers.items()
+                   if name in brokers and config != brokers_config[name]]
+        removed = [name for name in brokers if name not in message_brokers]
+        added = [name for name in message_brokers if name not in brokers]
+
+        reloaded = await asyncio.gather(*[self._reload_broker(brokers[name], brokers_config[name],
+                                                              message_brokers[name]) for name in changed])
+        recreated = [name for name, is_reloaded in zip(changed, reloaded) if not is_reloaded]
+
+        initialized = added + recreated
+        results = await asyncio.gather(*[self._initialize_broker(message_brokers[name]) for name in initialized],
+                                       return_exceptions=True)
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors and not self._config_loaded:
+            await asyncio.gather(*[result.close() for result in results if not isinstance(result, Exception)])
+            raise errors[0]
+
+        closed = [brokers.pop(name) for name in removed]
+        for name, result in zip(initialized, results):
+            if isinstance(result, Exception):
+                self._logger.error("Broker %s can not be initialized.", name, exc_info=result)
+                continue
+            if name in brokers:
+                closed.append(brokers[name])
+            brokers[name] = result
+            brokers_config[name] = message_brokers[name]
+        for name in changed:
+            if name not in recreated:
+                brokers_config[name] = message_brokers[name]
+
         self._brokers = brokers
+        self._brokers_config = {name: brokers_config[name] for name in brokers}
+        if self._producer:
+            await self._producer.set_brokers(brokers)
+        await asyncio.gather(*[broker.close() for broker in closed])
+        self._logger.debug('Brokers loaded, %s kept, %s reloaded, %s initialized, %s closed',
+                           len(brokers) - len(changed) - len(added), len(changed) - len(recreated),
+                           len(initialized) - len(errors), len(closed))
+
+    async def _initialize_broker(self, config: MessageBrokerConfig) -> MessageBrokerInterface:
+        return await self._get_broker_class(config.class_name).initialize(
+            config=config.config, service_consumers=self._consumer_functions, close_grace=self._BROKERS_CLOSE_GRACE,
+            process_pool=self._process_pool)
+
+    @classmethod
+    def _get_broker_class(cls, class_name: str) -> Type[MessageBrokerInterface]:
+        broker_class = cls._MESSAGE_BROKERS_CLASSES[class_name]
+        if isinstance(broker_class, str):
+            module_name, _, name = broker_class.rpartition('.')
+            broker_class = getattr(importlib.import_module(module_name), name)
+        return broker_class
+
+    async def _reload_broker(self, broker: MessageBrokerInterface, config: MessageBrokerConfig,
+                             new_config: MessageBrokerConfig) -> bool:
+        if config.class_name != new_config.class_name:
+            return False
+        try:
+            return await broker.reload(new_config.config)
+        except Exception:
+            self._logger.exception("Broker can not be reloaded, it will be created again.")
+            return False
+
+    async def _load_producer(self, producer_config: Optional[ProducerConfig]) -> None:
+        """Load producer when its config changes. New producer is created before old one is closed, so actions can be
+        sent during reload, and an invalid config fails initial load, while on reload old producer is kept."""
+        if producer_config == self._producer_config:
+            return
+        producer = None
+        if producer_config:
+            try:
+                producer = Producer(self._brokers, producer_config, self._logger)
+            except ValueError:
+                if not self._config_loaded:
+                    raise
+                self._logger.exception("Producer can not be created, current one is kept.")
+                return
+            producer.start()
+        old_producer, self._producer = self._producer, producer
+        self._producer_config = producer_config
+        if old_producer:
+            await old_producer.close()
+
+    async def _send_action(self, action: Action, publish_datetime: Optional[datetime] = None) -> None:
+        if not self._producer:
+            raise RuntimeError("Producer is not configured")
+        await self._producer.send_action(action, publish_datetime)
+
+    def _get_config_path(self) -> str:
+        return os.path.join(self._CONFIG_DIRECTORY, self._CONFIG_FILENAME)
+
+    async def _read_config(self) -> bytes:
+        """Read config content. When config data is overridden by a subclass, its data is used as JSON, which is
+        YAML too."""
+        if type(self)._get_config_data is not Service._get_config_data:
+            return json.dumps(await self._get_config_data(), sort_keys=True, default=str).encode()
+        return await self._read_config_file()
 
     async def _get_config_data(self) -> Dict[str, Any]:
-        async with aiofiles.open(os.path.join(self._CONFIG_DIRECTORY, self._CONFIG_FILENAME), mode='r') as f:
-            data = await f.read()
-        return yaml.load(data, Loader=yaml.FullLoader)
+        return load_yaml(await self._read_config_file())
+
+    async def _read_config_file(self) -> bytes:
+        import aiofiles
+
+        async with aiofiles.open(self._get_config_path(), mode='rb') as f:
+            return await f.read()
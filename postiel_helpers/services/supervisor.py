@@ -0,0 +1,117 @@
+"""Prefork supervisor. Worker processes are forked from a parent that has parsed config but has not started an event
+loop, so each worker runs its own loop, brokers and consumers, and config is inherited instead of parsed again.
+
+SIGHUP and SIGCONT are forwarded to workers. Workers that crash are restarted, workers that exit cleanly are not.
+SIGTERM and SIGINT stop all workers, sending them SIGTERM, which workers handle to stop gracefully. Workers still
+running after stop timeout are killed."""
+import logging
+import os
+import signal
+import time
+from typing import Callable, Dict, List, Optional
+
+from postiel_helpers.config.supervisor import SupervisorConfig
+
+_FORWARDED_SIGNALS = (signal.SIGHUP, signal.SIGCONT)
+_STOP_SIGNALS = (signal.SIGTERM, signal.SIGINT)
+_HANDLED_SIGNALS = _FORWARDED_SIGNALS + _STOP_SIGNALS + (signal.SIGALRM,)
+
+
+class Supervisor:
+    def __init__(self, worker: Callable[[int], None], config: SupervisorConfig,
+                 logger: Optional[logging.Logger] = None):
+        self._worker = worker
+        self._workers_count = config.workers or os.cpu_count() or 1
+        self._restart_delay = config.restart_delay
+        self._stop_timeout = config.stop_timeout
+        self._cpus: Optional[List[int]] = sorted(os.sched_getaffinity(0)) if config.cpu_affinity else None
+        self._logger = logger or logging.getLogger(__name__)
+        self._workers: Dict[int, int] = {}
+        self._stopping = False
+
+    @property
+    def workers(self) -> Dict[int, int]:
+        """Process ids of running workers by worker index."""
+        return dict(self._workers)
+
+    def run(self) -> None:
+        """Run workers until all of them exit cleanly or supervisor is stopped."""
+        previous_handlers = {signum: signal.signal(signum, self._handle_signal) for signum in _HANDLED_SIGNALS}
+        try:
+            for index in range(self._workers_count):
+                self._start_worker(index)
+            self._logger.info('%s workers started', self._workers_count)
+            while self._workers:
+                self._wait_worker()
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            for signum, handler in previous_handlers.items():
+                signal.signal(signum, handler)
+            self._stopping = False
+        self._logger.info('All workers stopped')
+
+    def stop(self) -> None:
+        if self._stopping:
+            return
+        self._stopping = True
+        self._logger.info('Stopping %s workers', len(self._workers))
+        self._kill_workers(signal.SIGTERM)
+        signal.setitimer(signal.ITIMER_REAL, self._stop_timeout)
+
+    def _handle_signal(self, signum: int, frame) -> None:
+        if signum in _STOP_SIGNALS:
+            self.stop()
+        elif signum == signal.SIGALRM:
+            self._logger.warning('%s workers not stopped in %s seconds, they are killed', len(self._workers),
+                                 self._stop_timeout)
+            self._kill_workers(signal.SIGKILL)
+        else:
+            self._kill_workers(signum)
+
+    def _kill_workers(self, signum: int) -> None:
+        for pid in self._workers.values():
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def _start_worker(self, index: int) -> None:
+        pid = os.fork()
+        if pid:
+            self._workers[index] = pid
+            return
+
+        exit_code = 1
+        try:
+            for signum in _HANDLED_SIGNALS:
+                signal.signal(signum, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+            if self._cpus:
+                os.sched_setaffinity(0, {self._cpus[index % len(self._cpus)]})
+            self._worker(index)
+            exit_code = 0
+        except SystemExit as err:
+            exit_code = err.code if isinstance(err.code, int) else 1
+        except BaseException:
+            self._logger.exception('Worker %s failed', index)
+        finally:
+            logging.shutdown()
+            os._exit(exit_code)
+
+    def _wait_worker(self) -> None:
+        pid, status = os.wait()
+        index = next((index for index, worker_pid in self._workers.items() if worker_pid == pid), None)
+        if index is None:
+            return
+        del self._workers[index]
+        if os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0:
+            self._logger.info('Worker %s exited', index)
+            return
+        if self._stopping:
+            return
+
+        self._logger.error('Worker %s crashed with status %s, it is restarted in %s seconds', index, status,
+                           self._restart_delay)
+        time.sleep(self._restart_delay)
+        if not self._stopping:
+            self._start_worker(index)
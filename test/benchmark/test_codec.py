@@ -0,0 +1,77 @@
+import logging
+import os
+import timeit
+import tracemalloc
+
+import pytest
+
+from postiel_helpers.action.post.action import PostAction
+from postiel_helpers.action.post.file_object import FileObject
+from postiel_helpers.codec.binary import BinaryCodec, DEFAULT_OUT_OF_BAND_THRESHOLD
+from postiel_helpers.codec.registry import CODECS
+from postiel_helpers.message_broker.worker import decode_action
+from test.common import POST, POST_ACTION
+
+LARGE_POST_ACTION = PostAction(
+    channels=POST_ACTION.channels,
+    posts=[POST.copy(update={'post_id': post_id}, deep=True) for post_id in range(100)])
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('action', [POST_ACTION, LARGE_POST_ACTION], ids=['small', 'large'])
+@pytest.mark.parametrize('content_type', list(CODECS))
+def test_codec_benchmark(content_type, action):
+    codec = CODECS[content_type]
+    data = codec.encode(action)
+    number = 200
+
+    encode_time = timeit.timeit(lambda: codec.encode(action), number=number) / number
+    decode_time = timeit.timeit(lambda: codec.decode(data, PostAction), number=number) / number
+
+    logging.info('%s: %d bytes, encode %.1f us, decode %.1f us',
+                 content_type, len(data), encode_time * 1e6, decode_time * 1e6)
+    assert codec.decode(data, PostAction) == action
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('out_of_band_threshold', [None, DEFAULT_OUT_OF_BAND_THRESHOLD], ids=['inline', 'out_of_band'])
+def test_file_data_decode_memory_benchmark(out_of_band_threshold):
+    image = os.urandom(4 * 1024 * 1024)
+    files = {str(index): FileObject(url_included=False, filename=f'{index}.png', data=image) for index in range(4)}
+    action = PostAction(channels=[1], posts=[POST.copy(update={'files': files})])
+    codec = BinaryCodec(out_of_band_threshold=out_of_band_threshold, zero_copy=True)
+    data = codec.encode(action)
+
+    tracemalloc.start()
+    decoded = codec.decode(data, PostAction)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    logging.info('out of band threshold %s: %d bytes body, decode peak %d bytes',
+                 out_of_band_threshold, len(data), peak)
+    assert decoded == action
+    if out_of_band_threshold is not None:
+        assert peak < len(image)
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('zero_copy', [False, True], ids=['copy', 'zero_copy'])
+def test_consumer_decode_benchmark(zero_copy):
+    """Decode the way consumers do, from a message body published with the default codec."""
+    image = os.urandom(4 * 1024 * 1024)
+    files = {str(index): FileObject(url_included=False, filename=f'{index}.png', data=image) for index in range(4)}
+    action = PostAction(channels=[1], posts=[POST.copy(update={'files': files})])
+    body = action.serialize()
+    number = 20
+
+    decode_time = timeit.timeit(lambda: decode_action(body, BinaryCodec.CONTENT_TYPE, None, PostAction, zero_copy),
+                                number=number) / number
+    tracemalloc.start()
+    decoded = decode_action(body, BinaryCodec.CONTENT_TYPE, None, PostAction, zero_copy)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    logging.info('zero copy %s: decode %.1f us, decode peak %d bytes', zero_copy, decode_time * 1e6, peak)
+    assert decoded == action
+    if zero_copy:
+        assert peak < len(image)
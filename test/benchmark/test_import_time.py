@@ -0,0 +1,52 @@
+import logging
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+SERVICE_MODULE = 'postiel_helpers.services.service'
+# Times of interpreter startup, so budget does not depend on machine speed.
+IMPORT_TIME_BUDGET = 5
+LAZY_MODULES = ('aio_pika', 'aiofiles', 'aiohttp', 'bs4', 'watchgod', 'yaml',
+                'postiel_helpers.message_broker.rabbitmq.rabbitmq',
+                'postiel_helpers.message_broker.in_memory.in_memory', 'postiel_helpers.message_broker.local.local')
+
+
+def run_python(code: str, *args: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *args, '-c', code], cwd=ROOT_DIRECTORY, capture_output=True, text=True,
+                          check=True)
+
+
+def get_import_time(module: str) -> float:
+    """Cumulative import time of module in seconds, from ``python -X importtime`` report."""
+    report = run_python(f'import {module}', '-X', 'importtime').stderr
+    for line in report.splitlines():
+        _, _, cumulative, name = (part.strip() for part in line.replace(':', '|', 1).split('|'))
+        if name == module:
+            return int(cumulative) / 1e6
+    raise ValueError(f'{module} not found in import time report')
+
+
+def get_startup_time() -> float:
+    """Wall time in seconds of running an empty interpreter."""
+    start = time.perf_counter()
+    run_python('pass')
+    return time.perf_counter() - start
+
+
+def test_service_does_not_import_lazy_modules():
+    code = f'import sys, {SERVICE_MODULE}; print(*[name for name in {LAZY_MODULES!r} if name in sys.modules])'
+    assert run_python(code).stdout.split() == []
+
+
+@pytest.mark.benchmark
+def test_service_import_time_benchmark():
+    startup_time = min(get_startup_time() for _ in range(3))
+    import_time = min(get_import_time(SERVICE_MODULE) for _ in range(3))
+
+    logging.info('%s imported in %.0f ms, interpreter started in %.0f ms', SERVICE_MODULE, import_time * 1000,
+                 startup_time * 1000)
+    assert import_time < IMPORT_TIME_BUDGET * startup_time
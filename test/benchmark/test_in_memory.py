@@ -0,0 +1,44 @@
+import logging
+import time
+
+import pytest
+
+from postiel_helpers.action.post.action import PostAction
+from postiel_helpers.codec.registry import CODECS
+from postiel_helpers.message_broker.in_memory.in_memory import InMemory
+from postiel_helpers.message_broker.message import Message
+from postiel_helpers.message_broker.service_consumer import ServiceConsumer
+from test.common import POST_ACTION
+
+
+@pytest.mark.benchmark
+@pytest.mark.asyncio
+@pytest.mark.parametrize('content_type', [None, *CODECS])
+async def test_in_memory_throughput_benchmark(content_type):
+    number = 2000
+    actions = []
+
+    async def process_data(action: PostAction) -> None:
+        actions.append(action)
+
+    config = {
+        'common': {'logger_name': 'benchmark'},
+        'create': {
+            'queues': [{'name': 'queue', 'max_size': 100}],
+            'exchanges': [{'name': 'exchange'}],
+            'bindings': [{'queue_name': 'queue', 'exchange_name': 'exchange', 'routing_key': 'key'}],
+        },
+        'consumers': [{'queue_name': 'queue', 'consumer_name': 'consumer', 'max_concurrency': 4}],
+        'content_type': content_type,
+    }
+    broker = await InMemory.initialize(
+        config, {'consumer': ServiceConsumer(func=process_data, action_type=PostAction)}, close_grace=10)
+    message = Message(action=POST_ACTION, routing_config={'exchange_name': 'exchange', 'routing_key': 'key'})
+
+    start = time.perf_counter()
+    await broker.send_messages([message] * number)
+    await broker.close()
+    elapsed = time.perf_counter() - start
+
+    logging.info('%s: %.0f messages/s', content_type, number / elapsed)
+    assert len(actions) == number
@@ -0,0 +1,49 @@
+import asyncio
+import logging
+import time
+
+import pytest
+
+from postiel_helpers.action.post.action import PostAction
+from postiel_helpers.message_broker.local.local import Local
+from postiel_helpers.message_broker.message import Message
+from postiel_helpers.message_broker.service_consumer import ServiceConsumer
+from test.common import POST_ACTION
+
+
+@pytest.mark.benchmark
+@pytest.mark.asyncio
+async def test_local_latency_benchmark(tmp_path):
+    number = 500
+    received = asyncio.Queue()
+
+    async def process_data(action: PostAction) -> None:
+        received.put_nowait(time.perf_counter())
+
+    config = {
+        'common': {'logger_name': 'benchmark'},
+        'socket_directory': str(tmp_path),
+        'create': {
+            'queues': [{'name': 'queue', 'max_size': 100}],
+            'exchanges': [{'name': 'exchange'}],
+            'bindings': [{'queue_name': 'queue', 'exchange_name': 'exchange', 'routing_key': 'key'}],
+        },
+    }
+    consumer = await Local.initialize(
+        {**config, 'consumers': [{'queue_name': 'queue', 'consumer_name': 'consumer'}]},
+        {'consumer': ServiceConsumer(func=process_data, action_type=PostAction)}, close_grace=10)
+    producer = await Local.initialize(config, {}, close_grace=10)
+    message = Message(action=POST_ACTION, routing_config={'exchange_name': 'exchange', 'routing_key': 'key'})
+
+    latencies = []
+    for _ in range(number):
+        start = time.perf_counter()
+        await producer.send_message(message)
+        latencies.append(await received.get() - start)
+    await producer.close()
+    await consumer.close()
+
+    latencies.sort()
+    logging.info('local broker latency: median %.1f us, p99 %.1f us',
+                 latencies[number // 2] * 1e6, latencies[number * 99 // 100] * 1e6)
+    assert len(latencies) == number
@@ -0,0 +1,30 @@
+import logging
+import time
+
+import pytest
+
+from postiel_helpers.action.post.action import PostAction
+from test.common import POST
+
+
+@pytest.mark.benchmark
+def test_trusted_construction_benchmark():
+    number = 5
+    post = POST.dict()
+    post['data'] = {f'field_{index}': post['data']['power'] for index in range(50)}
+    data = {'channels': ['1', '2', '3'], 'posts': [post] * 200}
+
+    start = time.perf_counter()
+    for _ in range(number):
+        validated = PostAction.parse_obj(data)
+    validated_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(number):
+        trusted = PostAction.trusted(**data)
+    trusted_elapsed = time.perf_counter() - start
+
+    logging.info('Validated: %.2f ms, trusted: %.2f ms per action', validated_elapsed / number * 1000,
+                 trusted_elapsed / number * 1000)
+    assert trusted == validated
+    assert trusted_elapsed < validated_elapsed
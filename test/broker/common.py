@@ -0,0 +1,132 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+import aio_pika
+
+from postiel_helpers.codec.binary import BinaryCodec
+from postiel_helpers.message_broker.rabbitmq.channel_pool import ChannelPool, ChannelSelection, PublisherChannel
+from postiel_helpers.message_broker.rabbitmq.publisher import Publisher, PublisherConfig
+from postiel_helpers.message_broker.rabbitmq.rabbitmq import (
+    ConsumerConfig, ConsumerData, RabbitMQ, RabbitMQCommonConfig)
+from postiel_helpers.message_broker.service_consumer import ServiceConsumer
+
+
+class ExchangeMock:
+    def __init__(self, name: str = 'test_exchange'):
+        self.name = name
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.published: List[bytes] = []
+        self.messages: List[aio_pika.Message] = []
+        self.routing_keys: List[str] = []
+
+    async def publish(self, message: aio_pika.Message, routing_key: str) -> None:
+        self.routing_keys.append(routing_key)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        self.published.append(message.body)
+        self.messages.append(message)
+
+
+class ChannelMock:
+    def __init__(self):
+        self.exchanges: Dict[str, ExchangeMock] = {}
+        self.default_exchange = self.exchanges[''] = ExchangeMock('')
+        self.queues: Dict[str, QueueMock] = {}
+        self.declared_queues: Dict[str, Dict[str, Any]] = {}
+
+    async def get_exchange(self, name: str) -> ExchangeMock:
+        return self.exchanges.setdefault(name, ExchangeMock(name))
+
+    async def get_queue(self, name: str) -> 'QueueMock':
+        return self.queues.setdefault(name, QueueMock())
+
+    async def declare_queue(self, name: str, **kwargs) -> 'QueueMock':
+        self.declared_queues[name] = kwargs
+        return await self.get_queue(name)
+
+    async def set_qos(self, **kwargs) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+class QueueMock:
+    def __init__(self, messages: Optional[List['IncomingMessageMock']] = None):
+        self.cancelled = False
+        self.messages = messages or []
+
+    async def consume(self, callback, consumer_tag: str) -> str:
+        return consumer_tag
+
+    async def cancel(self, consumer_tag: str) -> None:
+        self.cancelled = True
+
+    async def declare(self) -> SimpleNamespace:
+        return SimpleNamespace(message_count=len(self.messages))
+
+    async def get(self, fail: bool = True) -> Optional['IncomingMessageMock']:
+        return self.messages.pop(0) if self.messages else None
+
+
+class IncomingMessageMock:
+    def __init__(self, body: bytes, delivery_tag: int = 1, headers: Optional[Dict[str, Any]] = None,
+                 content_type: str = BinaryCodec.CONTENT_TYPE, message_id: Optional[str] = None,
+                 exchange: str = 'test_exchange', routing_key: str = 'test_queue'):
+        self.body = body
+        self.delivery_tag = delivery_tag
+        self.headers = headers or {}
+        self.content_type = content_type
+        self.content_encoding = None
+        self.message_id = message_id
+        self.exchange = exchange
+        self.routing_key = routing_key
+        self.acked = False
+        self.rejected = False
+        self.requeued = False
+
+    @asynccontextmanager
+    async def process(self):
+        try:
+            yield
+        except Exception:
+            self.rejected = True
+            raise
+        self.acked = True
+
+    async def ack(self) -> None:
+        self.acked = True
+
+    async def nack(self, requeue: bool = True) -> None:
+        self.requeued = requeue
+
+
+class ConnectionMock:
+    async def channel(self) -> ChannelMock:
+        return ChannelMock()
+
+
+def create_rabbitmq(service_consumers: Dict[str, ServiceConsumer]) -> RabbitMQ:
+    logger = logging.getLogger()
+    channel_pool = ChannelPool([PublisherChannel(ChannelMock(), Publisher(PublisherConfig(), logger))],
+                               ChannelSelection.ROUND_ROBIN)
+    return RabbitMQ(connections=[], channel_pool=channel_pool, common_config=RabbitMQCommonConfig(logger_name=''),
+                    service_consumers=service_consumers, close_grace=1, codec=BinaryCodec(),
+                    publisher_config=PublisherConfig())
+
+
+def get_published(rabbitmq: RabbitMQ, exchange_name: str) -> List[aio_pika.Message]:
+    return [message for channel in rabbitmq._channel_pool._channels
+            for message in channel.channel.exchanges.get(exchange_name, ExchangeMock()).messages]
+
+
+async def create_consumer(rabbitmq: RabbitMQ, consumer_name: str = 'consumer', **config) -> ConsumerData:
+    """Create consumer of test queue the way RabbitMQ does, with a mocked channel."""
+    consumer_config = ConsumerConfig(queue_name='test_queue', consumer_name=consumer_name, **config)
+    return await rabbitmq._create_consumer(consumer_config, ConnectionMock())
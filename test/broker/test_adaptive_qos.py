@@ -0,0 +1,26 @@
+from postiel_helpers.message_broker.rabbitmq.adaptive_qos import AdaptiveQOS, AdaptiveQOSConfig
+
+
+def test_fast_handler_prefetch_grows_with_backlog():
+    adaptive_qos = AdaptiveQOS(AdaptiveQOSConfig(max_prefetch=100), prefetch_count=10, max_concurrency=10)
+    adaptive_qos.record(0.001)
+
+    assert adaptive_qos.adjust(queue_depth=1000) == 20
+    assert adaptive_qos.adjust(queue_depth=0) is None
+    assert adaptive_qos.stats.increases == 1
+
+
+def test_slow_handler_prefetch_shrinks():
+    adaptive_qos = AdaptiveQOS(AdaptiveQOSConfig(), prefetch_count=10, max_concurrency=2)
+    adaptive_qos.record(4, messages=2)
+
+    assert adaptive_qos.adjust(queue_depth=1000) == 5
+    assert adaptive_qos.adjust(queue_depth=1000) == 3
+    assert adaptive_qos.adjust(queue_depth=1000) == 2
+    assert adaptive_qos.adjust(queue_depth=1000) == 1
+    assert adaptive_qos.adjust(queue_depth=1000) is None
+    assert adaptive_qos.stats.decreases == 4
+
+
+def test_no_measures_no_change():
+    assert AdaptiveQOS(AdaptiveQOSConfig(), prefetch_count=0, max_concurrency=None).adjust(queue_depth=10) is None
@@ -0,0 +1,60 @@
+import asyncio
+from typing import List
+
+import pytest
+
+from postiel_helpers.action.post.action import PostAction
+from postiel_helpers.message_broker.batch import BatchConfig, Batcher
+from postiel_helpers.message_broker.service_consumer import BatchServiceConsumer, PartialBatchError
+from test.broker.common import IncomingMessageMock, create_consumer, create_rabbitmq, get_published
+from test.common import POST_ACTION
+
+
+@pytest.mark.asyncio
+async def test_batcher():
+    batches = []
+
+    async def flush(items: List[int]) -> None:
+        batches.append(items)
+
+    batcher = Batcher(BatchConfig(max_batch_size=3, max_wait_ms=10), flush)
+    for item in range(5):
+        batcher.add(item)
+    await asyncio.sleep(0.05)
+
+    assert batches == [[0, 1, 2], [3, 4]]
+
+
+class IncomingBatchMessageMock(IncomingMessageMock):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.multiple_acked = False
+
+    async def ack(self, multiple: bool = False) -> None:
+        self.acked = True
+        self.multiple_acked = multiple
+
+    async def reject(self, requeue: bool = False) -> None:
+        self.rejected = True
+
+
+@pytest.mark.asyncio
+async def test_batch_consumer_partial_failure():
+    batches = []
+
+    async def process_data(actions: List[PostAction]) -> None:
+        batches.append(actions)
+        raise PartialBatchError([1])
+
+    service_consumer = BatchServiceConsumer(func=process_data, action_type=PostAction)
+    rabbitmq = create_rabbitmq({'consumer': service_consumer})
+    consumer = await create_consumer(rabbitmq, batch=BatchConfig(max_batch_size=3))
+    messages = [IncomingBatchMessageMock(POST_ACTION.serialize(), delivery_tag=tag) for tag in range(1, 4)]
+    messages.append(IncomingBatchMessageMock(b'invalid', delivery_tag=4))
+
+    await rabbitmq._process_batch(consumer, messages)
+
+    assert batches == [[POST_ACTION] * 3]
+    assert [message.rejected for message in messages] == [False, True, False, True]
+    assert messages[2].multiple_acked
+    assert get_published(rabbitmq, 'test_dead_exchange') == []
@@ -0,0 +1,51 @@
+import logging
+
+import pytest
+from pydantic import ValidationError
+
+from postiel_helpers.message_broker.rabbitmq.channel_pool import (
+    ChannelPool, ChannelPoolConfig, ChannelSelection, PublisherChannel)
+from postiel_helpers.message_broker.rabbitmq.publisher import Publisher, PublisherConfig
+
+
+class ConnectionMock:
+    def __init__(self):
+        self.channels = 0
+
+    async def channel(self) -> object:
+        self.channels += 1
+        return object()
+
+
+@pytest.mark.asyncio
+async def test_channel_pool_round_robin():
+    connections = [ConnectionMock(), ConnectionMock()]
+    pool = await ChannelPool.create(connections, ChannelPoolConfig(connections=2, publisher_channels=4),
+                                    PublisherConfig(), logging.getLogger())
+
+    assert [connection.channels for connection in connections] == [2, 2]
+    assert len({id(pool.get()) for _ in range(4)}) == 4
+
+
+@pytest.mark.asyncio
+async def test_channel_pool_least_busy():
+    channels = [PublisherChannel(object(), Publisher(PublisherConfig(), logging.getLogger())) for _ in range(2)]
+    channels[0].publisher._in_flight.add(object())
+    pool = ChannelPool(channels, ChannelSelection.LEAST_BUSY)
+
+    assert pool.get() is channels[1]
+
+
+@pytest.mark.asyncio
+async def test_channel_pool_pins_keys_to_channels():
+    pool = await ChannelPool.create([ConnectionMock()], ChannelPoolConfig(publisher_channels=4), PublisherConfig(),
+                                    logging.getLogger())
+
+    assert all(pool.get('key') is pool.get('key') for _ in range(4))
+    assert len({id(pool.get(str(key))) for key in range(100)}) == 4
+
+
+@pytest.mark.parametrize('field', ['connections', 'publisher_channels'])
+def test_channel_pool_config_requires_one(field):
+    with pytest.raises(ValidationError):
+        ChannelPoolConfig(**{field: 0})
@@ -0,0 +1,65 @@
+import os
+
+import pytest
+
+from postiel_helpers.action.post.action import PostAction
+from postiel_helpers.action.post.file_object import FileObject
+from postiel_helpers.message_broker.claim_check import ClaimCheck, ClaimCheckConfig
+from postiel_helpers.message_broker.service_consumer import ServiceConsumer
+from test.broker.common import IncomingMessageMock, create_consumer, create_rabbitmq
+from test.common import POST, POST_ACTION
+
+
+@pytest.mark.asyncio
+async def test_claim_check(tmp_path):
+    image = b'\x89PNG' * 1024
+    files = {'a': FileObject(url_included=False, data=image), 'b': FileObject(url_included=False, data=image)}
+    action = PostAction(channels=[1], posts=[POST.copy(update={'files': files})])
+    claim_check = ClaimCheck(ClaimCheckConfig(directory=str(tmp_path), threshold=1024))
+
+    checked_action = await claim_check.check_in(action)
+
+    file_a, file_b = checked_action.posts[0].files.values()
+    assert file_a.data is None and file_a.path == file_b.path
+    assert len([files for _, _, files in os.walk(tmp_path) if files]) == 1
+    assert action.posts[0].files['a'].data == image
+    checked_out_action = await claim_check.check_out(checked_action)
+    assert checked_out_action == action and checked_action.posts[0].files['a'].data is None
+
+
+@pytest.mark.asyncio
+async def test_claim_check_under_threshold(tmp_path):
+    claim_check = ClaimCheck(ClaimCheckConfig(directory=str(tmp_path), threshold=1024))
+    assert await claim_check.check_in(POST_ACTION) is POST_ACTION
+
+
+@pytest.mark.asyncio
+async def test_paths_outside_blob_store_are_rejected(tmp_path):
+    secret = tmp_path / 'secret'
+    secret.write_bytes(b'secret')
+    claim_check = ClaimCheck(ClaimCheckConfig(directory=str(tmp_path / 'blobs')))
+    files = {'a': FileObject(url_included=False, path=str(tmp_path / 'blobs' / '..' / 'secret'))}
+
+    with pytest.raises(ValueError):
+        await claim_check.check_out(PostAction(channels=[1], posts=[POST.copy(update={'files': files})]))
+
+
+@pytest.mark.asyncio
+async def test_consumers_receive_checked_out_data(tmp_path):
+    received = []
+
+    async def process_data(action: PostAction) -> None:
+        received.append(action.posts[0].files['a'])
+
+    image = b'\x89PNG' * 1024
+    claim_check = ClaimCheck(ClaimCheckConfig(directory=str(tmp_path), threshold=1024))
+    action = await claim_check.check_in(PostAction(channels=[1], posts=[POST.copy(update={'files': {
+        'a': FileObject(url_included=False, data=image)}})]))
+    rabbitmq = create_rabbitmq({'consumer': ServiceConsumer(func=process_data, action_type=PostAction)})
+    rabbitmq._claim_check = claim_check
+    consumer = await create_consumer(rabbitmq)
+    message = IncomingMessageMock(action.serialize())
+
+    await rabbitmq._process_message(consumer, message)
+
+    assert message.acked and received[0].data == image and received[0].path is None
@@ -0,0 +1,87 @@
+import asyncio
+import time
+
+import pytest
+
+from postiel_helpers.action.post.action import PostAction
+from postiel_helpers.message_broker.retry import RetryConfig
+from postiel_helpers.message_broker.scheduler import Journal, Scheduler, SchedulerConfig
+from postiel_helpers.message_broker.service_consumer import ServiceConsumer
+from test.broker.common import IncomingMessageMock, create_consumer, create_rabbitmq
+from test.common import POST_ACTION
+
+
+@pytest.mark.asyncio
+async def test_close_waits_only_for_in_flight_messages():
+    actions = []
+
+    async def process_data(action: PostAction) -> None:
+        await asyncio.sleep(0.05)
+        actions.append(action)
+
+    service_consumer = ServiceConsumer(func=process_data, action_type=PostAction)
+    rabbitmq = create_rabbitmq({'consumer': service_consumer})
+    rabbitmq._close_grace = 5
+    consumer = await create_consumer(rabbitmq)
+    rabbitmq._consumers = [consumer]
+    message = IncomingMessageMock(POST_ACTION.serialize())
+    processing = asyncio.create_task(rabbitmq._process_message(consumer, message))
+    await asyncio.sleep(0)
+
+    start = time.monotonic()
+    await rabbitmq.close()
+
+    assert time.monotonic() - start < 1
+    assert consumer.queue.cancelled
+    assert message.acked and actions == [POST_ACTION]
+    await processing
+
+
+@pytest.mark.asyncio
+async def test_close_grace_is_upper_bound():
+    async def process_data(action: PostAction) -> None:
+        await asyncio.sleep(10)
+
+    service_consumer = ServiceConsumer(func=process_data, action_type=PostAction)
+    rabbitmq = create_rabbitmq({'consumer': service_consumer})
+    rabbitmq._close_grace = 0.05
+    consumer = await create_consumer(rabbitmq)
+    rabbitmq._consumers = [consumer]
+    processing = asyncio.create_task(rabbitmq._process_message(consumer, IncomingMessageMock(POST_ACTION.serialize())))
+    await asyncio.sleep(0)
+
+    await rabbitmq.close()
+
+    assert consumer.in_flight.count == 1
+    processing.cancel()
+
+
+@pytest.mark.asyncio
+async def test_retry_scheduled_while_closing_is_kept(tmp_path):
+    release = asyncio.Event()
+
+    async def process_data(action: PostAction) -> None:
+        await release.wait()
+        raise ValueError()
+
+    service_consumer = ServiceConsumer(func=process_data, action_type=PostAction)
+    rabbitmq = create_rabbitmq({'consumer': service_consumer})
+    rabbitmq._close_grace = 5
+    config = SchedulerConfig(journal_path=str(tmp_path / 'journal'))
+    rabbitmq._scheduler = Scheduler(rabbitmq.send_message, config)
+    await rabbitmq._scheduler.start()
+    consumer = await create_consumer(rabbitmq, retry=RetryConfig(initial_delay=60),
+                                     failed_message_routing={'exchange_name': 'failed', 'routing_key': 'failed'})
+    rabbitmq._consumers = [consumer]
+    message = IncomingMessageMock(POST_ACTION.serialize())
+    processing = asyncio.create_task(rabbitmq._process_message(consumer, message))
+    await asyncio.sleep(0)
+
+    closing = asyncio.create_task(rabbitmq.close())
+    await asyncio.sleep(0.01)
+    release.set()
+    await closing
+    await processing
+
+    assert message.acked
+    assert len(Journal(config.journal_path).load()) == 1
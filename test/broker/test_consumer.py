@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+
+from postiel_helpers.action.post.action import PostAction
+from postiel_helpers.message_broker.service_consumer import ServiceConsumer
+from test.broker.common import IncomingMessageMock, create_consumer, create_rabbitmq, get_published
+from test.common import POST_ACTION
+
+FAILED_ROUTING = {'routing_key': 'test_dead_queue', 'exchange_name': 'test_dead_exchange'}
+
+
+@pytest.mark.asyncio
+async def test_max_concurrency():
+    running = []
+    max_running = []
+
+    async def process_data(action: PostAction) -> None:
+        running.append(action)
+        max_running.append(len(running))
+        await asyncio.sleep(0.01)
+        running.pop()
+
+    service_consumer = ServiceConsumer(func=process_data, action_type=PostAction)
+    rabbitmq = create_rabbitmq({'consumer': service_consumer})
+    consumer = await create_consumer(rabbitmq, max_concurrency=2)
+    messages = [IncomingMessageMock(POST_ACTION.serialize(), delivery_tag=tag) for tag in range(6)]
+
+    await asyncio.gather(*[rabbitmq._process_message(consumer, message) for message in messages])
+
+    assert max(max_running) == 2
+    assert all(message.acked for message in messages)
+
+
+@pytest.mark.asyncio
+async def test_handler_timeout():
+    async def process_data(action: PostAction) -> None:
+        await asyncio.sleep(10)
+
+    service_consumer = ServiceConsumer(func=process_data, action_type=PostAction)
+    rabbitmq = create_rabbitmq({'consumer': service_consumer})
+    consumer = await create_consumer(rabbitmq, handler_timeout=0.01, failed_message_routing=FAILED_ROUTING)
+    message = IncomingMessageMock(POST_ACTION.serialize())
+
+    await rabbitmq._process_message(consumer, message)
+
+    assert message.acked
+    assert len(get_published(rabbitmq, 'test_dead_exchange')) == 1
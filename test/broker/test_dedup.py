@@ -0,0 +1,71 @@
+import time
+
+import pytest
+
+from postiel_helpers.action.post.action import PostAction
+from postiel_helpers.message_broker.dedup import DedupCache, DedupConfig
+from postiel_helpers.message_broker.message import Message
+from postiel_helpers.message_broker.service_consumer import ServiceConsumer
+from test.broker.common import IncomingMessageMock, create_consumer, create_rabbitmq, get_published
+from test.common import POST_ACTION
+
+
+def test_lru_and_ttl():
+    cache = DedupCache(DedupConfig(max_size=2, ttl=0.05))
+    cache.add('a')
+    cache.add('b')
+    assert cache.seen('a')
+    cache.add('c')
+
+    assert cache.seen('a') and cache.seen('c') and not cache.seen('b')
+    time.sleep(0.06)
+    assert not cache.seen('a')
+
+
+def test_ids_survive_restart(tmp_path):
+    config = DedupConfig(path=str(tmp_path / 'dedup'))
+    cache = DedupCache(config)
+    cache.add('a')
+    cache.close()
+
+    assert DedupCache(config).seen('a')
+
+
+def test_ids_survive_unclean_stop(tmp_path):
+    config = DedupConfig(path=str(tmp_path / 'dedup'))
+    cache = DedupCache(config)
+    cache.add('a')
+
+    assert DedupCache(config).seen('a')
+
+
+@pytest.mark.asyncio
+async def test_each_send_gets_message_id():
+    rabbitmq = create_rabbitmq({})
+    message = Message(action=POST_ACTION, routing_config={'exchange_name': 'test_exchange', 'routing_key': 'key'})
+
+    await rabbitmq.send_message(message)
+    await rabbitmq.send_message(message)
+
+    first, second = get_published(rabbitmq, 'test_exchange')
+    assert first.message_id and second.message_id and first.message_id != second.message_id
+    assert message.message_id is None
+
+
+@pytest.mark.asyncio
+async def test_processed_messages_are_skipped():
+    actions = []
+
+    async def process_data(action: PostAction) -> None:
+        actions.append(action)
+
+    service_consumer = ServiceConsumer(func=process_data, action_type=PostAction)
+    rabbitmq = create_rabbitmq({'consumer': service_consumer})
+    consumer = await create_consumer(rabbitmq, dedup=DedupConfig())
+    redelivered = IncomingMessageMock(b'not decoded', message_id='id')
+
+    await rabbitmq._process_message(consumer, IncomingMessageMock(POST_ACTION.serialize(), message_id='id'))
+    await rabbitmq._process_message(consumer, redelivered)
+
+    assert actions == [POST_ACTION]
+    assert redelivered.acked
@@ -0,0 +1,198 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from postiel_helpers.action.post.action import PostAction
+from postiel_helpers.codec.binary import BinaryCodec
+from postiel_helpers.message_broker.in_memory.in_memory import InMemory
+from postiel_helpers.message_broker.message import Message
+from postiel_helpers.message_broker.routing import BindingConfig, Router, get_routing_config
+from postiel_helpers.message_broker.service_consumer import ServiceConsumer
+from test.common import POST_ACTION
+
+
+def get_config(content_type=None, max_size=0, failed_routing=True):
+    return {
+        'common': {'logger_name': 'test'},
+        'connection': {'host': 'ignored'},
+        'create': {
+            'queues': [{'name': 'test_queue', 'max_size': max_size}, {'name': 'failed_queue'}],
+            'exchanges': [{'name': 'test_exchange', 'type': 'topic'}, {'name': 'failed_exchange'}],
+            'bindings': [
+                {'queue_name': 'test_queue', 'exchange_name': 'test_exchange', 'routing_key': 'post.#'},
+                {'queue_name': 'failed_queue', 'exchange_name': 'failed_exchange', 'routing_key': 'failed'},
+            ],
+        },
+        'consumers': [{
+            'queue_name': 'test_queue',
+            'consumer_name': 'consumer',
+            'failed_message_routing': {'exchange_name': 'failed_exchange', 'routing_key': 'failed'}
+            if failed_routing else None,
+        }],
+        'failed_consumers': [{'queue_name': 'failed_queue', 'consumer_name': 'failed_consumer'}],
+        'content_type': content_type,
+    }
+
+
+MESSAGE = Message(action=POST_ACTION, routing_config={'exchange_name': 'test_exchange', 'routing_key': 'post.new'})
+
+
+def test_router():
+    router = Router({'direct': 'direct', 'fanout': 'fanout', 'topic': 'topic'}, [
+        BindingConfig(queue_name='a', exchange_name='direct', routing_key='key'),
+        BindingConfig(queue_name='b', exchange_name='fanout'),
+        BindingConfig(queue_name='c', exchange_name='fanout'),
+        BindingConfig(queue_name='d', exchange_name='topic', routing_key='post.*'),
+        BindingConfig(queue_name='e', exchange_name='topic', routing_key='#.deleted'),
+    ])
+
+    assert router.route('direct', 'key') == ['a']
+    assert router.route('direct', 'other') == []
+    assert router.route('fanout', 'any') == ['b', 'c']
+    assert router.route('topic', 'post.deleted') == ['d', 'e']
+    assert router.route('topic', 'deleted') == ['e']
+    assert router.route('topic', 'post.new.deleted') == ['e']
+    with pytest.raises(ValueError):
+        router.route('missing', 'key')
+
+
+def test_routing_configs_are_parsed_once():
+    routing_config = get_routing_config({'exchange_name': 'exchange', 'routing_key': 'key'})
+
+    assert get_routing_config({'routing_key': 'key', 'exchange_name': 'exchange'}) is routing_config
+    assert get_routing_config({'exchange_name': 'exchange', 'routing_key': 'other'}).routing_key == 'other'
+    with pytest.raises(ValueError):
+        get_routing_config({'exchange_name': 'exchange'})
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('content_type', [None, BinaryCodec.CONTENT_TYPE])
+async def test_message_is_consumed(content_type):
+    actions = []
+
+    async def process_data(action: PostAction) -> None:
+        actions.append(action)
+
+    service_consumers = {'consumer': ServiceConsumer(func=process_data, action_type=PostAction),
+                         'failed_consumer': ServiceConsumer(func=process_data, action_type=PostAction)}
+    broker = await InMemory.initialize(get_config(content_type), service_consumers, close_grace=1)
+
+    await broker.send_messages([MESSAGE, MESSAGE])
+    await broker.close()
+
+    assert actions == [POST_ACTION, POST_ACTION]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('max_concurrency, expected', [(1, 1), (2, 2), (None, 3)])
+async def test_max_concurrency(max_concurrency, expected):
+    running = []
+    release = asyncio.Event()
+
+    async def process_data(action: PostAction) -> None:
+        running.append(action)
+        await release.wait()
+
+    config = get_config()
+    config['consumers'][0]['max_concurrency'] = max_concurrency
+    service_consumers = {'consumer': ServiceConsumer(func=process_data, action_type=PostAction),
+                         'failed_consumer': ServiceConsumer(func=process_data, action_type=PostAction)}
+    broker = await InMemory.initialize(config, service_consumers, close_grace=1)
+
+    await broker.send_messages([MESSAGE, MESSAGE, MESSAGE])
+    await asyncio.sleep(0.01)
+    assert len(running) == expected
+
+    release.set()
+    await broker.close()
+    assert len(running) == 3
+
+
+@pytest.mark.asyncio
+async def test_sync_cpu_bound_consumer_without_process_pool():
+    threads = []
+
+    def process_data(action: PostAction) -> None:
+        threads.append(threading.get_ident())
+
+    async def process_failed(action: PostAction) -> None:
+        raise AssertionError("Message should not fail")
+
+    service_consumers = {'consumer': ServiceConsumer(func=process_data, action_type=PostAction, cpu_bound=True),
+                         'failed_consumer': ServiceConsumer(func=process_failed, action_type=PostAction)}
+    broker = await InMemory.initialize(get_config(), service_consumers, close_grace=1)
+
+    await broker.send_message(MESSAGE)
+    await asyncio.sleep(0.01)
+    assert broker._queues['failed_queue'].empty()
+    await broker.close()
+
+    assert len(threads) == 1 and threads[0] != threading.get_ident()
+
+
+@pytest.mark.asyncio
+async def test_failed_message_is_routed_and_loaded():
+    failed_actions = []
+
+    async def process_data(action: PostAction) -> None:
+        raise ValueError()
+
+    async def process_failed(action: PostAction) -> None:
+        failed_actions.append(action)
+
+    service_consumers = {'consumer': ServiceConsumer(func=process_data, action_type=PostAction),
+                         'failed_consumer': ServiceConsumer(func=process_failed, action_type=PostAction)}
+    broker = await InMemory.initialize(get_config(BinaryCodec.CONTENT_TYPE), service_consumers, close_grace=1)
+
+    await broker.send_message(MESSAGE)
+    await asyncio.sleep(0.01)
+    assert failed_actions == []
+
+    await broker.load_failed()
+    await broker.close()
+
+    assert failed_actions == [POST_ACTION]
+
+
+@pytest.mark.asyncio
+async def test_full_queue_blocks_publisher():
+    release = asyncio.Event()
+
+    async def process_data(action: PostAction) -> None:
+        await release.wait()
+
+    service_consumers = {'consumer': ServiceConsumer(func=process_data, action_type=PostAction),
+                         'failed_consumer': ServiceConsumer(func=process_data, action_type=PostAction)}
+    broker = await InMemory.initialize(get_config(max_size=1), service_consumers, close_grace=1)
+
+    await broker.send_message(MESSAGE)
+    await broker.send_message(MESSAGE)
+    publishing = asyncio.create_task(broker.send_message(MESSAGE))
+    await asyncio.sleep(0.01)
+    assert not publishing.done()
+
+    release.set()
+    await publishing
+    await broker.close()
+
+
+@pytest.mark.asyncio
+async def test_delayed_message():
+    actions = []
+
+    async def process_data(action: PostAction) -> None:
+        actions.append(action)
+
+    service_consumers = {'consumer': ServiceConsumer(func=process_data, action_type=PostAction),
+                         'failed_consumer': ServiceConsumer(func=process_data, action_type=PostAction)}
+    broker = await InMemory.initialize(get_config(), service_consumers, close_grace=1)
+
+    await broker.send_message(MESSAGE.copy(update={'publish_datetime': datetime.now() + timedelta(seconds=0.05)}))
+    await asyncio.sleep(0.01)
+    assert actions == []
+
+    await asyncio.sleep(0.1)
+    assert actions == [POST_ACTION]
+    await broker.close()
@@ -0,0 +1,56 @@
+import time
+
+import pytest
+
+from postiel_helpers.action.post.action import PostAction
+from postiel_helpers.message_broker.rabbitmq.rabbitmq import ConsumerConfig, FailedReplayConfig, \
+    ORIGINAL_EXCHANGE_HEADER, ORIGINAL_ROUTING_KEY_HEADER
+from postiel_helpers.message_broker.service_consumer import ServiceConsumer
+from test.broker.common import IncomingMessageMock, create_consumer, create_rabbitmq, get_published
+from test.common import POST_ACTION
+
+FAILED_ROUTING = {'routing_key': 'test_dead_queue', 'exchange_name': 'test_dead_exchange'}
+ORIGINAL_HEADERS = {ORIGINAL_EXCHANGE_HEADER: 'test_exchange', ORIGINAL_ROUTING_KEY_HEADER: 'test_queue'}
+
+
+async def failing_process_data(action: PostAction) -> None:
+    raise ValueError()
+
+
+@pytest.mark.asyncio
+async def test_failed_message_keeps_original_routing():
+    service_consumer = ServiceConsumer(func=failing_process_data, action_type=PostAction)
+    rabbitmq = create_rabbitmq({'consumer': service_consumer})
+    consumer = await create_consumer(rabbitmq, failed_message_routing=FAILED_ROUTING)
+
+    await rabbitmq._process_message(consumer, IncomingMessageMock(POST_ACTION.serialize()))
+
+    failed_message, = get_published(rabbitmq, 'test_dead_exchange')
+    assert failed_message.headers == ORIGINAL_HEADERS
+
+
+@pytest.mark.asyncio
+async def test_load_failed_replays_to_original_routing():
+    actions = []
+
+    async def process_failed(action: PostAction) -> None:
+        actions.append(action)
+
+    rabbitmq = create_rabbitmq({'failed_consumer': ServiceConsumer(func=process_failed, action_type=PostAction)})
+    rabbitmq._failed_consumers = [ConsumerConfig(queue_name='test_dead_queue', consumer_name='failed_consumer')]
+    rabbitmq._failed_replay_config = FailedReplayConfig(rate=100, concurrency=2)
+    messages = [IncomingMessageMock(POST_ACTION.serialize(), headers=ORIGINAL_HEADERS) for _ in range(4)]
+    legacy_message = IncomingMessageMock(POST_ACTION.serialize())
+    channel = rabbitmq._channel_pool.get().channel
+    (await channel.get_queue('test_dead_queue')).messages = [*messages, legacy_message]
+
+    start = time.monotonic()
+    await rabbitmq.load_failed()
+
+    assert time.monotonic() - start >= 0.04
+    replayed = get_published(rabbitmq, 'test_exchange')
+    assert len(replayed) == 4 and all(message.headers == {} for message in replayed)
+    assert all(message.acked for message in [*messages, legacy_message])
+    assert actions == [POST_ACTION]
+    stats = rabbitmq.replay_stats['test_dead_queue']
+    assert stats.total == stats.replayed == 5 and stats.failed == 0
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from postiel_helpers.action.post.action import PostAction
+from postiel_helpers.message_broker.local.local import Local, LocalConfig
+from postiel_helpers.message_broker.message import Message
+from postiel_helpers.message_broker.service_consumer import ServiceConsumer
+from test.common import POST_ACTION
+
+MESSAGE = Message(action=POST_ACTION, routing_config={'exchange_name': 'test_exchange', 'routing_key': 'post'})
+
+
+def get_config(socket_directory, consumers):
+    return {
+        'common': {'logger_name': 'test'},
+        'socket_directory': str(socket_directory),
+        'create': {
+            'queues': [{'name': 'test_queue'}],
+            'exchanges': [{'name': 'test_exchange'}],
+            'bindings': [{'queue_name': 'test_queue', 'exchange_name': 'test_exchange', 'routing_key': 'post'}],
+        },
+        'consumers': [{'queue_name': 'test_queue', 'consumer_name': 'consumer'}] if consumers else [],
+    }
+
+
+def test_queues_are_bounded(tmp_path):
+    config = get_config(tmp_path, consumers=True)
+    assert LocalConfig.parse_obj(config).create.queues[0].max_size > 0
+
+    config['create']['queues'][0]['max_size'] = 0
+    with pytest.raises(ValueError):
+        LocalConfig.parse_obj(config)
+
+
+@pytest.mark.asyncio
+async def test_messages_are_sent_between_brokers(tmp_path):
+    actions = []
+
+    async def process_data(action: PostAction) -> None:
+        actions.append(action)
+
+    service_consumers = {'consumer': ServiceConsumer(func=process_data, action_type=PostAction)}
+    consumer = await Local.initialize(get_config(tmp_path, consumers=True), service_consumers, close_grace=1)
+    producer = await Local.initialize(get_config(tmp_path, consumers=False), {}, close_grace=1)
+
+    await producer.send_messages([MESSAGE] * 3)
+    await producer.close()
+    await asyncio.sleep(0.05)
+    await consumer.close()
+
+    assert actions == [POST_ACTION] * 3
+    assert not (tmp_path / 'test_queue.sock').exists()
+
+
+@pytest.mark.asyncio
+async def test_queue_is_served_by_one_process(tmp_path):
+    service_consumers = {'consumer': ServiceConsumer(func=lambda action: asyncio.sleep(0), action_type=PostAction)}
+    consumer = await Local.initialize(get_config(tmp_path, consumers=True), service_consumers, close_grace=1)
+
+    with pytest.raises(RuntimeError):
+        await Local.initialize(get_config(tmp_path, consumers=True), service_consumers, close_grace=1)
+    await consumer.close()
+
+
+@pytest.mark.asyncio
+async def test_unserved_queue_raises(tmp_path):
+    producer = await Local.initialize(get_config(tmp_path, consumers=False), {}, close_grace=1)
+
+    with pytest.raises(OSError):
+        await producer.send_message(MESSAGE)
+    await producer.close()
+
+
+@pytest.mark.asyncio
+async def test_client_connections_are_closed_on_close(tmp_path):
+    service_consumers = {'consumer': ServiceConsumer(func=lambda action: asyncio.sleep(0), action_type=PostAction)}
+    consumer = await Local.initialize(get_config(tmp_path, consumers=True), service_consumers, close_grace=1)
+    producer = await Local.initialize(get_config(tmp_path, consumers=False), {}, close_grace=1)
+    await producer.send_message(MESSAGE)
+    reader, _ = producer._connections['test_queue']
+
+    await asyncio.wait_for(consumer.close(), timeout=1)
+
+    assert await asyncio.wait_for(reader.read(), timeout=1) == b''
+    await producer.close()
@@ -0,0 +1,91 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from postiel_helpers.action.post.action import PostAction
+from postiel_helpers.action.post.file_object import FileObject
+from postiel_helpers.codec.binary import BinaryCodec
+from postiel_helpers.message_broker.message import Message
+from postiel_helpers.message_broker.outbox import Outbox, OutboxConfig, OutboxFullError
+from test.broker.common import create_rabbitmq, get_published
+from test.common import POST, POST_ACTION
+
+
+def get_message(routing_key: str) -> Message:
+    return Message(action=POST_ACTION, routing_config={'exchange_name': 'test_exchange', 'routing_key': routing_key})
+
+
+def test_messages_are_read_in_order_across_segments_and_restarts(tmp_path):
+    config = OutboxConfig(directory=str(tmp_path), segment_size=1024)
+    outbox = Outbox(config)
+    for index in range(10):
+        outbox.append(get_message(str(index)))
+    assert outbox.count == 10 and len(list(tmp_path.glob('*.segment'))) > 1
+
+    messages, position = outbox.peek(4)
+    outbox.ack(position, len(messages))
+    outbox.close()
+
+    outbox = Outbox(config)
+    assert outbox.count == 6
+    messages, position = outbox.peek(100)
+    outbox.ack(position, len(messages))
+
+    assert [message.routing_config['routing_key'] for message in messages] == [str(index) for index in range(4, 10)]
+    assert outbox.count == 0 and outbox.size == 0
+    assert len(list(tmp_path.glob('*.segment'))) == 1
+    outbox.close()
+
+
+def test_disk_usage_is_bounded(tmp_path):
+    outbox = Outbox(OutboxConfig(directory=str(tmp_path), segment_size=1024, max_size=2048))
+
+    with pytest.raises(OutboxFullError):
+        for index in range(100):
+            outbox.append(get_message(str(index)))
+    assert outbox.disk_size <= 2048
+    outbox.close()
+
+
+@pytest.mark.asyncio
+async def test_messages_are_kept_while_disconnected(tmp_path):
+    rabbitmq = create_rabbitmq({})
+    connection = SimpleNamespace(connection=None, is_closed=False)
+    rabbitmq._connections = [connection]
+    rabbitmq._outbox_config = OutboxConfig(directory=str(tmp_path), retry_interval=0.01)
+    rabbitmq._outbox = Outbox(rabbitmq._outbox_config)
+    rabbitmq._outbox_task = asyncio.create_task(rabbitmq._drain_outbox())
+
+    await rabbitmq.send_messages([get_message('0'), get_message('1')])
+    await rabbitmq.send_message(get_message('2'))
+    assert get_published(rabbitmq, 'test_exchange') == []
+    assert rabbitmq.outbox_size > 0
+
+    connection.connection = object()
+    await asyncio.sleep(0.1)
+
+    exchange = rabbitmq._channel_pool.get().channel.exchanges['test_exchange']
+    assert exchange.routing_keys == ['0', '1', '2']
+    assert rabbitmq.outbox_size == 0
+    rabbitmq._outbox_task.cancel()
+    rabbitmq._outbox.close()
+
+
+@pytest.mark.asyncio
+async def test_message_id_and_zero_copy_actions_are_kept_in_outbox(tmp_path):
+    image = bytes(range(256)) * 64
+    action = PostAction(channels=['1'], posts=[
+        POST.copy(update={'files': {'image': FileObject(url_included=False, data=image)}})])
+    decoded_action = BinaryCodec(zero_copy=True).decode(BinaryCodec().encode(action), PostAction)
+    rabbitmq = create_rabbitmq({})
+    rabbitmq._connections = [SimpleNamespace(connection=None, is_closed=False)]
+    rabbitmq._outbox_config = OutboxConfig(directory=str(tmp_path))
+    rabbitmq._outbox = Outbox(rabbitmq._outbox_config)
+
+    await rabbitmq.send_message(Message(action=decoded_action, routing_config={
+        'exchange_name': 'test_exchange', 'routing_key': 'key'}, headers={'header': 1}))
+    rabbitmq._outbox.close()
+
+    (message,), _ = Outbox(rabbitmq._outbox_config).peek(1)
+    assert message.message_id and message.headers == {'header': 1} and message.action == action
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from postiel_helpers.action.post.action import PostAction
+from postiel_helpers.message_broker.message import Message
+from postiel_helpers.message_broker.partition import OrderingConfig, PARTITION_KEY_HEADER, \
+    get_partition_keys, jump_hash
+from postiel_helpers.message_broker.service_consumer import ServiceConsumer
+from test.broker.common import IncomingMessageMock, create_consumer, create_rabbitmq, get_published
+from test.common import POST, POST_ACTION
+
+
+def test_jump_hash_is_consistent():
+    keys = [str(key) for key in range(1000)]
+    buckets = [jump_hash(key, 10) for key in keys]
+    moved = [key for key, bucket in zip(keys, buckets) if jump_hash(key, 11) != bucket]
+
+    assert set(buckets) == set(range(10))
+    assert all(jump_hash(key, 11) == 10 for key in moved)
+    assert 50 < len(moved) < 150
+
+
+def test_partition_key():
+    assert get_partition_keys(POST_ACTION, 'channels') == ['1', '2', '3']
+    assert get_partition_keys(POST_ACTION.copy(update={'channels': [1, 1]}), 'channels') == ['1']
+
+
+@pytest.mark.asyncio
+async def test_messages_with_same_key_are_processed_in_order():
+    processed = {'a': [], 'b': []}
+    running = []
+    max_running = []
+
+    async def process_data(action: PostAction) -> None:
+        index = action.channels[0]
+        running.append(index)
+        max_running.append(len(running))
+        await asyncio.sleep(0.01 * (len(keys) - index))
+        running.remove(index)
+        processed[keys[index]].append(index)
+
+    service_consumer = ServiceConsumer(func=process_data, action_type=PostAction)
+    rabbitmq = create_rabbitmq({'consumer': service_consumer})
+    consumer = await create_consumer(rabbitmq, ordering=OrderingConfig(key_field='channels', lanes=8))
+    keys = ['a', 'b', 'a', 'b', 'a', 'b']
+    messages = [IncomingMessageMock(POST_ACTION.copy(update={'channels': [index]}).serialize(), delivery_tag=index,
+                                    headers={PARTITION_KEY_HEADER: key}) for index, key in enumerate(keys)]
+
+    await asyncio.gather(*[rabbitmq._process_message(consumer, message) for message in messages])
+
+    assert consumer.lanes.get_index('a') != consumer.lanes.get_index('b')
+    assert processed == {'a': [0, 2, 4], 'b': [1, 3, 5]}
+    assert max(max_running) == 2
+
+
+@pytest.mark.asyncio
+async def test_publish_with_partition_routing():
+    rabbitmq = create_rabbitmq({})
+    routing_config = {'exchange_name': 'test_exchange', 'routing_key': 'post', 'partition_key_field': 'channels',
+                      'partition_buckets': 4}
+
+    await rabbitmq.send_message(Message(action=POST_ACTION, routing_config=routing_config))
+
+    message, = get_published(rabbitmq, 'test_exchange')
+    assert message.headers[PARTITION_KEY_HEADER] == ['1', '2', '3']
+    channel = rabbitmq._channel_pool.get().channel
+    assert channel.exchanges['test_exchange'].routing_keys == [f'post.{jump_hash("1", 4)}']
+
+
+@pytest.mark.asyncio
+async def test_messages_with_overlapping_keys_are_processed_in_order():
+    processed = []
+
+    async def process_data(action: PostAction) -> None:
+        await asyncio.sleep(0.01 * len(action.channels))
+        processed.append(action.posts[0].post_id)
+
+    service_consumer = ServiceConsumer(func=process_data, action_type=PostAction)
+    rabbitmq = create_rabbitmq({'consumer': service_consumer})
+    consumer = await create_consumer(rabbitmq, ordering=OrderingConfig(key_field='channels', lanes=64))
+    channels = [[1, 2], [2, 3], [1], [3], [4]]
+    messages = [IncomingMessageMock(PostAction(channels=message_channels, posts=[POST.copy(update={'post_id': index})])
+                                    .serialize(), delivery_tag=index) for index, message_channels in enumerate(channels)]
+
+    await asyncio.gather(*[rabbitmq._process_message(consumer, message) for message in messages])
+
+    assert processed.index(0) < processed.index(1) < processed.index(3)
+    assert processed.index(0) < processed.index(2)
+    assert processed[0] == 4
@@ -0,0 +1,34 @@
+import asyncio
+import logging
+
+import aio_pika
+import pytest
+
+from postiel_helpers.message_broker.rabbitmq.publisher import Publisher, PublisherConfig
+from test.broker.common import ExchangeMock
+
+
+@pytest.mark.asyncio
+async def test_publisher_window():
+    exchange = ExchangeMock()
+    publisher = Publisher(PublisherConfig(max_unconfirmed=4), logging.getLogger())
+
+    confirmations = [await publisher.publish(exchange, aio_pika.Message(body=bytes([index])), routing_key='test')
+                     for index in range(10)]
+    await asyncio.gather(*confirmations)
+
+    assert exchange.max_in_flight == 4
+    assert exchange.published == [bytes([index]) for index in range(10)]
+    assert publisher.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_publisher_flush():
+    exchange = ExchangeMock()
+    publisher = Publisher(PublisherConfig(buffered=True), logging.getLogger())
+    for index in range(3):
+        await publisher.publish(exchange, aio_pika.Message(body=bytes([index])), routing_key='test')
+
+    await publisher.flush()
+
+    assert len(exchange.published) == 3
@@ -0,0 +1,88 @@
+import pytest
+
+from postiel_helpers.action.post.action import PostAction
+from postiel_helpers.message_broker.retry import ATTEMPT_HEADER, RetryConfig
+from postiel_helpers.message_broker.scheduler import Scheduler
+from postiel_helpers.message_broker.service_consumer import ServiceConsumer
+from test.broker.common import IncomingMessageMock, create_consumer, create_rabbitmq, get_published
+from test.common import POST_ACTION
+
+FAILED_ROUTING = {'routing_key': 'test_dead_queue', 'exchange_name': 'test_dead_exchange'}
+RETRY = RetryConfig(max_attempts=3, initial_delay=1, multiplier=2, jitter=0.5)
+
+
+async def failing_process_data(action: PostAction) -> None:
+    raise ValueError()
+
+
+def test_backoff():
+    config = RetryConfig(initial_delay=1, multiplier=3, max_delay=5, jitter=0.2)
+
+    assert [config.get_delay(attempt) for attempt in range(1, 5)] == [1, 3, 5, 5]
+    assert all(2.4 <= config.get_jittered_delay(2) <= 3 for _ in range(100))
+
+
+@pytest.mark.asyncio
+async def test_failed_message_is_retried_through_delay_queue():
+    service_consumer = ServiceConsumer(func=failing_process_data, action_type=PostAction)
+    rabbitmq = create_rabbitmq({'consumer': service_consumer})
+    consumer = await create_consumer(rabbitmq, failed_message_routing=FAILED_ROUTING, retry=RETRY)
+
+    await rabbitmq._process_message(consumer, IncomingMessageMock(POST_ACTION.serialize()))
+    await rabbitmq._process_message(consumer, IncomingMessageMock(POST_ACTION.serialize(),
+                                                                  headers={ATTEMPT_HEADER: 2}))
+
+    channel = rabbitmq._channel_pool.get().channel
+    assert channel.declared_queues == {
+        'test_queue.retry.1000': {'durable': True, 'arguments': {
+            'x-message-ttl': 1000, 'x-dead-letter-exchange': '', 'x-dead-letter-routing-key': 'test_queue'}},
+        'test_queue.retry.2000': {'durable': True, 'arguments': {
+            'x-message-ttl': 2000, 'x-dead-letter-exchange': '', 'x-dead-letter-routing-key': 'test_queue'}},
+    }
+    first, second = get_published(rabbitmq, '')
+    assert dict(first.headers) == {ATTEMPT_HEADER: 2} and 0.5 <= first.expiration <= 1
+    assert dict(second.headers) == {ATTEMPT_HEADER: 3} and 1 <= second.expiration <= 2
+    assert get_published(rabbitmq, 'test_dead_exchange') == []
+
+
+@pytest.mark.asyncio
+async def test_message_is_dead_lettered_after_last_attempt():
+    service_consumer = ServiceConsumer(func=failing_process_data, action_type=PostAction)
+    rabbitmq = create_rabbitmq({'consumer': service_consumer})
+    consumer = await create_consumer(rabbitmq, failed_message_routing=FAILED_ROUTING, retry=RETRY)
+
+    await rabbitmq._process_message(consumer, IncomingMessageMock(POST_ACTION.serialize(),
+                                                                  headers={ATTEMPT_HEADER: 3}))
+
+    assert get_published(rabbitmq, '') == []
+    assert len(get_published(rabbitmq, 'test_dead_exchange')) == 1
+
+
+@pytest.mark.asyncio
+async def test_retried_and_dead_lettered_messages_keep_id():
+    service_consumer = ServiceConsumer(func=failing_process_data, action_type=PostAction)
+    rabbitmq = create_rabbitmq({'consumer': service_consumer})
+    consumer = await create_consumer(rabbitmq, failed_message_routing=FAILED_ROUTING, retry=RETRY)
+
+    await rabbitmq._process_message(consumer, IncomingMessageMock(POST_ACTION.serialize(), message_id='id'))
+    await rabbitmq._process_message(consumer, IncomingMessageMock(POST_ACTION.serialize(), message_id='id',
+                                                                  headers={ATTEMPT_HEADER: 3}))
+
+    retried, = get_published(rabbitmq, '')
+    failed, = get_published(rabbitmq, 'test_dead_exchange')
+    assert retried.message_id == failed.message_id == 'id'
+
+
+@pytest.mark.asyncio
+async def test_retry_is_scheduled_when_scheduler_is_configured():
+    service_consumer = ServiceConsumer(func=failing_process_data, action_type=PostAction)
+    rabbitmq = create_rabbitmq({'consumer': service_consumer})
+    rabbitmq._scheduler = Scheduler(rabbitmq.send_message)
+    consumer = await create_consumer(rabbitmq, failed_message_routing=FAILED_ROUTING, retry=RETRY)
+
+    await rabbitmq._process_message(consumer, IncomingMessageMock(POST_ACTION.serialize()))
+
+    assert rabbitmq._scheduler.pending == 1
+    scheduled = rabbitmq._scheduler._heap[0].message
+    assert scheduled.routing_config == {'exchange_name': '', 'routing_key': 'test_queue'}
+    assert scheduled.headers == {ATTEMPT_HEADER: 2}
@@ -0,0 +1,119 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from postiel_helpers.message_broker.message import Message
+from postiel_helpers.message_broker.rabbitmq.rabbitmq import RabbitMQ
+from postiel_helpers.message_broker.scheduler import Journal, Scheduler, SchedulerConfig
+from test.common import POST_ACTION
+
+
+def get_message(delay: float, routing_key: str = 'key') -> Message:
+    return Message(action=POST_ACTION, routing_config={'exchange_name': 'exchange', 'routing_key': routing_key},
+                   publish_datetime=datetime.now() + timedelta(seconds=delay))
+
+
+@pytest.mark.asyncio
+async def test_messages_are_sent_when_due_in_order():
+    sent = []
+
+    async def send(message: Message) -> None:
+        sent.append(message)
+
+    scheduler = Scheduler(send)
+    await scheduler.start()
+    await scheduler.schedule(get_message(0.1, 'second'))
+    await scheduler.schedule(get_message(0.05, 'first'))
+    await asyncio.sleep(0.01)
+    assert sent == [] and scheduler.pending == 2
+
+    await asyncio.sleep(0.15)
+    await scheduler.close()
+
+    assert [message.routing_config['routing_key'] for message in sent] == ['first', 'second']
+    assert all(message.publish_datetime is None for message in sent)
+
+
+@pytest.mark.asyncio
+async def test_scheduled_messages_survive_restart(tmp_path):
+    sent = []
+
+    async def send(message: Message) -> None:
+        sent.append(message)
+
+    config = SchedulerConfig(journal_path=str(tmp_path / 'scheduler' / 'journal'))
+    scheduler = Scheduler(send, config)
+    await scheduler.start()
+    await scheduler.schedule(get_message(0))
+    await scheduler.schedule(get_message(0.1))
+    await asyncio.sleep(0.02)
+    await scheduler.close()
+    assert len(sent) == 1
+
+    scheduler = Scheduler(send, config)
+    await scheduler.start()
+    assert scheduler.pending == 1
+    await asyncio.sleep(0.15)
+    await scheduler.close()
+
+    assert len(sent) == 2 and sent[1].action == POST_ACTION
+
+
+@pytest.mark.asyncio
+async def test_journal_is_compacted_when_published_records_pass_threshold(tmp_path):
+    async def send(message: Message) -> None:
+        pass
+
+    path = tmp_path / 'journal'
+    scheduler = Scheduler(send, SchedulerConfig(journal_path=str(path), compact_threshold=3))
+    await scheduler.start()
+    await scheduler.schedule(get_message(60))
+    for _ in range(2):
+        await scheduler.schedule(get_message(0))
+    await asyncio.sleep(0.02)
+    size = path.stat().st_size
+    await scheduler.schedule(get_message(0))
+    await asyncio.sleep(0.02)
+
+    assert path.stat().st_size < size and scheduler._journal.published == 0
+    assert list(Journal(str(path)).load()) == [scheduled.message_id for scheduled in scheduler._heap]
+    await scheduler.close()
+
+
+def test_journal_stores_messages_without_pickle(tmp_path):
+    path = tmp_path / 'journal'
+    message = get_message(1).copy(update={'headers': {'attempt': 2}, 'message_id': 'id'})
+    journal = Journal(str(path))
+    journal.open()
+    journal.append('scheduled', message)
+    journal.append('published', message)
+    journal.append('published', None)
+    journal.close()
+
+    assert Journal(str(path)).load() == {'scheduled': message}
+    assert b'postiel_helpers.message_broker.message' not in path.read_bytes()
+
+
+@pytest.mark.asyncio
+async def test_failed_send_is_retried():
+    sent = []
+
+    async def send(message: Message) -> None:
+        if not sent:
+            sent.append(None)
+            raise ConnectionError()
+        sent.append(message)
+
+    scheduler = Scheduler(send, SchedulerConfig(retry_interval=0.01))
+    await scheduler.start()
+    await scheduler.schedule(get_message(0))
+    await asyncio.sleep(0.05)
+    await scheduler.close()
+
+    assert len(sent) == 2 and scheduler.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_past_publish_datetime_has_no_negative_delay():
+    assert await RabbitMQ._get_delay(datetime.now() - timedelta(seconds=10)) == 0
@@ -0,0 +1,93 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from postiel_helpers.action.post.action import PostAction
+from postiel_helpers.action.post.file_object import FileObject
+from postiel_helpers.codec.binary import BinaryCodec
+from postiel_helpers.message_broker.service_consumer import ServiceConsumer
+from postiel_helpers.message_broker.worker import run_consumer
+from test.broker.common import IncomingMessageMock, create_consumer, create_rabbitmq, get_published
+from test.common import POST
+
+
+def write_pid(action: PostAction) -> None:
+    with open(action.channels[0], 'w') as file:
+        file.write(str(os.getpid()))
+
+
+async def async_write_pid(action: PostAction) -> None:
+    write_pid(action)
+
+
+@pytest.mark.parametrize('func', [write_pid, async_write_pid])
+def test_run_consumer(tmp_path, func):
+    path = str(tmp_path / 'pid')
+    action = PostAction(channels=[path], posts=[POST])
+
+    run_consumer(func, PostAction, action.serialize(), BinaryCodec.CONTENT_TYPE, None)
+
+    with open(path) as file:
+        assert file.read() == str(os.getpid())
+
+
+@pytest.mark.asyncio
+async def test_cpu_bound_consumer(tmp_path):
+    path = str(tmp_path / 'pid')
+    service_consumer = ServiceConsumer(func=write_pid, action_type=PostAction, cpu_bound=True)
+    rabbitmq = create_rabbitmq({'consumer': service_consumer})
+    with ProcessPoolExecutor(max_workers=1) as process_pool:
+        rabbitmq._process_pool = process_pool
+        consumer = await create_consumer(rabbitmq)
+        message = IncomingMessageMock(PostAction(channels=[path], posts=[POST]).serialize())
+
+        await rabbitmq._process_message(consumer, message)
+
+    assert message.acked
+    with open(path) as file:
+        assert file.read() != str(os.getpid())
+
+
+@pytest.mark.asyncio
+async def test_cpu_bound_consumer_without_process_pool():
+    threads = []
+
+    def process_data(action: PostAction) -> None:
+        threads.append(threading.get_ident())
+
+    service_consumer = ServiceConsumer(func=process_data, action_type=PostAction, cpu_bound=True)
+    rabbitmq = create_rabbitmq({'consumer': service_consumer})
+    consumer = await create_consumer(rabbitmq, failed_message_routing={'exchange_name': 'failed_exchange',
+                                                                        'routing_key': 'failed'})
+    message = IncomingMessageMock(PostAction(channels=['channel'], posts=[POST]).serialize())
+
+    await rabbitmq._process_message(consumer, message)
+
+    assert message.acked
+    assert len(threads) == 1 and threads[0] != threading.get_ident()
+    assert get_published(rabbitmq, 'failed_exchange') == []
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('zero_copy', [False, True])
+async def test_zero_copy_consumer(zero_copy):
+    received = []
+
+    async def process_data(action: PostAction) -> None:
+        received.append(action.posts[0].files['image'].data)
+        raise ValueError
+
+    image = os.urandom(4096)
+    action = PostAction(channels=[1], posts=[POST.copy(update={'files': {'image': FileObject(url_included=False,
+                                                                                               data=image)}})])
+    rabbitmq = create_rabbitmq({'consumer': ServiceConsumer(func=process_data, action_type=PostAction)})
+    consumer = await create_consumer(rabbitmq, zero_copy=zero_copy, failed_message_routing={
+        'exchange_name': 'failed_exchange', 'routing_key': 'failed'})
+
+    await rabbitmq._process_message(consumer, IncomingMessageMock(action.serialize()))
+
+    assert isinstance(received[0], memoryview if zero_copy else bytes) and received[0] == image
+    failed_action = PostAction.deserialize(get_published(rabbitmq, 'failed_exchange')[0].body)
+    assert failed_action.posts[0].files['image'].data == image
@@ -0,0 +1,107 @@
+from datetime import datetime, timezone
+from typing import List, Optional, Union
+
+import pytest
+
+from postiel_helpers.action.action import Action
+from postiel_helpers.action.post.action import PostAction
+from postiel_helpers.action.post.file_object import FileObject
+from postiel_helpers.action.post.post import Post
+from postiel_helpers.codec.binary import BinaryCodec
+from postiel_helpers.codec.pickle_codec import PickleCodec
+from postiel_helpers.codec.registry import get_codec
+from postiel_helpers.langauge.language import Language
+from test.common import POST, POST_ACTION
+
+
+def test_binary_codec_round_trip():
+    codec = BinaryCodec()
+    action = codec.decode(codec.encode(POST_ACTION), PostAction)
+    assert action == POST_ACTION
+    assert action.posts[0].data['attribute'].data == {Language.EN: 'Name', Language.ES: 'Nombre'}
+
+
+def test_binary_codec_smaller_than_pickle():
+    assert len(BinaryCodec().encode(POST_ACTION)) < len(PickleCodec().encode(POST_ACTION))
+
+
+def test_binary_codec_schema_version_mismatch():
+    class NewPostAction(PostAction):
+        priority: int = 0
+
+    with pytest.raises(ValueError):
+        BinaryCodec().decode(BinaryCodec().encode(POST_ACTION), NewPostAction)
+
+
+def test_schema_version_covers_nested_models():
+    class NewPost(Post):
+        template: Optional[int] = None
+
+    class NewPostAction(Action):
+        channels: List[Union[str, int]]
+        posts: List[NewPost]
+
+    class SamePostAction(Action):
+        channels: List[Union[str, int]]
+        posts: List[Post]
+
+    assert BinaryCodec().decode(BinaryCodec().encode(POST_ACTION), SamePostAction).posts == POST_ACTION.posts
+    with pytest.raises(ValueError):
+        BinaryCodec().decode(BinaryCodec().encode(POST_ACTION), NewPostAction)
+
+
+def test_legacy_codec_without_content_type():
+    assert isinstance(get_codec(None), PickleCodec)
+
+
+@pytest.mark.parametrize('data', [PickleCodec().encode(POST_ACTION), BinaryCodec().encode(POST_ACTION)])
+def test_deserialize_detects_content_type(data):
+    assert PostAction.deserialize(data) == POST_ACTION
+
+
+def test_languages_are_sent_by_name():
+    # fixext 2 value with language extension code and ISO 639-1 member name.
+    assert b'\xd5\x01ES' in BinaryCodec().encode(POST_ACTION)
+
+
+def test_datetime_round_trip():
+    class DateAction(Action):
+        date: datetime
+
+    codec = BinaryCodec()
+    action = DateAction(date=datetime(2020, 1, 1, tzinfo=timezone.utc))
+    assert codec.decode(codec.encode(action), DateAction) == action
+
+
+def test_out_of_band_buffers_are_not_copied():
+    image = bytes(range(256)) * 64
+    action = PostAction(channels=[1], posts=[
+        POST.copy(update={'files': {'image': FileObject(url_included=False, filename='a.png', data=image)}})])
+    data = BinaryCodec(out_of_band_threshold=1024).encode(action)
+    decoded = BinaryCodec(zero_copy=True).decode(data, PostAction)
+
+    file_data = decoded.posts[0].files['image'].data
+    assert isinstance(file_data, memoryview)
+    assert file_data.obj is data
+    assert file_data == image
+    assert decoded == action
+
+
+def test_out_of_band_disabled():
+    image = b'\x00' * 4096
+    action = PostAction(channels=[1], posts=[
+        POST.copy(update={'files': {'image': FileObject(url_included=False, data=image)}})])
+    decoded = BinaryCodec(out_of_band_threshold=None).decode(
+        BinaryCodec(out_of_band_threshold=None).encode(action), PostAction)
+    assert type(decoded.posts[0].files['image'].data) is bytes
+
+
+def test_out_of_band_buffers_are_decoded_as_bytes():
+    image = b'\x01' * 4096
+    action = PostAction(channels=[1], posts=[
+        POST.copy(update={'files': {'image': FileObject(url_included=False, data=image)}})])
+    decoded = BinaryCodec().decode(BinaryCodec().encode(action), PostAction)
+
+    assert type(decoded.posts[0].files['image'].data) is bytes
+    assert PickleCodec().decode(PickleCodec().encode(decoded), PostAction) == action
+    assert decoded.copy(deep=True) == action
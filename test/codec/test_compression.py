@@ -0,0 +1,23 @@
+import pytest
+
+from postiel_helpers.codec.binary import BinaryCodec
+from postiel_helpers.codec.compression import COMPRESSORS, Compression, CompressionConfig
+from test.common import POST_ACTION
+
+
+@pytest.mark.parametrize('content_encoding', list(COMPRESSORS))
+def test_compression(content_encoding):
+    compression = Compression(CompressionConfig(content_encoding=content_encoding, threshold=64))
+    data = BinaryCodec().encode(POST_ACTION.copy(update={'posts': POST_ACTION.posts * 10}))
+
+    compressed_data, used_content_encoding = compression.compress(data)
+
+    assert used_content_encoding == content_encoding
+    assert Compression.decompress(compressed_data, used_content_encoding) == data
+    assert compression.stats.saved_bytes == len(data) - len(compressed_data) > 0
+
+
+def test_compression_under_threshold():
+    compression = Compression(CompressionConfig(threshold=1024))
+    assert compression.compress(b'data') == (b'data', None)
+    assert compression.stats.uncompressed_messages == 1 and compression.stats.saved_bytes == 0
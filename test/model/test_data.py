@@ -6,8 +6,13 @@ import typing
 import pytest
 from pydantic import BaseModel, ValidationError
 
+from postiel_helpers.action.post.action import PostAction
+from postiel_helpers.action.post.author import Author
+from postiel_helpers.action.post.file_object import FileObject
+from postiel_helpers.action.post.post import Post
 from postiel_helpers.langauge.language import Language
 from postiel_helpers.model.data import DataModel
+from test.common import POST_ACTION
 
 
 class DataInner(DataModel):
@@ -50,3 +55,43 @@ def test_integrity_fail():
             type_language=Language.ES,
             type_ordered_dict=OrderedDict([(Language.ES, 'a')])
         )
+
+
+def test_trusted_creates_nested_models_without_validation():
+    action = PostAction.trusted(**POST_ACTION.dict())
+
+    assert action == POST_ACTION
+    post = action.posts[0]
+    assert type(post) is Post and type(post.author) is Author
+    assert all(type(file) is FileObject for file in post.files.values())
+    assert DataInner.trusted(type_datetime='now').type_datetime == 'now'
+
+
+def test_trusted_keeps_given_models_and_defaults():
+    post = Post.trusted(channel_destination=[1])
+
+    assert PostAction.trusted(channels=[1], posts=[post]).posts[0] is post
+    assert post.files == OrderedDict() and post.author is None
+
+
+def test_trusted_creates_deeply_nested_and_union_models():
+    class Author(DataModel):
+        name: str
+
+    class File(DataModel):
+        url: str
+        size: int = 0
+
+    class Container(DataModel):
+        authors: typing.Dict[str, typing.List[typing.Optional[Author]]] = {}
+        item: typing.Union[File, Author, None] = None
+        items: typing.Optional[typing.List[typing.Union[Author, typing.List[File]]]] = None
+
+    container = Container.trusted(authors={'a': [{'name': 'a'}, None]}, item={'name': 'b'},
+                                  items=[{'name': 'c'}, [{'url': 'd'}]])
+
+    assert type(container.authors['a'][0]) is Author and container.authors['a'][1] is None
+    assert type(container.item) is Author
+    assert type(container.items[0]) is Author and type(container.items[1][0]) is File
+    assert container == Container(authors={'a': [{'name': 'a'}, None]}, item={'name': 'b'},
+                                  items=[{'name': 'c'}, [{'url': 'd'}]])
@@ -0,0 +1,109 @@
+import asyncio
+import json
+from typing import Any, Dict, List
+
+import pytest
+
+from postiel_helpers.config.base_config import BaseConfig
+from postiel_helpers.config.message_broker import MessageBrokerConfig
+from postiel_helpers.services.config import ConfigSnapshots
+from postiel_helpers.services.service import Service
+
+LOGGING = {'logger_name': 'test', 'config': {'version': 1, 'disable_existing_loggers': False}}
+
+
+def write_config(path, **config) -> None:
+    path.write_text(json.dumps({'logging': LOGGING, **config}))
+
+
+def create_service(directory, cache_directory=None) -> Service:
+    class MockService(Service):
+        _CONFIG_DIRECTORY = str(directory)
+        _CONFIG_FILENAME = 'config.yaml'
+        _CONFIG_CACHE_DIRECTORY = cache_directory
+
+        def __init__(self):
+            super().__init__()
+            self.loaded: List[Dict[str, MessageBrokerConfig]] = []
+
+        async def _start(self) -> None:
+            pass
+
+        async def _load_brokers(self, message_brokers: Dict[str, MessageBrokerConfig]) -> None:
+            self.loaded.append(message_brokers)
+
+    return MockService()
+
+
+@pytest.mark.asyncio
+async def test_reload_is_skipped_when_config_is_unchanged(tmp_path):
+    write_config(tmp_path / 'config.yaml')
+    service = create_service(tmp_path)
+
+    await service._load_config()
+    await service._load_config()
+    assert len(service.loaded) == 1
+
+    write_config(tmp_path / 'config.yaml', process_pool={'max_workers': 2})
+    await service._load_config()
+    assert len(service.loaded) == 2
+    await service._stop()
+
+
+def test_snapshots_are_loaded_from_cache_directory(tmp_path):
+    config = BaseConfig.parse_obj({'logging': LOGGING})
+    snapshots = ConfigSnapshots(BaseConfig, str(tmp_path))
+    digest = snapshots.get_hash(b'config')
+    snapshots.add(digest, config)
+
+    loaded = ConfigSnapshots(BaseConfig, str(tmp_path)).get(digest)
+    assert loaded == config and loaded is not config
+    assert ConfigSnapshots(BaseConfig, str(tmp_path)).get(snapshots.get_hash(b'other')) is None
+
+
+def test_snapshot_hash_depends_on_config_model():
+    class Config(BaseConfig):
+        value: int = 0
+
+    class ChangedConfig(BaseConfig):
+        value: str = ''
+
+    ChangedConfig.__qualname__ = Config.__qualname__
+    assert ConfigSnapshots(Config).get_hash(b'config') != ConfigSnapshots(ChangedConfig).get_hash(b'config')
+
+
+@pytest.mark.asyncio
+async def test_config_data_can_be_overridden(tmp_path):
+    class MockService(Service):
+        _CONFIG_DIRECTORY = str(tmp_path)
+        _CONFIG_FILENAME = 'missing.yaml'
+
+        async def _start(self) -> None:
+            pass
+
+        async def _get_config_data(self) -> Dict[str, Any]:
+            return {'logging': LOGGING}
+
+    service = MockService()
+    await service._load_config()
+
+    assert service._config_loaded
+    await service._stop()
+
+
+@pytest.mark.asyncio
+async def test_config_is_reloaded_when_file_changes(tmp_path):
+    config_watch = {'debounce': 0.05, 'interval': 0.02}
+    write_config(tmp_path / 'config.yaml', config_watch=config_watch)
+    service = create_service(tmp_path)
+    await service._load_config()
+
+    write_config(tmp_path / 'config.yaml', config_watch=config_watch, process_pool={'max_workers': 2})
+    for _ in range(100):
+        if len(service.loaded) == 2:
+            break
+        await asyncio.sleep(0.02)
+    assert len(service.loaded) == 2
+
+    await service._stop()
+    assert service._config_watch_task is None
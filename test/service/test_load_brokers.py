@@ -0,0 +1,177 @@
+import asyncio
+import time
+from typing import Any, Dict, List
+
+import pytest
+
+from postiel_helpers.config.message_broker import MessageBrokerConfig
+from postiel_helpers.config.producer import ProducerConfig
+from postiel_helpers.message_broker.interface import MessageBrokerInterface
+from postiel_helpers.message_broker.message import Message
+from postiel_helpers.message_broker.rabbitmq.rabbitmq import ConsumerConfig, ConsumerData, RabbitMQConfig
+from postiel_helpers.message_broker.service_consumer import ServiceConsumer
+from postiel_helpers.services.producer import Producer
+from postiel_helpers.services.service import Service
+from test.broker.common import QueueMock, create_rabbitmq
+from test.common import POST_ACTION
+
+
+class BrokerMock(MessageBrokerInterface):
+    instances: List['BrokerMock'] = []
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.closed = False
+        self.reloaded = False
+        self.sent: List[Message] = []
+
+    @classmethod
+    async def initialize(cls, config, service_consumers, close_grace, process_pool=None):
+        await asyncio.sleep(0.05)
+        if config.get('fail'):
+            raise ValueError()
+        instance = cls(config)
+        cls.instances.append(instance)
+        return instance
+
+    async def reload(self, config: Dict[str, Any]) -> bool:
+        if config.get('reloadable'):
+            self.config = config
+            self.reloaded = True
+            return True
+        return False
+
+    async def send_message(self, message: Message) -> None:
+        assert not self.closed
+        self.sent.append(message)
+
+    async def close(self) -> None:
+        self.closed = True
+
+    async def load_failed(self) -> None:
+        pass
+
+
+class MockService(Service):
+    _CONFIG_DIRECTORY = ''
+    _CONFIG_FILENAME = ''
+    _MESSAGE_BROKERS_CLASSES = {'Mock': BrokerMock}
+
+    async def _start(self) -> None:
+        pass
+
+
+def get_configs(**configs) -> Dict[str, MessageBrokerConfig]:
+    return {name: MessageBrokerConfig(class_name='Mock', config=config) for name, config in configs.items()}
+
+
+@pytest.mark.asyncio
+async def test_brokers_are_initialized_concurrently_and_reloaded_by_diff():
+    service = MockService()
+
+    start = time.monotonic()
+    await service._load_brokers(get_configs(kept={}, reloaded={'reloadable': True}, recreated={}, removed={}))
+    assert time.monotonic() - start < 0.15
+    kept, reloaded, recreated, removed = [service._brokers[name]
+                                          for name in ('kept', 'reloaded', 'recreated', 'removed')]
+
+    await service._load_brokers(get_configs(kept={}, reloaded={'reloadable': True, 'value': 1},
+                                            recreated={'value': 1}, added={}))
+
+    assert service._brokers['kept'] is kept and not kept.closed
+    assert service._brokers['reloaded'] is reloaded and reloaded.reloaded and not reloaded.closed
+    assert service._brokers['recreated'] is not recreated and recreated.closed
+    assert service._brokers['recreated'].config == {'value': 1}
+    assert removed.closed and 'removed' not in service._brokers
+    assert 'added' in service._brokers
+
+
+@pytest.mark.asyncio
+async def test_initialization_error_fails_initial_load_and_keeps_old_broker_on_reload():
+    service = MockService()
+    with pytest.raises(ValueError):
+        await service._load_brokers(get_configs(broker={}, failing={'fail': True}))
+    assert BrokerMock.instances[-1].closed
+
+    await service._load_brokers(get_configs(broker={}))
+    service._config_loaded = True
+    broker = service._brokers['broker']
+    await service._load_brokers(get_configs(broker={'fail': True}, failing={'fail': True}))
+
+    assert service._brokers == {'broker': broker} and not broker.closed
+    assert service._brokers_config == get_configs(broker={})
+
+
+@pytest.mark.asyncio
+async def test_producer_is_switched_before_old_broker_is_closed():
+    service = MockService()
+    await service._load_brokers(get_configs(broker={}))
+    broker = service._brokers['broker']
+    service._producer = Producer(service._brokers, ProducerConfig.parse_obj({'routes': [
+        {'action_type': 'Action', 'broker': 'broker', 'routing': {'exchange_name': 'exchange', 'routing_key': 'key'}}]}))
+    service._producer.start()
+
+    await service._producer.send_action(POST_ACTION)
+    await service._load_brokers(get_configs(broker={'value': 1}))
+    await service._producer.send_action(POST_ACTION)
+    await service._producer.close()
+
+    assert broker.closed and len(broker.sent) == 1
+    assert len(service._brokers['broker'].sent) == 1
+
+
+def get_producer_config(broker: str) -> ProducerConfig:
+    return ProducerConfig.parse_obj({'routes': [{'action_type': 'Action', 'broker': broker,
+                                                 'routing': {'exchange_name': 'exchange', 'routing_key': 'key'}}]})
+
+
+@pytest.mark.asyncio
+async def test_producer_is_only_replaced_by_a_valid_changed_config():
+    service = MockService()
+    await service._load_brokers(get_configs(broker={}))
+    with pytest.raises(ValueError):
+        await service._load_producer(get_producer_config('missing'))
+
+    await service._load_producer(get_producer_config('broker'))
+    service._config_loaded = True
+    producer = service._producer
+    await service._load_producer(get_producer_config('broker'))
+    assert service._producer is producer
+
+    await service._load_producer(get_producer_config('missing'))
+    assert service._producer is producer and service._producer_config == get_producer_config('broker')
+
+    await service._producer.send_action(POST_ACTION)
+    await service._load_producer(None)
+    assert service._producer is None and len(service._brokers['broker'].sent) == 1
+
+
+@pytest.mark.asyncio
+async def test_rabbitmq_reload_only_changes_consumers():
+    service_consumer = ServiceConsumer(func=lambda action: asyncio.sleep(0), action_type=None)
+    rabbitmq = create_rabbitmq({'kept': service_consumer, 'removed': service_consumer, 'added': service_consumer})
+    routing = {'exchange_name': 'failed', 'routing_key': 'failed'}
+    config = {'common': {'logger_name': ''}, 'connection': {},
+              'create': {'exchanges': [{'name': 'failed', 'type': 'direct'}]},
+              'consumers': [{'queue_name': name, 'consumer_name': name, 'failed_message_routing': routing}
+                            for name in ('kept', 'removed')]}
+    rabbitmq._config = RabbitMQConfig.parse_obj(config)
+    kept, removed = [ConsumerData(config=consumer_config, service_consumer=service_consumer,
+                                  channel=rabbitmq._channel_pool.get().channel, queue=QueueMock(), consumer_tag='tag')
+                     for consumer_config in rabbitmq._config.consumers]
+    rabbitmq._consumers = [kept, removed]
+    created = []
+
+    async def create_consumer(consumer_config: ConsumerConfig, connection: Any) -> ConsumerData:
+        created.append(consumer_config.consumer_name)
+        return ConsumerData(config=consumer_config, service_consumer=service_consumer, channel=None, queue=None,
+                            consumer_tag='tag')
+
+    rabbitmq._connections = [None]
+    rabbitmq._create_consumer = create_consumer
+    new_config = {**config, 'consumers': [
+        config['consumers'][0], {'queue_name': 'added', 'consumer_name': 'added', 'failed_message_routing': routing}]}
+
+    assert await rabbitmq.reload(new_config)
+    assert rabbitmq._consumers[0] is kept and removed.queue.cancelled and created == ['added']
+    assert not await rabbitmq.reload({**new_config, 'connection': {'host': 'other'}})
@@ -0,0 +1,86 @@
+import asyncio
+from typing import List
+
+import pytest
+
+from postiel_helpers.action.action import Action
+from postiel_helpers.action.post.action import PostAction
+from postiel_helpers.config.producer import ProducerConfig
+from postiel_helpers.message_broker.interface import MessageBrokerInterface
+from postiel_helpers.message_broker.message import Message
+from postiel_helpers.services.producer import Producer
+from test.common import POST_ACTION
+
+
+class BrokerMock(MessageBrokerInterface):
+    def __init__(self, delay: float = 0):
+        self.batches: List[List[Message]] = []
+        self._delay = delay
+
+    @classmethod
+    async def initialize(cls, config, service_consumers, close_grace, process_pool=None):
+        return cls()
+
+    async def send_message(self, message: Message) -> None:
+        await self.send_messages([message])
+
+    async def send_messages(self, messages: List[Message]) -> None:
+        await asyncio.sleep(self._delay)
+        self.batches.append(messages)
+
+    async def close(self) -> None:
+        pass
+
+    async def load_failed(self) -> None:
+        pass
+
+
+def get_config(**config) -> ProducerConfig:
+    return ProducerConfig.parse_obj({
+        'routes': [{'action_type': 'Action', 'broker': 'broker',
+                    'routing': {'exchange_name': 'exchange', 'routing_key': 'key'}}],
+        **config})
+
+
+@pytest.mark.asyncio
+async def test_actions_are_sent_in_batches():
+    broker = BrokerMock()
+    producer = Producer({'broker': broker}, get_config(batch={'max_batch_size': 10, 'max_wait_ms': 10}))
+    producer.start()
+
+    for _ in range(25):
+        await producer.send_action(POST_ACTION)
+    await producer.close()
+
+    assert [len(batch) for batch in broker.batches] == [10, 10, 5]
+    message = broker.batches[0][0]
+    assert message.action is POST_ACTION
+    assert message.routing_config == {'exchange_name': 'exchange', 'routing_key': 'key', 'partition_key_field': None,
+                                      'partition_buckets': None}
+
+
+@pytest.mark.asyncio
+async def test_full_queue_blocks_sender():
+    producer = Producer({'broker': BrokerMock(delay=0.05)},
+                        get_config(max_queue_size=2, batch={'max_batch_size': 1, 'max_wait_ms': 0}))
+    producer.start()
+
+    for _ in range(3):
+        await producer.send_action(POST_ACTION)
+    sending = asyncio.create_task(producer.send_action(POST_ACTION))
+    await asyncio.sleep(0.01)
+    assert not sending.done()
+
+    await sending
+    await producer.close()
+
+
+def test_routes():
+    with pytest.raises(ValueError):
+        Producer({}, get_config())
+
+    producer = Producer({'broker': BrokerMock()}, get_config(routes=[
+        {'action_type': 'PostAction', 'broker': 'broker', 'routing': {'exchange_name': 'a', 'routing_key': 'a'}}]))
+    assert producer._route_table.get(PostAction).routing_config['exchange_name'] == 'a'
+    with pytest.raises(ValueError):
+        producer._route_table.get(Action)
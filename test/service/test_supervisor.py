@@ -0,0 +1,104 @@
+import asyncio
+import json
+import os
+import signal
+import threading
+import time
+
+from postiel_helpers.config.supervisor import SupervisorConfig
+from postiel_helpers.services.service import Service
+from postiel_helpers.services.supervisor import Supervisor
+
+
+def test_workers_run_until_they_exit(tmp_path):
+    def worker(index: int) -> None:
+        (tmp_path / f'{index}.{os.getpid()}').touch()
+
+    Supervisor(worker, SupervisorConfig(workers=2)).run()
+
+    files = sorted(path.name.split('.') for path in tmp_path.iterdir())
+    assert [index for index, _ in files] == ['0', '1']
+    assert len({pid for _, pid in files} | {str(os.getpid())}) == 3
+
+
+def test_crashed_worker_is_restarted(tmp_path):
+    def worker(index: int) -> None:
+        crashed = tmp_path / 'crashed'
+        if not crashed.exists():
+            crashed.touch()
+            raise RuntimeError('Worker crash')
+        (tmp_path / 'done').touch()
+
+    Supervisor(worker, SupervisorConfig(workers=1, restart_delay=0.01)).run()
+
+    assert (tmp_path / 'done').exists()
+
+
+def test_signals_are_forwarded_and_workers_stopped_together(tmp_path):
+    def worker(index: int) -> None:
+        signal.signal(signal.SIGHUP, lambda signum, frame: (tmp_path / f'{index}.hup').touch())
+        while True:
+            time.sleep(1)
+
+    def send_signals() -> None:
+        time.sleep(0.3)
+        os.kill(os.getpid(), signal.SIGHUP)
+        time.sleep(0.2)
+        os.kill(os.getpid(), signal.SIGTERM)
+
+    previous_handler = signal.getsignal(signal.SIGTERM)
+    thread = threading.Thread(target=send_signals)
+    thread.start()
+    start = time.monotonic()
+    Supervisor(worker, SupervisorConfig(workers=2, stop_timeout=1)).run()
+    thread.join()
+
+    assert time.monotonic() - start < 1
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['0.hup', '1.hup']
+    assert signal.getsignal(signal.SIGTERM) is previous_handler
+
+
+def test_service_runs_in_supervised_workers(tmp_path):
+    (tmp_path / 'config.yaml').write_text(json.dumps({'supervisor': {'workers': 2}}))
+
+    class MockService(Service):
+        _CONFIG_DIRECTORY = str(tmp_path)
+        _CONFIG_FILENAME = 'config.yaml'
+
+        async def _start(self) -> None:
+            (tmp_path / str(os.getpid())).write_text(str(self._config_hash))
+
+    MockService().run()
+
+    hashes = [path.read_text() for path in tmp_path.iterdir() if path.name != 'config.yaml']
+    assert len(hashes) == 2 and hashes[0] == hashes[1] != 'None'
+
+
+def test_supervised_service_is_stopped_gracefully(tmp_path):
+    (tmp_path / 'config.yaml').write_text(json.dumps({'supervisor': {'workers': 2, 'stop_timeout': 5}}))
+
+    class MockService(Service):
+        _CONFIG_DIRECTORY = str(tmp_path)
+        _CONFIG_FILENAME = 'config.yaml'
+
+        async def _start(self) -> None:
+            (tmp_path / f'{os.getpid()}.started').touch()
+            await asyncio.sleep(10)
+
+        async def _stop(self) -> None:
+            await super()._stop()
+            (tmp_path / f'{os.getpid()}.stopped').touch()
+
+    def stop() -> None:
+        while len(list(tmp_path.glob('*.started'))) < 2:
+            time.sleep(0.01)
+        os.kill(os.getpid(), signal.SIGTERM)
+
+    thread = threading.Thread(target=stop)
+    thread.start()
+    start = time.monotonic()
+    MockService().run()
+    thread.join()
+
+    assert time.monotonic() - start < 5
+    assert len(list(tmp_path.glob('*.stopped'))) == 2